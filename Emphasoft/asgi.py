@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'Emphasoft.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Apps are loaded by now
+from booking.async_views import room_events_websocket  # noqa: E402
+
+
+async def application(scope: dict, receive, send) -> None:
+    """ASGI application serving WebSocket of live room events besides Django"""
+    if scope['type'] == 'websocket':
+        await room_events_websocket(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -39,6 +39,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     # REST
     'rest_framework',
     'rest_framework.authtoken',
@@ -50,6 +51,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'booking.middleware.MetricsMiddleware',
+    'booking.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +97,55 @@ DATABASES = {
     }
 }
 
+# Read replicas of `default` database given as comma-separated `host:port` pairs,
+# their aliases are `replica-1`, `replica-2` and so on.
+# Test runner makes them mirrors of test database
+DB_REPLICAS = [address for address in os.environ.get('DB_REPLICAS', '').split(',') if address]
+
+for number, address in enumerate(DB_REPLICAS, start=1):
+    host, _, port = address.partition(':')
+    DATABASES[f'replica-{number}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': int(port or DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['booking.routers.ReplicaRouter']
+
+# Cache
+# https://docs.djangoproject.com/en/4.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    # Any shared backend (e.g. Redis) must be used with several processes
+    'booking': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'booking',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Least recently used tokens are evicted once there are more than `MAX_ENTRIES`
+    'booking-auth': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'booking-auth',
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+    # Outcomes of requests with `Idempotency-Key`, the oldest ones are evicted once there are more than `MAX_ENTRIES`
+    'booking-idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'booking-idempotency',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    },
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
 
@@ -114,7 +166,7 @@ AUTH_PASSWORD_VALIDATORS = [
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'booking.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.BasicAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
@@ -122,6 +174,77 @@ REST_FRAMEWORK = {
     'DEFAULT_SCHEMA_CLASS': 'drf_spectacular.openapi.AutoSchema',
 }
 
+# Booking
+
+# Page size of room lists and maximum one that client can request
+BOOKING_PAGE_SIZE = 100
+BOOKING_MAX_PAGE_SIZE = 1000
+
+# Maximum number of rooms booked or released by single bulk request
+BOOKING_BULK_MAX_ROOMS = 100
+
+# Number of rooms fetched from server-side cursor at once by export
+BOOKING_EXPORT_CHUNK_SIZE = 2000
+
+# In-process index answering room list filters without SQL and
+# lifetime in seconds after which it's reloaded to catch changes made by other processes
+BOOKING_ROOM_INDEX = False
+BOOKING_ROOM_INDEX_TTL = 300
+
+# Least trigram similarity of room name to search query, e.g. 0.45 for single typo in 7-letter word,
+# lifetime in seconds of in-process name index used where database has no trigram index and
+# number of its candidates checked by database at once
+BOOKING_SEARCH_SIMILARITY = 0.4
+BOOKING_SEARCH_INDEX_TTL = 300
+BOOKING_SEARCH_CHUNK_SIZE = 1000
+
+# Width of price histogram buckets of room facets by default, maximum number of buckets,
+# which wider buckets are made for, and if facets are cached
+BOOKING_FACETS_PRICE_STEP = 50
+BOOKING_FACETS_MAX_BUCKETS = 100
+BOOKING_FACETS_CACHE = True
+
+# Number of rooms above which admin changelist shows count estimated by PostgreSQL planner instead of exact one
+BOOKING_ADMIN_EXACT_COUNT_LIMIT = 10000
+
+# Maximum number of choices of beds filter of admin changelist, wider range of beds is grouped into ranges
+BOOKING_ADMIN_BEDS_CHOICES = 20
+
+# Schema stored by `build_schema` command and lifetime in seconds clients may cache it for
+BOOKING_SCHEMA_FILE = BASE_DIR / 'schema.yml'
+BOOKING_SCHEMA_MAX_AGE = 86400
+
+# Broker of live room events, `booking.events.PostgresBroker` delivers them to all processes, `None` disables them,
+# number of events subscriber may fall behind by, interval in seconds of keep-alive messages of event streams
+# and lifetime in seconds of Server-Sent Events stream, after which client reconnects
+BOOKING_EVENTS_BROKER = 'booking.events.LocalBroker'
+BOOKING_EVENTS_QUEUE_SIZE = 1000
+BOOKING_EVENTS_KEEPALIVE = 15
+BOOKING_EVENTS_STREAM_LIFETIME = 300
+
+# Lifetime in seconds of holds of rooms, e.g. during checkout
+BOOKING_HOLD_TIMEOUT = 600
+
+# Cache alias and lifetime in seconds of cached room lists
+BOOKING_CACHE = 'booking'
+BOOKING_CACHE_TIMEOUT = 300
+
+# Aliases of databases that room reads of `BOOKING_REPLICA_URL_NAMES` are sent to
+# and time in seconds client's reads stay on `default` database after its write
+BOOKING_DB_REPLICAS = [alias for alias in DATABASES if alias.startswith('replica-')]
+BOOKING_REPLICA_URL_NAMES = ('booking', 'booking-room', 'booking-facets', 'async-booking', 'async-booking-room')
+BOOKING_PRIMARY_STICKINESS = 5
+
+# Cache alias and lifetime in seconds of authenticated tokens
+BOOKING_AUTH_CACHE = 'booking-auth'
+BOOKING_AUTH_CACHE_TIMEOUT = 60
+
+# Cache alias and lifetime in seconds of outcomes of booking requests with `Idempotency-Key` header,
+# lifetime in seconds of claim of key by request in progress
+BOOKING_IDEMPOTENCY_CACHE = 'booking-idempotency'
+BOOKING_IDEMPOTENCY_TIMEOUT = 86400
+BOOKING_IDEMPOTENCY_PENDING_TIMEOUT = 60
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -1,8 +1,99 @@
-from django.contrib import admin
-from .models import Room
+import json
+import math
+
+from django.conf import settings
+from django.contrib import admin, messages
+from django.core.paginator import Paginator
+from django.db import connections, transaction
+from django.db.models import F, Max, Min, QuerySet
+from django.http import HttpRequest
+from django.utils.functional import cached_property
+
+from .models import Booking, Room
+from .signals import send_inventory_changed
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator counting objects by estimate of PostgreSQL planner, if there are many of them.\n
+    Exact COUNT(*) reads every matching row, which takes seconds on millions of rooms,
+    while estimate is made from table statistics. Small counts and other databases are counted exactly."""
+
+    @cached_property
+    def count(self) -> int:
+        queryset: QuerySet = self.object_list
+        if connections[queryset.db].vendor == 'postgresql':
+            plan: list = json.loads(queryset.select_related(None).order_by().values('pk').explain(format='json'))
+            estimate: int = plan[0]['Plan']['Plan Rows']
+            if estimate > settings.BOOKING_ADMIN_EXACT_COUNT_LIMIT:
+                return estimate
+
+        return super().count
+
+
+class BedsListFilter(admin.SimpleListFilter):
+    """Filter of rooms by beds with choices from range of beds.\n
+    Default filter of field selects DISTINCT beds of all rooms, while bounds of range are read from index.
+    Wide range is split into at most `BOOKING_ADMIN_BEDS_CHOICES` equal ranges, so outliers don't flood sidebar."""
+    title = 'beds'
+    parameter_name = 'beds'
+
+    def lookups(self, request: HttpRequest, model_admin: admin.ModelAdmin) -> list[tuple[str, int | str]]:
+        bounds: dict = model_admin.get_queryset(request).aggregate(min=Min('beds'), max=Max('beds'))
+        if bounds['min'] is None:
+            return []
+
+        low, high = bounds['min'], bounds['max']
+        width: int = math.ceil((high - low + 1) / settings.BOOKING_ADMIN_BEDS_CHOICES)
+        if width == 1:
+            return [(str(beds), beds) for beds in range(low, high + 1)]
+        return [(f'{start}-{min(start + width - 1, high)}', f'{start} – {min(start + width - 1, high)}')
+                for start in range(low, high + 1, width)]
+
+    def queryset(self, request: HttpRequest, queryset: QuerySet[Room]) -> QuerySet[Room]:
+        if self.value() is None:
+            return queryset
+        # Value is either number of beds or range of them
+        start, _, end = self.value().partition('-')
+        return queryset.filter(beds__gte=start, beds__lte=end or start)
 
 
 @admin.register(Room)
 class RoomAdmin(admin.ModelAdmin):
     list_display = ['id', 'name', 'price', 'beds', 'booked', 'available_from', 'booked_by', ]
-    list_filter = ['beds', 'booked', ]
+    list_filter = [BedsListFilter, 'booked', ]
+    list_select_related = ['booked_by', ]
+    autocomplete_fields = ['booked_by', ]
+    paginator = EstimatedCountPaginator
+    # Count of all rooms isn't shown next to count of filtered ones
+    show_full_result_count = False
+    actions = ['book_rooms', 'release_rooms', ]
+
+    def _update(self, request: HttpRequest, queryset: QuerySet[Room], booked: bool, values: dict,
+                outcome: str) -> None:
+        """Method to update selected rooms with given `booked` state by single UPDATE bumping their version.\n
+        State is checked by UPDATE itself, so rooms changed concurrently are skipped.
+        Selection may be all rooms of changelist, so their ids are never read and
+        cached lists, indexes and subscribers of events are reset as a whole instead."""
+        with transaction.atomic():
+            updated: int = queryset.filter(booked=booked).update(**values, version=F('version') + 1)
+            if updated:
+                send_inventory_changed()
+
+        self.message_user(request, f'{updated} rooms {outcome}', messages.SUCCESS)
+
+    @admin.action(description='Book selected vacant rooms')
+    def book_rooms(self, request: HttpRequest, queryset: QuerySet[Room]) -> None:
+        # Holds of other users are overridden by admin
+        self._update(request, queryset, False,
+                     {'booked': True, 'booked_by': request.user, 'held_by': None, 'held_until': None}, 'booked')
+
+    @admin.action(description='Release selected booked rooms')
+    def release_rooms(self, request: HttpRequest, queryset: QuerySet[Room]) -> None:
+        self._update(request, queryset, True, {'booked': False, 'booked_by': None}, 'released')
+
+
+@admin.register(Booking)
+class BookingAdmin(admin.ModelAdmin):
+    list_display = ['id', 'room', 'user', 'check_in', 'check_out', ]
+    list_select_related = ['room', 'user', ]
+    raw_id_fields = ['room', 'user', ]
@@ -0,0 +1,265 @@
+"""Async views of room list, detail, booking and booked list.\n
+Under ASGI they wait for DB and cache without holding a thread per request.
+Responses are the same as of views in `views` module, which stay in use under WSGI.
+Live events of rooms are streamed only by async views and WebSocket application.
+"""
+import asyncio
+import json
+import time
+from typing import AsyncIterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db.models import QuerySet
+from django.http import HttpRequest, HttpResponse, QueryDict, StreamingHttpResponse
+from django.urls import reverse
+from django.views import View
+from rest_framework import status
+from rest_framework.exceptions import (APIException, AuthenticationFailed, NotAuthenticated, NotFound,
+                                       ParseError, ValidationError)
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from . import idempotency
+from .authentication import CachedTokenAuthentication
+from .events import Subscription, get_broker, get_hub
+from .filters import make_room_query, parse_room_filters
+from .models import Room
+from .pagination import KeysetPagination
+from .search import parse_search_query, search_rooms
+from .serializers import RoomBookSerializer, RoomSerializer
+from .transitions import aupdate_room
+from .views import etag_matches, make_room_etag
+
+
+class AsyncAPIView(View):
+    """Base of async views rendering responses and errors the same way as DRF does"""
+    authentication = CachedTokenAuthentication()
+    renderer = JSONRenderer()
+    # Requests without valid token are denied, if set
+    authentication_required: bool = False
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        """Method to make view function, which is exempt from CSRF check like DRF views"""
+        view = super().as_view(**initkwargs)
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method to authenticate request and call handler of its method"""
+        try:
+            if self.authentication_required:
+                credentials: tuple | None = await self.authentication.aauthenticate(request)
+                if credentials is None:
+                    raise NotAuthenticated()
+                request.user, request.auth = credentials
+
+            return await super().dispatch(request, *args, **kwargs)
+        except APIException as exc:
+            return self.handle_exception(request, exc)
+
+    def handle_exception(self, request: HttpRequest, exc: APIException) -> HttpResponse:
+        """Method to render error response as DRF exception handler does"""
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response: HttpResponse = self.render(data, exc.status_code)
+
+        if isinstance(exc, (NotAuthenticated, AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authentication.authenticate_header(request)
+
+        return response
+
+    def render(self, data, status_code: int = status.HTTP_200_OK, headers: dict | None = None) -> HttpResponse:
+        """Method to render data into JSON response"""
+        return HttpResponse(self.renderer.render(data), status=status_code, headers=headers,
+                            content_type='application/json')
+
+    async def paginate(self, request: HttpRequest, queryset: QuerySet) -> HttpResponse:
+        """Method to render single page of rooms with fields requested by `fields` query param"""
+        paginator = KeysetPagination()
+        api_request = Request(request)
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.GET)
+        queryset = queryset.values(*paginator.get_values_fields(api_request, fields))
+        position: list | None = paginator.prepare(api_request)
+        rows: list[dict] = [row async for row in paginator.get_page_queryset(queryset, position)]
+        page: list[dict] = paginator.set_page(rows[:paginator.limit], len(rows) > paginator.limit)
+
+        return self.render({
+            'next': paginator.get_next_link(),
+            'results': RoomSerializer.represent_rows(page, fields),
+        })
+
+
+class AsyncRoomListView(AsyncAPIView):
+    """Async view to get list of rooms.\n
+    Unlike `views.RoomListView` it neither caches responses nor uses room index,
+    as both of them are read synchronously."""
+
+    async def search(self, request: HttpRequest, text: str, queryset: QuerySet) -> HttpResponse:
+        """Method to render rooms matching search query, see `views.RoomListView.search`"""
+        paginator = KeysetPagination()
+        api_request = Request(request)
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.GET)
+        limit: int = paginator.get_limit(api_request) or paginator.get_page_size(api_request)
+        # Name index is read synchronously
+        pks: list[int] = await sync_to_async(search_rooms)(text, queryset, limit)
+
+        rows: dict[int, dict] = {row['id']: row async for row in
+                                 queryset.filter(pk__in=pks).values(*dict.fromkeys((*fields, 'id')))}
+        page: list[dict] = [rows[pk] for pk in pks if pk in rows]
+        return self.render({'next': None, 'results': RoomSerializer.represent_rows(page, fields)})
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method that handling **GET** HTTP method"""
+        queryset: QuerySet = Room.objects.filter(make_room_query(request.GET))
+        text: str | None = parse_search_query(request.GET)
+        if text is not None:
+            return await self.search(request, text, queryset)
+        return await self.paginate(request, queryset)
+
+
+class AsyncRoomDetailView(AsyncAPIView):
+    """Async view to get detailed info of room"""
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method that handling **GET** HTTP method"""
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.GET)
+        row: dict | None = await Room.objects.filter(pk=kwargs['pk']).values('version', *fields).afirst()
+        if row is None:
+            raise NotFound("Room not found")
+
+        etag: str = make_room_etag(row.pop('version'), fields)
+        if etag_matches(request, etag):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return self.render(RoomSerializer.represent_rows([row])[0], headers={'ETag': etag})
+
+
+class AsyncRoomBookView(AsyncAPIView):
+    """Async view to book room by user or revert booking, see `views.RoomDetailView.partial_update`"""
+    authentication_required = True
+
+    async def patch(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method that handling **PATCH** HTTP method"""
+        try:
+            data = json.loads(request.body or b'{}')
+        except ValueError:
+            raise ParseError()
+        serializer: RoomBookSerializer = RoomBookSerializer(data=data)
+        serializer.is_valid(raise_exception=True)
+        action: str = serializer.validated_data['action']
+        pk: int = kwargs['pk']
+
+        key: str | None = idempotency.parse_key(request.headers)
+        if key is None:
+            return self.render(*await aupdate_room(pk, request.user, action))
+
+        cache_key: str = idempotency.make_key(request.user.pk, request.path, key)
+        outcome: tuple[int, str] | None = await idempotency.aclaim(cache_key, action)
+        if outcome is not None:
+            return self.render(outcome[1], outcome[0], headers={idempotency.REPLAYED_HEADER: 'true'})
+
+        try:
+            message, status_code = await aupdate_room(pk, request.user, action)
+        except Exception:
+            await idempotency.aforget(cache_key)
+            raise
+
+        await idempotency.astore(cache_key, action, status_code, message)
+        return self.render(message, status_code)
+
+
+class AsyncRoomBookedListView(AsyncAPIView):
+    """Async view to get a list of booked by user rooms"""
+    authentication_required = True
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method that handling **GET** HTTP method"""
+        return await self.paginate(request, Room.objects.filter(booked_by=request.user))
+
+
+def subscribe(params: QueryDict) -> Subscription:
+    """Function to subscribe to events of rooms matching filters of room list"""
+    if get_broker() is None:
+        raise NotFound('Room events are disabled')
+    return get_hub().subscribe(parse_room_filters(params))
+
+
+class AsyncRoomEventsView(AsyncAPIView):
+    """Async view to stream live events of rooms as Server-Sent Events.\n
+    Stream ends after `BOOKING_EVENTS_STREAM_LIFETIME` seconds or once client falls behind,
+    then client reconnects and reloads rooms it shows.
+    Ending streams also releases subscriptions of gone clients, as Django 4.2 doesn't notice them.
+    Under WSGI Django 4.2 consumes the whole stream before sending it, so streams are refused there."""
+
+    async def get(self, request: HttpRequest, *args, **kwargs) -> HttpResponse:
+        """Method that handling **GET** HTTP method"""
+        if not isinstance(request, ASGIRequest):
+            return self.render({'detail': 'Live events are served under ASGI only'}, status.HTTP_501_NOT_IMPLEMENTED)
+
+        subscription: Subscription = subscribe(request.GET)
+        return StreamingHttpResponse(self._stream(subscription), content_type='text/event-stream',
+                                     headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @staticmethod
+    async def _stream(subscription: Subscription) -> AsyncIterator[bytes]:
+        """Method to render events of subscription, comments keep connection alive while there are none"""
+        ends_at: float = time.monotonic() + settings.BOOKING_EVENTS_STREAM_LIFETIME
+
+        try:
+            yield b': connected\n\n'
+            while (timeout := ends_at - time.monotonic()) > 0:
+                try:
+                    event: dict | None = await subscription.get(min(timeout, settings.BOOKING_EVENTS_KEEPALIVE))
+                except asyncio.TimeoutError:
+                    yield b': keep-alive\n\n'
+                    continue
+                if event is None:
+                    return
+                yield f'event: {event["event"]}\ndata: {json.dumps(event)}\n\n'.encode()
+        finally:
+            get_hub().unsubscribe(subscription)
+
+
+async def room_events_websocket(scope: dict, receive, send) -> None:
+    """ASGI application to stream live events of rooms as JSON messages over WebSocket.\n
+    It's served at the path of `AsyncRoomEventsView` and takes the same query params.
+    Connection is refused if path or params are invalid and closed once client falls behind."""
+    if (await receive())['type'] != 'websocket.connect':
+        return
+
+    try:
+        if scope['path'] != reverse('async-booking-events'):
+            raise NotFound()
+        subscription: Subscription = subscribe(QueryDict(scope['query_string'].decode()))
+    except (NotFound, ValidationError):
+        # Closing before accepting is answered by 403
+        await send({'type': 'websocket.close'})
+        return
+
+    await send({'type': 'websocket.accept'})
+    receiving: asyncio.Future = asyncio.ensure_future(receive())
+    getting: asyncio.Future = asyncio.ensure_future(subscription.get(None))
+
+    try:
+        while True:
+            done, _ = await asyncio.wait({receiving, getting}, return_when=asyncio.FIRST_COMPLETED)
+
+            if receiving in done:
+                if receiving.result()['type'] == 'websocket.disconnect':
+                    return
+                # Messages of client are ignored
+                receiving = asyncio.ensure_future(receive())
+
+            if getting in done:
+                event: dict | None = getting.result()
+                if event is None:
+                    await send({'type': 'websocket.close', 'code': 1013})
+                    return
+                await send({'type': 'websocket.send', 'text': json.dumps(event)})
+                getting = asyncio.ensure_future(subscription.get(None))
+    finally:
+        receiving.cancel()
+        getting.cancel()
+        get_hub().unsubscribe(subscription)
@@ -0,0 +1,84 @@
+"""DRF authentication classes"""
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import BaseCache, caches
+from django.http import HttpRequest
+from django.utils.translation import gettext_lazy as _
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.authtoken.models import Token
+
+
+def get_auth_cache() -> BaseCache:
+    """Function to get cache backend configured by `BOOKING_AUTH_CACHE` setting"""
+    return caches[settings.BOOKING_AUTH_CACHE]
+
+
+def make_token_key(key: str) -> str:
+    """Function to make cache key of token, token itself is never stored in keys"""
+    return f'booking:token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def forget_tokens(*keys: str) -> None:
+    """Function to drop tokens from cache, so next requests will look them up in DB"""
+    get_auth_cache().delete_many([make_token_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication keeping token-to-user mapping in cache.\n
+    Entries are dropped on token deletion (logout) and user change (deactivation),
+    and expire after `BOOKING_AUTH_CACHE_TIMEOUT` seconds anyway."""
+
+    def authenticate_credentials(self, key: str) -> tuple[User, Token]:
+        """Method to get user and token by token key"""
+        cache: BaseCache = get_auth_cache()
+        cache_key: str = make_token_key(key)
+        credentials: tuple[User, Token] | None = cache.get(cache_key)
+
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            cache.set(cache_key, credentials, timeout=settings.BOOKING_AUTH_CACHE_TIMEOUT)
+
+        return credentials
+
+    async def aauthenticate(self, request: HttpRequest) -> tuple[User, Token] | None:
+        """Method to authenticate request in async views, header is parsed the same way as by `authenticate`"""
+        auth: list[bytes] = get_authorization_header(request).split()
+
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+
+        if len(auth) == 1:
+            raise AuthenticationFailed(_('Invalid token header. No credentials provided.'))
+        if len(auth) > 2:
+            raise AuthenticationFailed(_('Invalid token header. Token string should not contain spaces.'))
+
+        try:
+            key: str = auth[1].decode()
+        except UnicodeError:
+            raise AuthenticationFailed(_('Invalid token header. '
+                                         'Token string should not contain invalid characters.'))
+
+        return await self.aauthenticate_credentials(key)
+
+    async def aauthenticate_credentials(self, key: str) -> tuple[User, Token]:
+        """Method to get user and token by token key using async cache and ORM"""
+        cache: BaseCache = get_auth_cache()
+        cache_key: str = make_token_key(key)
+        credentials: tuple[User, Token] | None = await cache.aget(cache_key)
+
+        if credentials is None:
+            try:
+                token: Token = await self.get_model().objects.select_related('user').aget(key=key)
+            except Token.DoesNotExist:
+                raise AuthenticationFailed(_('Invalid token.'))
+
+            if not token.user.is_active:
+                raise AuthenticationFailed(_('User inactive or deleted.'))
+
+            credentials = (token.user, token)
+            await cache.aset(cache_key, credentials, timeout=settings.BOOKING_AUTH_CACHE_TIMEOUT)
+
+        return credentials
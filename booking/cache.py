@@ -0,0 +1,105 @@
+"""Versioned cache of room list responses.\n
+Entries are keyed by inventory version, which is bumped on each change of rooms,
+so entries are never stale and invalidation doesn't need to look for keys.
+Version is also bumped at scheduled expiries, when rooms change by themselves, e.g. once their holds expire.
+"""
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from django.dispatch import Signal
+from django.http import QueryDict
+from django.utils.http import quote_etag
+
+VERSION_KEY = 'booking:inventory-version'
+# Timestamp at which inventory changes by itself, e.g. once hold of room expires
+EXPIRY_KEY = 'booking:inventory-expiry'
+
+# Sent once inventory version is bumped at scheduled expiry, so the next one is scheduled
+inventory_expired = Signal()
+
+_stats: dict[str, int] = {'hits': 0, 'misses': 0}
+_stats_lock = threading.Lock()
+
+
+def get_cache() -> BaseCache:
+    """Function to get cache backend configured by `BOOKING_CACHE` setting"""
+    return caches[settings.BOOKING_CACHE]
+
+
+def get_inventory_version() -> int:
+    """Function to get current inventory version"""
+    cache: BaseCache = get_cache()
+    values: dict = cache.get_many([VERSION_KEY, EXPIRY_KEY])
+    version: int | None = values.get(VERSION_KEY)
+
+    # Only one of processes deletes expiry, so version is bumped once
+    if values.get(EXPIRY_KEY, float('inf')) <= time.time() and cache.delete(EXPIRY_KEY):
+        bump_inventory_version()
+        inventory_expired.send(sender=None)
+        version = cache.get(VERSION_KEY)
+
+    if version is None:
+        # Version might be evicted, so a new one must never match older ones
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(VERSION_KEY)
+
+    return version
+
+
+def bump_inventory_version() -> None:
+    """Function to change inventory version, so all cached entries become unreachable"""
+    cache: BaseCache = get_cache()
+
+    try:
+        cache.incr(VERSION_KEY)
+    except ValueError:
+        cache.add(VERSION_KEY, time.time_ns(), timeout=None)
+
+
+def expire_inventory_at(timestamp: float) -> None:
+    """Function to schedule bump of inventory version at timestamp, unless an earlier one is scheduled"""
+    cache: BaseCache = get_cache()
+    scheduled: float | None = cache.get(EXPIRY_KEY)
+
+    if scheduled is None or timestamp < scheduled:
+        cache.set(EXPIRY_KEY, timestamp, timeout=None)
+
+
+def make_digest(params: QueryDict) -> str:
+    """Function to make digest of normalized query params"""
+    items: list[tuple[str, str]] = sorted((key, value) for key in params for value in params.getlist(key))
+    return hashlib.sha1(repr(items).encode()).hexdigest()
+
+
+def make_key(prefix: str, params: QueryDict) -> str:
+    """Function to make key of entry from normalized query params"""
+    return f'booking:{prefix}:{get_inventory_version()}:{make_digest(params)}'
+
+
+def make_etag(params: QueryDict) -> str:
+    """Function to make ETag of room list from inventory version and query params"""
+    return quote_etag(f'{get_inventory_version()}-{make_digest(params)}')
+
+
+def get_entry(key: str):
+    """Function to get cached entry counting hits and misses"""
+    value = get_cache().get(key)
+
+    with _stats_lock:
+        _stats['hits' if value is not None else 'misses'] += 1
+
+    return value
+
+
+def set_entry(key: str, value) -> None:
+    """Function to cache entry"""
+    get_cache().set(key, value, timeout=settings.BOOKING_CACHE_TIMEOUT)
+
+
+def get_stats() -> dict[str, int]:
+    """Function to get counters of cache hits and misses of current process"""
+    with _stats_lock:
+        return dict(_stats)
@@ -0,0 +1,258 @@
+"""Live events of room availability.\n
+Once rooms are changed, events with their current state are published to broker configured by
+`BOOKING_EVENTS_BROKER`, which delivers them to every process having subscribers.
+There events are fanned out to subscribers, which are streams served by event loop of the process,
+each one getting only events of rooms matching its filters.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import threading
+import time
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db import connection, connections
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import ValidationError
+
+from .models import Room
+from .room_index import COMPARATORS, to_key
+from .serializers import RoomSerializer
+
+logger = logging.getLogger(__name__)
+
+BOOKED = 'booked'
+HELD = 'held'
+RELEASED = 'released'
+
+# Fields of rooms events have, besides event name
+EVENT_FIELDS: tuple[str, ...] = ('id', 'version', 'booked', 'price', 'beds', 'available_from')
+
+
+class Subscription:
+    """Queue of events of rooms matching lookups of `filters.parse_room_filters`.\n
+    `booked` lookup doesn't narrow events, as every event may move room between booked and vacant ones.
+    Subscriber falling behind by `BOOKING_EVENTS_QUEUE_SIZE` events is closed, so it reloads rooms."""
+
+    def __init__(self, lookups: dict[str, Any], loop: asyncio.AbstractEventLoop) -> None:
+        self.checks: list[tuple[str, Callable, Any]] = []
+        for lookup, value in lookups.items():
+            column, _, comparison = lookup.partition('__')
+            if column == 'booked':
+                continue
+            try:
+                self.checks.append((column, COMPARATORS[comparison], to_key(column, value)))
+            except (DjangoValidationError, TypeError, ValueError):
+                raise ValidationError({column: f'Invalid value "{value}"'})
+
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.closed: bool = False
+
+    def matches(self, event: dict) -> bool:
+        """Method to check if room of event matches lookups"""
+        return all(compare(to_key(column, event[column]), bound) for column, compare, bound in self.checks)
+
+    def push(self, events: list[dict]) -> None:
+        """Method to queue events, it's called in loop of subscription"""
+        if self.closed:
+            return
+        if self.queue.qsize() + len(events) > settings.BOOKING_EVENTS_QUEUE_SIZE:
+            self.close()
+            return
+        for event in events:
+            self.queue.put_nowait(event)
+
+    def close(self) -> None:
+        """Method to end subscription, `None` is queued to wake up its reader"""
+        self.closed = True
+        self.queue.put_nowait(None)
+
+    async def get(self, timeout: float) -> dict | None:
+        """Method to wait for the next event, `None` means subscription is closed.\n
+        `asyncio.TimeoutError` is raised if there is no event for `timeout` seconds."""
+        return await asyncio.wait_for(self.queue.get(), timeout)
+
+
+class EventHub:
+    """In-process fan-out of events to subscriptions served by event loops of the process"""
+
+    def __init__(self) -> None:
+        self._subscriptions: set[Subscription] = set()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._subscriptions)
+
+    def subscribe(self, lookups: dict[str, Any]) -> Subscription:
+        """Method to subscribe to events of rooms matching lookups, it's called in running event loop"""
+        subscription = Subscription(lookups, asyncio.get_running_loop())
+        broker: LocalBroker | None = get_broker()
+        if broker is not None:
+            broker.listen()
+        with self._lock:
+            self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        with self._lock:
+            self._subscriptions.discard(subscription)
+
+    def deliver(self, events: list[dict]) -> None:
+        """Method to pass events to matching subscriptions, it's thread-safe"""
+        with self._lock:
+            subscriptions: list[Subscription] = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            matching: list[dict] = [event for event in events if subscription.matches(event)]
+            if not matching:
+                continue
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.push, matching)
+            except RuntimeError:
+                # Loop of subscription is closed
+                self.unsubscribe(subscription)
+
+    def close_all(self) -> None:
+        """Method to end all subscriptions, so subscribers reload rooms, it's thread-safe"""
+        with self._lock:
+            subscriptions: list[Subscription] = list(self._subscriptions)
+
+        for subscription in subscriptions:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.close)
+            except RuntimeError:
+                self.unsubscribe(subscription)
+
+
+class LocalBroker:
+    """Broker delivering events to subscribers of current process only"""
+
+    def __init__(self, hub: EventHub) -> None:
+        self.hub = hub
+
+    def has_subscribers(self) -> bool:
+        """Method to check if anyone may get published events, so they are worth making"""
+        return len(self.hub) > 0
+
+    def publish(self, events: list[dict]) -> None:
+        self.hub.deliver(events)
+
+    def reset(self) -> None:
+        """Method to end streams of all subscribers, as too many rooms are changed to publish their events"""
+        self.hub.close_all()
+
+    def listen(self) -> None:
+        """Method to start receiving events published by other processes, local ones are delivered directly"""
+
+
+class PostgresBroker(LocalBroker):
+    """Broker delivering events to all processes by LISTEN/NOTIFY of `default` database.\n
+    Events are sent in chunks, as NOTIFY payload is limited to 8000 bytes, `null` payload is sent on reset.
+    Every process with subscribers holds one more connection to listen on."""
+    channel = 'booking_rooms'
+    chunk_size = 20
+    reconnect_delay = 1.0
+
+    def __init__(self, hub: EventHub) -> None:
+        super().__init__(hub)
+        self._listener: threading.Thread | None = None
+        self._lock = threading.Lock()
+
+    def has_subscribers(self) -> bool:
+        # Subscribers of other processes are unknown
+        return True
+
+    def publish(self, events: list[dict]) -> None:
+        with connection.cursor() as cursor:
+            for offset in range(0, len(events), self.chunk_size):
+                cursor.execute('SELECT pg_notify(%s, %s)',
+                               [self.channel, json.dumps(events[offset:offset + self.chunk_size])])
+
+    def reset(self) -> None:
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, json.dumps(None)])
+
+    def listen(self) -> None:
+        with self._lock:
+            if self._listener is None:
+                self._listener = threading.Thread(target=self._listen, name='booking-events', daemon=True)
+                self._listener.start()
+
+    def _listen(self) -> None:
+        """Method to deliver notifications to subscribers, it runs in its own thread for the lifetime of process"""
+        database = connections['default']
+
+        while True:
+            try:
+                with database.get_new_connection(database.get_connection_params()) as listener:
+                    listener.autocommit = True
+                    listener.execute(f'LISTEN {self.channel}')
+                    for notify in listener.notifies():
+                        events: list[dict] | None = json.loads(notify.payload)
+                        if events is None:
+                            self.hub.close_all()
+                        else:
+                            self.hub.deliver(events)
+            except Exception:
+                logger.exception('Listening to room events failed, reconnecting')
+                time.sleep(self.reconnect_delay)
+
+
+_hub = EventHub()
+_brokers: dict[str, LocalBroker] = {}
+_brokers_lock = threading.Lock()
+
+
+def get_hub() -> EventHub:
+    """Function to get event hub of current process"""
+    return _hub
+
+
+def get_broker() -> LocalBroker | None:
+    """Function to get broker configured by `BOOKING_EVENTS_BROKER` setting, events are disabled if it's `None`"""
+    path: str | None = settings.BOOKING_EVENTS_BROKER
+    if path is None:
+        return None
+
+    with _brokers_lock:
+        if path not in _brokers:
+            _brokers[path] = import_string(path)(_hub)
+        return _brokers[path]
+
+
+def get_event_name(booked: bool, held_until: datetime.datetime | None) -> str:
+    """Function to get name of event of room state, expired holds are the same as none"""
+    if booked:
+        return BOOKED
+    return HELD if held_until is not None and held_until > timezone.now() else RELEASED
+
+
+def make_events(rows: Iterable[dict]) -> list[dict]:
+    """Function to make events of `values()` rows of rooms with `EVENT_FIELDS` and `held_until`.\n
+    Events carry current state of rooms, so the same state may be repeated, e.g. after change of price."""
+    rows = list(rows)
+    names: list[str] = [get_event_name(row['booked'], row.pop('held_until')) for row in rows]
+    return [{'event': name, **row} for name, row in zip(names, RoomSerializer.represent_rows(rows))]
+
+
+def publish_rooms(pks: list[int]) -> None:
+    """Function to publish events of current state of rooms"""
+    broker: LocalBroker | None = get_broker()
+    if broker is None or not broker.has_subscribers():
+        return
+
+    events: list[dict] = make_events(Room.objects.filter(pk__in=pks).values(*EVENT_FIELDS, 'held_until'))
+    if events:
+        broker.publish(events)
+
+
+def reset_subscribers() -> None:
+    """Function to end streams of all subscribers after change of too many rooms to publish their events"""
+    broker: LocalBroker | None = get_broker()
+    if broker is not None:
+        broker.reset()
@@ -0,0 +1,45 @@
+"""Room filters shared by views and management commands"""
+from django.db.models import Q
+from django.http import QueryDict
+
+from .holds import make_unheld_query
+
+
+def parse_room_filters(params: QueryDict) -> dict[str, str | bool]:
+    """Function to parse query params into lookups of `models.Room` fields"""
+    price_from: str = params.get(key='price_from')
+    price_to: str = params.get(key='price_to')
+    beds_from: str = params.get(key='beds_from')
+    beds_to: str = params.get(key='beds_to')
+    available_from_from: str = params.get(key='available_from')
+    available_from_to: str = params.get(key='available_to')
+    booked: bool = "booked" in params.keys()
+    vacant: bool = "vacant" in params.keys()
+
+    lookups: dict[str, str | bool] = {}
+
+    if price_from:
+        lookups['price__gte'] = price_from
+    if price_to:
+        lookups['price__lte'] = price_to
+    if beds_from:
+        lookups['beds__gte'] = beds_from
+    if beds_to:
+        lookups['beds__lte'] = beds_to
+    if available_from_from:
+        lookups['available_from__gte'] = available_from_from
+    if available_from_to:
+        lookups['available_from__lte'] = available_from_to
+    if booked ^ vacant:
+        lookups['booked'] = booked
+
+    return lookups
+
+
+def make_room_query(params: QueryDict) -> Q:
+    """Function to parse query params and make a DB-query.\n
+    Vacant rooms are ones neither booked nor held, expired holds are the same as none."""
+    lookups: dict[str, str | bool] = parse_room_filters(params)
+    if lookups.get('booked') is False:
+        return Q(**lookups) & make_unheld_query()
+    return Q(**lookups)
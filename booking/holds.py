@@ -0,0 +1,42 @@
+"""Short-lived holds of rooms.\n
+Vacant room is held by user for `BOOKING_HOLD_TIMEOUT` seconds, e.g. during checkout, and then booked or released.
+Queries check expiry of holds themselves, so expired holds are free before `release_holds` command clears them.
+Cached room lists are dropped at expiry of the earliest hold by scheduled bump of inventory version.
+"""
+import datetime
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import Min, Q
+from django.utils import timezone
+
+from .cache import expire_inventory_at
+from .models import Room
+
+
+def make_unheld_query() -> Q:
+    """Function to make DB-query of rooms without active hold"""
+    return Q(held_until__isnull=True) | Q(held_until__lte=timezone.now())
+
+
+def make_available_query(user: User) -> Q:
+    """Function to make DB-query of rooms user is able to hold or book: vacant ones not held by others"""
+    return Q(booked=False) & (make_unheld_query() | Q(held_by=user))
+
+
+def get_hold_expiry() -> datetime.datetime:
+    """Function to get expiry of hold made now"""
+    return timezone.now() + datetime.timedelta(seconds=settings.BOOKING_HOLD_TIMEOUT)
+
+
+def schedule_expiry(held_until: datetime.datetime) -> None:
+    """Function to drop cached room lists at expiry of hold, as room becomes vacant then"""
+    expire_inventory_at(held_until.timestamp())
+
+
+def schedule_next_expiry() -> None:
+    """Function to schedule drop of cached room lists at expiry of the earliest active hold"""
+    held_until: datetime.datetime | None = (Room.objects.filter(held_until__gt=timezone.now())
+                                            .aggregate(Min('held_until'))['held_until__min'])
+    if held_until is not None:
+        schedule_expiry(held_until)
@@ -0,0 +1,102 @@
+"""Idempotency keys of booking requests.\n
+Outcome of the first request with `Idempotency-Key` header is stored in `BOOKING_IDEMPOTENCY_CACHE`
+for `BOOKING_IDEMPOTENCY_TIMEOUT` seconds and replayed for its retries, so they don't change rooms again.
+Keys are scoped by user and path, so different users and rooms never share outcomes.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import BaseCache, caches
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+HEADER = 'Idempotency-Key'
+# Header set on replayed responses
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+
+
+class RequestInProgress(APIException):
+    """Error of retry arriving while the first request with the same key is still handled"""
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = f'Request with this {HEADER} is in progress, retry later'
+    default_code = 'idempotency_key_in_progress'
+
+
+class KeyReused(APIException):
+    """Error of key reused for request of another operation"""
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = f'{HEADER} is already used for another operation'
+    default_code = 'idempotency_key_reused'
+
+
+def get_idempotency_cache() -> BaseCache:
+    """Function to get cache backend configured by `BOOKING_IDEMPOTENCY_CACHE` setting"""
+    return caches[settings.BOOKING_IDEMPOTENCY_CACHE]
+
+
+def parse_key(headers) -> str | None:
+    """Function to get idempotency key of request, if it has one"""
+    key: str | None = headers.get(HEADER)
+    if key is None:
+        return None
+    if not key.strip() or len(key) > MAX_KEY_LENGTH:
+        raise ValidationError({HEADER: f'Key must be non-empty and at most {MAX_KEY_LENGTH} characters long'})
+    return key
+
+
+def make_key(user_pk: int, path: str, key: str) -> str:
+    """Function to make cache key of outcome, key of client itself is never stored in keys"""
+    return f'booking:idempotency:{hashlib.sha256(f"{user_pk}:{path}:{key}".encode()).hexdigest()}'
+
+
+def _replay(entry: dict | None, operation: str) -> tuple[int, object]:
+    """Function to get (status, data) of stored outcome of another request with the same key"""
+    if entry is None:
+        # Claim has expired or its request has failed in between, so client retries
+        raise RequestInProgress()
+    if entry['operation'] != operation:
+        raise KeyReused()
+    if 'status' not in entry:
+        raise RequestInProgress()
+    return entry['status'], entry['data']
+
+
+def claim(cache_key: str, operation: str) -> tuple[int, object] | None:
+    """Function to claim key for request, (status, data) of stored outcome is returned if key is already used.\n
+    Claim is made by `add()`, so only one of concurrent requests with the same key is handled.
+    It expires after `BOOKING_IDEMPOTENCY_PENDING_TIMEOUT` seconds if its request never finishes."""
+    cache: BaseCache = get_idempotency_cache()
+    if cache.add(cache_key, {'operation': operation}, timeout=settings.BOOKING_IDEMPOTENCY_PENDING_TIMEOUT):
+        return None
+    return _replay(cache.get(cache_key), operation)
+
+
+async def aclaim(cache_key: str, operation: str) -> tuple[int, object] | None:
+    """Function to claim key for request of async view, see `claim`"""
+    cache: BaseCache = get_idempotency_cache()
+    if await cache.aadd(cache_key, {'operation': operation}, timeout=settings.BOOKING_IDEMPOTENCY_PENDING_TIMEOUT):
+        return None
+    return _replay(await cache.aget(cache_key), operation)
+
+
+def store(cache_key: str, operation: str, status_code: int, data) -> None:
+    """Function to store outcome of request, which is replayed for retries"""
+    get_idempotency_cache().set(cache_key, {'operation': operation, 'status': status_code, 'data': data},
+                                timeout=settings.BOOKING_IDEMPOTENCY_TIMEOUT)
+
+
+async def astore(cache_key: str, operation: str, status_code: int, data) -> None:
+    """Function to store outcome of request of async view"""
+    await get_idempotency_cache().aset(cache_key, {'operation': operation, 'status': status_code, 'data': data},
+                                       timeout=settings.BOOKING_IDEMPOTENCY_TIMEOUT)
+
+
+def forget(cache_key: str) -> None:
+    """Function to drop claim of failed request, so its retry is handled anew"""
+    get_idempotency_cache().delete(cache_key)
+
+
+async def aforget(cache_key: str) -> None:
+    """Function to drop claim of failed request of async view"""
+    await get_idempotency_cache().adelete(cache_key)
@@ -0,0 +1,185 @@
+"""Command to compare sync views under WSGI with async views under ASGI"""
+import asyncio
+import random
+import statistics
+import threading
+import time
+from typing import Iterator
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from booking.models import Room
+
+BATCH_SIZE = 10000
+
+# Share of requests of every endpoint
+MIX: dict[str, int] = {
+    'list': 50,
+    'detail': 35,
+    'book': 10,
+    'booked': 5,
+}
+
+
+def make_requests(count: int, pks: list[int], seed: int) -> list[tuple[str, str, str]]:
+    """Function to make the same (endpoint, method, path) requests for both deployments"""
+    rng = random.Random(seed)
+    endpoints: list[str] = rng.choices(list(MIX), weights=list(MIX.values()), k=count)
+    requests: list[tuple[str, str, str]] = []
+
+    for endpoint in endpoints:
+        if endpoint == 'list':
+            price: int = rng.randint(20, 500)
+            requests.append((endpoint, 'get', f'/api/booking/?vacant&price_from={price}&price_to={price + 100}'
+                                               f'&beds_from={rng.randint(1, 4)}&page_size=20'))
+        elif endpoint == 'detail':
+            requests.append((endpoint, 'get', f'/api/booking/{rng.choice(pks)}/'))
+        elif endpoint == 'book':
+            requests.append((endpoint, 'patch', f'/api/booking/{rng.choice(pks)}/book'))
+        else:
+            requests.append((endpoint, 'get', '/api/booking/booked/'))
+
+    return requests
+
+
+class Command(BaseCommand):
+    """Command to send the same mix of requests to sync and async views by concurrent clients.\n
+    Requests are handled in-process, sync views by a limited number of worker threads
+    and async views by a single event loop, as they are by WSGI and ASGI servers.
+    Seeded rooms and user are deleted at the end."""
+    help = 'Compares throughput and latency of sync WSGI and async ASGI views under concurrent load'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--rooms', type=int, default=10000, help='Number of rooms to seed')
+        parser.add_argument('--requests', type=int, default=2000, help='Number of requests per deployment')
+        parser.add_argument('--concurrency', type=int, default=50, help='Number of concurrent clients')
+        parser.add_argument('--threads', type=int, default=8,
+                            help='Number of WSGI workers, each of them serves one client at a time')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of random generator')
+
+    @staticmethod
+    def _seed(rooms_count: int, rng: random.Random) -> tuple[list[int], Token]:
+        """Method to create rooms and user with token"""
+        start = timezone.now()
+        rooms: list[Room] = Room.objects.bulk_create(
+            (Room(number=i, name=f'Room {i}', price=rng.randint(20, 500), beds=rng.randint(1, 4),
+                  available_from=start) for i in range(rooms_count)),
+            batch_size=BATCH_SIZE,
+        )
+        user: User = User.objects.create_user(username=f'bench-{time.time_ns()}')
+        return [room.pk for room in rooms], Token.objects.create(user=user)
+
+    @staticmethod
+    def _run_wsgi(requests: list[tuple[str, str, str]], headers: dict,
+                  concurrency: int, threads: int) -> dict[str, list[float]]:
+        """Method to send requests to sync views by concurrent clients.\n
+        Only `threads` of them are served at once, the rest wait for a free worker
+        as they do in front of WSGI server, and waiting is counted in latency."""
+        timings: dict[str, list[float]] = {endpoint: [] for endpoint in MIX}
+        pending: Iterator[tuple[str, str, str]] = iter(requests)
+        lock = threading.Lock()
+        workers = threading.BoundedSemaphore(threads)
+        errors: list[str] = []
+
+        def run_client() -> None:
+            client = Client(headers=headers)
+            try:
+                while True:
+                    with lock:
+                        request: tuple[str, str, str] | None = next(pending, None)
+                    if request is None:
+                        return
+                    endpoint, method, path = request
+                    started: float = time.perf_counter()
+                    with workers:
+                        response = getattr(client, method)(path)
+                    timings[endpoint].append((time.perf_counter() - started) * 1000)
+                    if response.status_code >= 400:
+                        errors.append(f'{path}: {response.status_code}')
+            finally:
+                connections.close_all()
+
+        clients: list[threading.Thread] = [threading.Thread(target=run_client) for _ in range(concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+
+        if errors:
+            raise CommandError(f'Requests failed: {errors[:5]}')
+        return timings
+
+    @staticmethod
+    async def _run_asgi(requests: list[tuple[str, str, str]], headers: dict,
+                        concurrency: int) -> dict[str, list[float]]:
+        """Method to send requests to async views by concurrent clients on the event loop"""
+        timings: dict[str, list[float]] = {endpoint: [] for endpoint in MIX}
+        pending: Iterator[tuple[str, str, str]] = iter(requests)
+        client = AsyncClient()
+        errors: list[str] = []
+
+        async def run_client() -> None:
+            for endpoint, method, path in pending:
+                path = path.replace('/api/', '/api/async/', 1)
+                started: float = time.perf_counter()
+                # Default headers aren't sent by async client, so they are passed with every request
+                response = await getattr(client, method)(path, headers=headers)
+                timings[endpoint].append((time.perf_counter() - started) * 1000)
+                if response.status_code >= 400:
+                    errors.append(f'{path}: {response.status_code}')
+
+        try:
+            await asyncio.gather(*(run_client() for _ in range(concurrency)))
+        finally:
+            await sync_to_async(connections.close_all)()
+
+        if errors:
+            raise CommandError(f'Requests failed: {errors[:5]}')
+        return timings
+
+    def _report(self, deployment: str, timings: dict[str, list[float]], elapsed: float) -> None:
+        """Method to write throughput and percentiles of every endpoint"""
+        total: int = sum(len(endpoint_timings) for endpoint_timings in timings.values())
+        self.stdout.write(f'{deployment}: {total} requests in {elapsed:.2f} s, {total / elapsed:.0f} req/s')
+
+        for endpoint, endpoint_timings in timings.items():
+            if not endpoint_timings:
+                continue
+            endpoint_timings = sorted(endpoint_timings)
+            self.stdout.write(f'{endpoint:>10}: p50 {statistics.median(endpoint_timings):.2f} ms, '
+                              f'p95 {endpoint_timings[int(len(endpoint_timings) * 0.95) - 1]:.2f} ms, '
+                              f'max {endpoint_timings[-1]:.2f} ms')
+
+    def handle(self, *args, **options) -> None:
+        if min(options['rooms'], options['requests'], options['concurrency'], options['threads']) <= 0:
+            raise CommandError('Numbers of rooms, requests, clients and threads must be positive')
+
+        rng = random.Random(options['seed'])
+        pks, token = self._seed(options['rooms'], rng)
+        headers: dict = {'AUTHORIZATION': f'Token {token.key}'}
+        requests: list[tuple[str, str, str]] = make_requests(options['requests'], pks, options['seed'])
+
+        try:
+            # Host of test clients is allowed, as command runs outside of test runner
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                started: float = time.perf_counter()
+                timings: dict[str, list[float]] = self._run_wsgi(requests, headers, options['concurrency'],
+                                                                 options['threads'])
+                self._report(f'WSGI, {options["threads"]} threads', timings, time.perf_counter() - started)
+
+                Room.objects.filter(pk__in=pks).update(booked=False, booked_by=None)
+
+                started = time.perf_counter()
+                timings = asyncio.run(self._run_asgi(requests, headers, options['concurrency']))
+                self._report('ASGI, event loop', timings, time.perf_counter() - started)
+        finally:
+            for start in range(0, len(pks), BATCH_SIZE):
+                Room.objects.filter(pk__in=pks[start:start + BATCH_SIZE]).delete()
+            token.user.delete()
@@ -0,0 +1,132 @@
+"""Command to benchmark search of rooms available for a period"""
+import datetime
+import random
+import statistics
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from django.http import QueryDict
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from booking.models import Booking, Room
+from booking.pagination import KeysetPagination
+from booking.views import make_available_queryset
+
+BATCH_SIZE = 10000
+
+
+class Command(BaseCommand):
+    """Command to seed rooms and bookings and time availability searches.\n
+    Everything is done in a transaction rolled back at the end, so database is left as it was.
+    Plan of the last search is shown, on PostgreSQL command fails if bookings aren't probed by index of room."""
+    help = 'Seeds rooms and bookings and measures latency of availability search'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--rooms', type=int, default=100000, help='Number of rooms to seed')
+        parser.add_argument('--bookings', type=int, default=1000000, help='Number of bookings to seed')
+        parser.add_argument('--searches', type=int, default=200, help='Number of searches to time')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of random generator')
+
+    def _seed(self, rooms_count: int, bookings_count: int, start: datetime.datetime) -> None:
+        """Method to create rooms and non-overlapping bookings spread over a year"""
+        user: User = User.objects.create_user(username=f'bench-{time.time_ns()}')
+        rooms: list[Room] = Room.objects.bulk_create(
+            (Room(number=i, name=f'Room {i}', price=random.randint(20, 500), beds=random.randint(1, 4),
+                  available_from=start) for i in range(rooms_count)),
+            batch_size=BATCH_SIZE,
+        )
+
+        per_room: int = bookings_count // rooms_count
+        # Stays are 3 days long on average, gaps fill the rest of the year
+        max_gap: int = max(0, 2 * (365 // max(per_room, 1) - 3))
+        batch: list[Booking] = []
+
+        for room in rooms:
+            check_in: datetime.datetime = start
+            for _ in range(per_room):
+                check_in += datetime.timedelta(days=random.randint(0, max_gap))
+                check_out: datetime.datetime = check_in + datetime.timedelta(days=random.randint(1, 5))
+                batch.append(Booking(room=room, user=user, check_in=check_in, check_out=check_out))
+                check_in = check_out
+
+            if len(batch) >= BATCH_SIZE:
+                Booking.objects.bulk_create(batch)
+                batch = []
+
+        Booking.objects.bulk_create(batch)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute(f'ANALYZE {Room._meta.db_table}, {Booking._meta.db_table}')
+
+    @staticmethod
+    def _timed(db_time: list[float], execute, sql, params, many, context):
+        """Method to measure time of executed query"""
+        started: float = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            db_time.append(time.perf_counter() - started)
+
+    @staticmethod
+    def _explain(params: dict) -> str:
+        """Method to get plan of search as view makes it, the first page in default ordering"""
+        ordering: str = KeysetPagination.default_ordering
+        queryset = make_available_queryset(QueryDict(urlencode(params))).order_by(ordering, 'id')
+        plan_options: dict = {'analyze': True} if connection.vendor == 'postgresql' else {}
+        return queryset[:settings.BOOKING_PAGE_SIZE + 1].explain(**plan_options)
+
+    def _report(self, name: str, timings: list[float]) -> None:
+        """Method to write percentiles of timings"""
+        timings = sorted(timings)
+        self.stdout.write(f'{name:>10}: p50 {statistics.median(timings):.2f} ms, '
+                          f'p95 {timings[int(len(timings) * 0.95) - 1]:.2f} ms, '
+                          f'max {timings[-1]:.2f} ms')
+
+    def handle(self, *args, **options) -> None:
+        random.seed(options['seed'])
+        start: datetime.datetime = timezone.now().replace(hour=12, minute=0, second=0, microsecond=0)
+        # Host allowed by default settings is used, as command runs outside of test runner
+        client = APIClient(SERVER_NAME='localhost')
+
+        with transaction.atomic():
+            started: float = time.perf_counter()
+            self._seed(options['rooms'], options['bookings'], start)
+            self.stdout.write(f'Seeded {options["rooms"]} rooms and {options["bookings"]} bookings '
+                              f'in {time.perf_counter() - started:.1f} s')
+
+            timings: list[float] = []
+            db_timings: list[float] = []
+            for _ in range(options['searches']):
+                check_in: datetime.datetime = start + datetime.timedelta(days=random.randint(0, 365))
+                params: dict = {
+                    'check_in': check_in.isoformat(),
+                    'check_out': (check_in + datetime.timedelta(days=random.randint(1, 7))).isoformat(),
+                    'beds_from': random.randint(1, 4),
+                    'price_to': random.randint(50, 500),
+                }
+
+                db_time: list[float] = []
+                started = time.perf_counter()
+                with connection.execute_wrapper(lambda execute, *args: self._timed(db_time, execute, *args)):
+                    response = client.get(f'/api/booking/available/?{urlencode(params)}')
+                timings.append((time.perf_counter() - started) * 1000)
+                db_timings.append(sum(db_time) * 1000)
+                if response.status_code != 200:
+                    raise CommandError(f'Search failed: {response.content.decode()}')
+
+            self.stdout.write(f'Searches: {len(timings)}')
+            self._report('request', timings)
+            self._report('database', db_timings)
+
+            plan: str = self._explain(params)
+            self.stdout.write(f'Plan of search ?{urlencode(params)}:\n{plan}')
+            if connection.vendor == 'postgresql' and f'Seq Scan on {Booking._meta.db_table}' in plan:
+                raise CommandError('Bookings are scanned sequentially instead of being probed by room')
+
+            transaction.set_rollback(True)
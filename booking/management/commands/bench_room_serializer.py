@@ -0,0 +1,77 @@
+"""Command to compare serialization paths of room lists"""
+import datetime
+import time
+from typing import Callable
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.db.models import QuerySet
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from booking.models import Room
+from booking.serializers import RoomSerializer
+
+BATCH_SIZE = 10000
+
+
+def make_rooms(count: int) -> list[Room]:
+    """Function to make unsaved room instances"""
+    start: datetime.datetime = timezone.now()
+    return [
+        Room(number=i, name=f'Room {i}', price=round(50 + i % 500 * 1.5, 2), beds=i % 4 + 1,
+             booked=i % 3 == 0, available_from=start + datetime.timedelta(minutes=i))
+        for i in range(1, count + 1)
+    ]
+
+
+def measure(func: Callable[[], bytes], repeat: int) -> tuple[float, bytes]:
+    """Function to get best time of several runs and output of the last one"""
+    best: float = float('inf')
+    output: bytes = b''
+
+    for _ in range(repeat):
+        started: float = time.perf_counter()
+        output = func()
+        best = min(best, time.perf_counter() - started)
+
+    return best, output
+
+
+class Command(BaseCommand):
+    """Command to benchmark `RoomSerializer` of instances against `values()` rows path of room list views.\n
+    Both paths read rooms from database, rows are read by the same `values()` query as views make.
+    Rooms are seeded in a transaction rolled back at the end, so database is left as it was."""
+    help = 'Compares time of reading and rendering room lists by serializer and by values() rows'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1000, 10000, 100000],
+                            help='Numbers of rooms to render')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement')
+
+    def handle(self, *args, **options) -> None:
+        renderer = JSONRenderer()
+
+        with transaction.atomic():
+            rooms: list[Room] = Room.objects.bulk_create(make_rooms(max(options['sizes'])), batch_size=BATCH_SIZE)
+            queryset: QuerySet[Room] = Room.objects.filter(pk__gte=rooms[0].pk).order_by('id')
+            self.stdout.write(f'{"rooms":>8} {"serializer, s":>14} {"values, s":>10} {"speed-up":>9}')
+
+            for size in options['sizes']:
+                def serializer_path() -> bytes:
+                    return renderer.render(RoomSerializer(queryset[:size], many=True).data)
+
+                def values_path() -> bytes:
+                    rows: list[dict] = list(queryset.values(*RoomSerializer.values_fields)[:size])
+                    return renderer.render(RoomSerializer.represent_rows(rows))
+
+                serializer_time, expected = measure(serializer_path, options['repeat'])
+                values_time, output = measure(values_path, options['repeat'])
+
+                if output != expected:
+                    raise CommandError(f'Outputs differ for {size} rooms')
+
+                self.stdout.write(f'{size:>8} {serializer_time:>14.4f} {values_time:>10.4f} '
+                                  f'{serializer_time / values_time:>8.1f}x')
+
+            transaction.set_rollback(True)
@@ -0,0 +1,40 @@
+"""Command to build OpenAPI schema served by `views.SchemaView`"""
+import difflib
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+
+from booking.schema import generate_schema, read_schema
+
+# Number of lines of diff shown on schema drift
+DIFF_LINES = 50
+
+
+class Command(BaseCommand):
+    """Command to generate schema and store it in `BOOKING_SCHEMA_FILE`, or compare it with the stored one"""
+    help = 'Builds OpenAPI schema of API into BOOKING_SCHEMA_FILE'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if generated schema differs from the stored one instead of storing it')
+
+    def handle(self, *args, **options) -> None:
+        generated: bytes = generate_schema()
+
+        if not options['check']:
+            with open(settings.BOOKING_SCHEMA_FILE, 'wb') as file:
+                file.write(generated)
+            self.stdout.write(self.style.SUCCESS(f'Schema is stored in {settings.BOOKING_SCHEMA_FILE}'))
+            return
+
+        stored: bytes | None = read_schema()
+        if stored == generated:
+            self.stdout.write(self.style.SUCCESS('Stored schema is up to date'))
+            return
+
+        diff: list[str] = list(difflib.unified_diff(
+            (stored or b'').decode().splitlines(), generated.decode().splitlines(),
+            'stored', 'generated', lineterm='',
+        ))
+        raise CommandError('Stored schema differs from generated one, run "manage.py build_schema":\n'
+                           + '\n'.join(diff[:DIFF_LINES]))
@@ -0,0 +1,103 @@
+"""Command to show query plans of documented room filters"""
+import re
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, transaction
+from django.db.models import QuerySet
+from django.http import QueryDict
+
+from booking.filters import make_room_query
+from booking.models import Room
+
+# Documented filter combinations of `RoomListView` that must be index-backed
+FILTER_COMBINATIONS: dict[str, str] = {
+    'price': 'price_from=100&price_to=500',
+    'beds': 'beds_from=2&beds_to=4',
+    'available': 'available_from=2024-01-01T00:00:00Z&available_to=2024-02-01T00:00:00Z',
+    'price_beds': 'price_from=100&price_to=500&beds_from=2',
+    'vacant': 'vacant',
+    'vacant_price': 'price_from=100&price_to=500&vacant',
+    'vacant_beds': 'beds_from=2&beds_to=4&vacant',
+    'vacant_price_beds': 'price_from=100&price_to=500&beds_from=2&vacant',
+    'vacant_available': 'available_from=2024-01-01T00:00:00Z&vacant',
+    # Top-k queries must read rooms in index order and stop at limit
+    'top_price': 'ordering=price&limit=10',
+    'top_beds': 'ordering=-beds&limit=10',
+    'top_available': 'ordering=available_from&limit=10',
+    'top_vacant_price_beds': 'beds_from=2&vacant&ordering=price&limit=10',
+    'top_vacant_beds': 'vacant&ordering=-beds&limit=10',
+    'top_vacant_available': 'price_to=500&vacant&ordering=available_from&limit=10',
+}
+
+# Line of PostgreSQL plan sorting rows of the whole filtered set
+SORT_PATTERN: re.Pattern = re.compile(r'(^|->\s+)(Incremental )?Sort\s')
+
+
+def is_sequential_scan(plan: str) -> bool:
+    """Function to check if plan reads `booking_room` table without an index"""
+    table: str = Room._meta.db_table
+
+    for line in plan.splitlines():
+        if connection.vendor == 'postgresql' and 'Seq Scan' in line and table in line:
+            return True
+        if connection.vendor == 'sqlite' and f'SCAN {table}' in line and 'INDEX' not in line:
+            return True
+
+    return False
+
+
+def is_sorted(plan: str) -> bool:
+    """Function to check if plan sorts rows instead of reading them in index order.\n
+    SQLite picks between filter and ordering indexes by heuristics without statistics, so it isn't checked."""
+    return connection.vendor == 'postgresql' and any(SORT_PATTERN.search(line.strip()) for line in plan.splitlines())
+
+
+def explain_combination(params: str) -> str:
+    """Function to get query plan of filter combination given as query string.\n
+    `ordering` and `limit` params are applied the same way as by `pagination.KeysetPagination`."""
+    query: QueryDict = QueryDict(params)
+    queryset: QuerySet[Room] = Room.objects.filter(make_room_query(query))
+    if 'ordering' in query:
+        ordering: str = query['ordering']
+        queryset = queryset.order_by(ordering, '-id' if ordering.startswith('-') else 'id')[:int(query['limit'])]
+
+    with transaction.atomic():
+        if connection.vendor == 'postgresql':
+            # Planner prefers sequential scan on small tables, so it is disabled
+            # to check whether an index is able to serve the query at all
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+                # The same way sort is disabled to check whether an index is able to give rows in order
+                if 'ordering' in query:
+                    cursor.execute('SET LOCAL enable_sort = off')
+        return queryset.explain()
+
+
+class Command(BaseCommand):
+    """Command to run EXPLAIN for each documented filter combination"""
+    help = 'Shows query plans of documented room filter combinations'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('combinations', nargs='*',
+                            help='Combinations to explain, all of them by default')
+        parser.add_argument('--check', action='store_true',
+                            help='Fail if any combination runs as a sequential scan')
+
+    def handle(self, *args, **options) -> None:
+        names: list[str] = options['combinations'] or list(FILTER_COMBINATIONS)
+        failed: list[str] = []
+
+        unknown: list[str] = [name for name in names if name not in FILTER_COMBINATIONS]
+        if unknown:
+            raise CommandError(f'Unknown combinations: {", ".join(unknown)}')
+
+        for name in names:
+            plan: str = explain_combination(FILTER_COMBINATIONS[name])
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{name}: ?{FILTER_COMBINATIONS[name]}'))
+            self.stdout.write(plan)
+
+            if is_sequential_scan(plan) or ('ordering' in FILTER_COMBINATIONS[name] and is_sorted(plan)):
+                failed.append(name)
+
+        if options['check'] and failed:
+            raise CommandError(f'Sequential scan or sort in: {", ".join(failed)}')
@@ -0,0 +1,283 @@
+"""Command to import rooms from CSV or NDJSON file"""
+import csv
+import datetime
+import json
+import math
+import sys
+import time
+from typing import Any, Callable, Iterator, TextIO
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, models, transaction
+from django.utils import timezone
+
+from booking.models import Room
+from booking.signals import send_inventory_changed
+
+# Imported fields in order of values of converted rows and if they are required
+FIELDS: dict[str, bool] = {
+    'number': True,
+    'name': True,
+    'price': True,
+    'beds': True,
+    'booked': False,
+    'available_from': True,
+}
+
+TRUE_VALUES: frozenset = frozenset({'1', 'true', 't', 'yes', 'y'})
+FALSE_VALUES: frozenset = frozenset({'0', 'false', 'f', 'no', 'n', ''})
+
+# Fields left as they are by upsert, booking state of existing rooms isn't changed by import
+KEPT_ON_UPSERT: tuple[str, ...] = ('booked',)
+
+STAGING_TABLE = 'booking_room_import'
+
+
+def make_converter(field: models.Field) -> Callable[[Any], Any]:
+    """Function to make converter of raw value into value of model field checking its constraints.\n
+    Field's own `clean()` is too slow for bulk import, so constraints are checked directly."""
+    if isinstance(field, models.CharField):
+        def convert(value: Any) -> str:
+            value = str(value)
+            if len(value) > field.max_length:
+                raise ValueError(f'longer than {field.max_length} characters')
+            return value
+    elif isinstance(field, models.PositiveIntegerField):
+        def convert(value: Any) -> int:
+            if isinstance(value, float) or isinstance(value, bool):
+                raise ValueError('not an integer')
+            value = int(value)
+            if value < 0:
+                raise ValueError('negative')
+            return value
+    elif isinstance(field, models.FloatField):
+        def convert(value: Any) -> float:
+            if isinstance(value, bool):
+                raise ValueError('not a number')
+            value = float(value)
+            if not math.isfinite(value):
+                raise ValueError('not a finite number')
+            return value
+    elif isinstance(field, models.BooleanField):
+        def convert(value: Any) -> bool:
+            if isinstance(value, bool):
+                return value
+            value = str(value).strip().lower()
+            if value in TRUE_VALUES:
+                return True
+            if value in FALSE_VALUES:
+                return False
+            raise ValueError('not a boolean')
+    elif isinstance(field, models.DateTimeField):
+        zone = timezone.get_current_timezone()
+
+        def convert(value: Any) -> datetime.datetime:
+            value = datetime.datetime.fromisoformat(value)
+            return value if value.tzinfo is not None else value.replace(tzinfo=zone)
+    else:
+        raise TypeError(f'Import of {type(field).__name__} is not supported')
+
+    return convert
+
+
+def read_csv(file: TextIO) -> Iterator[tuple[int, dict]]:
+    """Function to read (line number, row) pairs of CSV file with header"""
+    reader = csv.reader(file)
+    header: list[str] = next(reader, [])
+
+    for row in reader:
+        if row:
+            yield reader.line_num, dict(zip(header, row))
+
+
+def read_ndjson(file: TextIO) -> Iterator[tuple[int, dict]]:
+    """Function to read (line number, row) pairs of newline-delimited JSON file"""
+    for line_number, line in enumerate(file, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            row = error
+        yield line_number, row
+
+
+READERS: dict[str, Callable[[TextIO], Iterator[tuple[int, dict]]]] = {
+    'csv': read_csv,
+    'ndjson': read_ndjson,
+}
+
+
+class Command(BaseCommand):
+    """Command to stream rooms from file, validate them in batches and insert or upsert them.\n
+    Whole import is a single transaction, so nothing is imported if it fails.
+    On PostgreSQL batches are copied into a staging table and moved from it by single statements,
+    elsewhere `bulk_create()` and `bulk_update()` are used.
+    Rooms aren't announced one by one, caches and indexes of inventory are reset once import is committed."""
+    help = 'Imports rooms from CSV or NDJSON file'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('path', help='File to import, "-" for standard input')
+        parser.add_argument('--format', choices=list(READERS),
+                            help='Format of file, guessed by extension by default')
+        parser.add_argument('--batch-size', type=int, default=10000, help='Number of rooms written at once')
+        parser.add_argument('--upsert', action='store_true',
+                            help='Update rooms with the same number instead of adding new ones, '
+                                 'their booking state is kept')
+        parser.add_argument('--method', choices=['auto', 'copy', 'bulk'], default='auto',
+                            help='Use COPY (PostgreSQL only) or bulk_create, COPY is used if available by default')
+        parser.add_argument('--skip-invalid', action='store_true',
+                            help='Skip invalid rows instead of failing')
+
+    def _convert(self, batch: list[tuple[int, dict]], converters: dict[str, Callable],
+                 errors: list[str]) -> list[tuple]:
+        """Method to validate batch of rows, messages of invalid ones are added to errors"""
+        rows: list[tuple] = []
+
+        for line_number, row in batch:
+            if not isinstance(row, dict):
+                errors.append(f'line {line_number}: invalid row')
+                continue
+
+            values: list = []
+            for field, convert in converters.items():
+                value = row.get(field)
+                try:
+                    if value is None or value == '':
+                        if FIELDS[field]:
+                            raise ValueError('required')
+                        value = Room._meta.get_field(field).get_default()
+                    else:
+                        value = convert(value)
+                except (TypeError, ValueError) as error:
+                    errors.append(f'line {line_number}: {field}: {error}')
+                    break
+                values.append(value)
+            else:
+                rows.append(tuple(values))
+
+        return rows
+
+    @staticmethod
+    def _deduplicate(rows: list[tuple]) -> list[tuple]:
+        """Method to keep the last row of every number, as they would overwrite each other"""
+        return list({row[0]: row for row in rows}.values())
+
+    @staticmethod
+    def _create_staging_table() -> None:
+        """Method to create staging table, which is dropped on rollback of import"""
+        columns: str = ', '.join(f'{field} {Room._meta.get_field(field).db_type(connection)}' for field in FIELDS)
+        with connection.cursor() as cursor:
+            cursor.execute(f'CREATE TEMPORARY TABLE {STAGING_TABLE} ({columns})')
+
+    @staticmethod
+    def _drop_staging_table() -> None:
+        """Method to drop staging table, it isn't left to ON COMMIT DROP, as import may run in outer transaction"""
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE {STAGING_TABLE}')
+
+    def _write_copy(self, rows: list[tuple], upsert: bool) -> None:
+        """Method to write batch by copying it into staging table and moving it to rooms table"""
+        table: str = Room._meta.db_table
+        columns: str = ', '.join(FIELDS)
+
+        with connection.cursor() as cursor:
+            cursor.execute(f'TRUNCATE {STAGING_TABLE}')
+            with cursor.copy(f'COPY {STAGING_TABLE} ({columns}) FROM STDIN') as copy:
+                for row in rows:
+                    copy.write_row(row)
+            # Temporary tables aren't analyzed automatically, without statistics joins are planned badly
+            cursor.execute(f'ANALYZE {STAGING_TABLE}')
+
+            if upsert:
+                assignments: str = ', '.join(f'{field} = staged.{field}' for field in FIELDS
+                                             if field not in KEPT_ON_UPSERT)
+                cursor.execute(f'UPDATE {table} AS room SET {assignments}, version = room.version + 1 '
+                               f'FROM {STAGING_TABLE} AS staged WHERE room.number = staged.number')
+                condition: str = (f'WHERE NOT EXISTS (SELECT 1 FROM {table} AS room '
+                                  f'WHERE room.number = staged.number)')
+            else:
+                condition = ''
+
+            cursor.execute(f'INSERT INTO {table} ({columns}, version) '
+                           f'SELECT {columns}, 1 FROM {STAGING_TABLE} AS staged {condition}')
+
+    @staticmethod
+    def _write_bulk(rows: list[tuple], upsert: bool) -> None:
+        """Method to write batch by a single UPDATE executed for every existing room and `bulk_create()`.\n
+        `bulk_update()` isn't used, as building its CASE expressions is much slower than the update itself."""
+        rooms: list[Room] = [Room(**dict(zip(FIELDS, row))) for row in rows]
+
+        if upsert:
+            fields: list[models.Field] = [Room._meta.get_field(field) for field in FIELDS
+                                          if field not in KEPT_ON_UPSERT]
+            numbers: dict[int, Room] = {room.number: room for room in rooms}
+            params: list[list] = []
+            existing: set[int] = set()
+            for pk, number in Room.objects.filter(number__in=numbers).values_list('id', 'number'):
+                room: Room = numbers[number]
+                existing.add(number)
+                params.append([field.get_db_prep_save(getattr(room, field.attname), connection) for field in fields]
+                              + [pk])
+
+            assignments: str = ', '.join(f'{field.column} = %s' for field in fields)
+            with connection.cursor() as cursor:
+                cursor.executemany(f'UPDATE {Room._meta.db_table} SET {assignments}, version = version + 1 '
+                                   f'WHERE id = %s', params)
+            rooms = [room for room in rooms if room.number not in existing]
+
+        Room.objects.bulk_create(rooms)
+
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        use_copy: bool = options['method'] == 'copy' or (options['method'] == 'auto'
+                                                         and connection.vendor == 'postgresql')
+        if use_copy and connection.vendor != 'postgresql':
+            raise CommandError('COPY is supported on PostgreSQL only')
+
+        path: str = options['path']
+        file_format: str | None = options['format'] or path.rpartition('.')[2].lower()
+        if file_format not in READERS:
+            raise CommandError('Format of file is unknown, set it by --format')
+
+        converters: dict[str, Callable] = {field: make_converter(Room._meta.get_field(field)) for field in FIELDS}
+        write: Callable[[list[tuple], bool], None] = self._write_copy if use_copy else self._write_bulk
+        errors: list[str] = []
+        imported: int = 0
+        started: float = time.perf_counter()
+
+        file: TextIO = sys.stdin if path == '-' else open(path, encoding='utf-8', newline='')
+        try:
+            with transaction.atomic():
+                if use_copy:
+                    self._create_staging_table()
+
+                rows: Iterator[tuple[int, dict]] = READERS[file_format](file)
+                while batch := [row for _, row in zip(range(options['batch_size']), rows)]:
+                    converted: list[tuple] = self._convert(batch, converters, errors)
+                    if errors and not options['skip_invalid']:
+                        raise CommandError('Invalid rows, nothing is imported:\n' + '\n'.join(errors[:20]))
+
+                    if options['upsert']:
+                        converted = self._deduplicate(converted)
+
+                    write(converted, options['upsert'])
+                    imported += len(converted)
+
+                    if options['verbosity'] >= 1:
+                        elapsed: float = time.perf_counter() - started
+                        self.stdout.write(f'Imported {imported} rooms, {imported / elapsed:.0f} rooms/s')
+
+                if use_copy:
+                    self._drop_staging_table()
+                if imported:
+                    send_inventory_changed()
+        finally:
+            if file is not sys.stdin:
+                file.close()
+
+        if errors:
+            self.stdout.write(f'Skipped {len(errors)} invalid rows:\n' + '\n'.join(errors[:20]))
+        self.stdout.write(self.style.SUCCESS(f'Imported {imported} rooms in {time.perf_counter() - started:.1f} s'))
@@ -0,0 +1,245 @@
+"""Command to load-test booking API in-process"""
+import datetime
+import json
+import math
+import random
+import threading
+import time
+from typing import Iterator
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import connection, connections, transaction
+from django.test import Client, override_settings
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+
+from booking.models import Booking, Room
+from booking.signals import send_inventory_changed
+
+BATCH_SIZE = 10000
+
+ENDPOINTS: tuple[str, ...] = ('list', 'detail', 'book', 'booked')
+
+DEFAULT_MIX = 'list=50,detail=35,book=10,booked=5'
+
+
+def parse_mix(value: str) -> dict[str, int]:
+    """Function to parse `endpoint=weight` pairs separated by commas"""
+    mix: dict[str, int] = {}
+
+    for item in value.split(','):
+        endpoint, _, weight = item.partition('=')
+        if endpoint not in ENDPOINTS or not weight.isdigit():
+            raise CommandError(f'Invalid mix item "{item}", expected <endpoint>=<weight> '
+                               f'with endpoint one of: {", ".join(ENDPOINTS)}')
+        mix[endpoint] = int(weight)
+
+    if not sum(mix.values()):
+        raise CommandError('Mix must have positive weight')
+
+    return mix
+
+
+def make_list_path(rng: random.Random, start: datetime.datetime) -> str:
+    """Function to make path of room list with a random combination of filters"""
+    params: list[str] = []
+
+    if rng.random() < 0.6:
+        price: int = rng.randint(20, 500)
+        params.append(f'price_from={price}&price_to={price + rng.randint(10, 200)}')
+    if rng.random() < 0.5:
+        beds: int = rng.randint(1, 4)
+        params.append(f'beds_from={beds}&beds_to={rng.randint(beds, 4)}')
+    if rng.random() < 0.2:
+        available: datetime.datetime = start + datetime.timedelta(days=rng.randint(0, 30))
+        params.append(f'available_to={available.strftime("%Y-%m-%dT%H:%M:%SZ")}')
+    if rng.random() < 0.5:
+        params.append('vacant')
+
+    return f'/api/booking/?{"&".join(params + ["page_size=20"])}'
+
+
+def percentile(timings: list[float], share: float) -> float:
+    """Function to get nearest-rank percentile of sorted timings"""
+    return timings[max(0, math.ceil(share * len(timings)) - 1)]
+
+
+class Command(BaseCommand):
+    """Command to seed rooms and users and send a mix of requests by concurrent clients.\n
+    Requests are handled in-process by the sync views, every client has its own thread and DB connection.
+    Book requests of all users go to a small set of hot rooms, so they compete with each other.
+    Seeded rooms and users are deleted at the end."""
+    help = 'Load-tests booking API in-process and reports throughput, latency and queries per endpoint as JSON'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--rooms', type=int, default=10000, help='Number of rooms to seed')
+        parser.add_argument('--users', type=int, default=50, help='Number of users with tokens to seed')
+        parser.add_argument('--hot-rooms', type=int, default=20, help='Number of rooms book requests go to')
+        parser.add_argument('--requests', type=int, default=5000, help='Number of requests to send')
+        parser.add_argument('--concurrency', type=int, default=16, help='Number of concurrent clients')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Weights of endpoints, "{DEFAULT_MIX}" by default')
+        parser.add_argument('--seed', type=int, default=0, help='Seed of random generator')
+        parser.add_argument('--output', help='File to write report to, standard output by default')
+
+    @staticmethod
+    def _seed(rooms_count: int, users_count: int, rng: random.Random,
+              start: datetime.datetime) -> tuple[list[int], list[Token]]:
+        """Method to create rooms and users with tokens"""
+        rooms: list[Room] = Room.objects.bulk_create(
+            (Room(number=i, name=f'Room {i}', price=rng.randint(20, 500), beds=rng.randint(1, 4),
+                  available_from=start + datetime.timedelta(days=rng.randint(0, 30))) for i in range(rooms_count)),
+            batch_size=BATCH_SIZE,
+        )
+        prefix: str = f'loadtest-{time.time_ns()}'
+        users: list[User] = User.objects.bulk_create(User(username=f'{prefix}-{i}') for i in range(users_count))
+        tokens: list[Token] = [Token.objects.create(user=user) for user in users]
+        return [room.pk for room in rooms], tokens
+
+    @staticmethod
+    def _clean_up(pks: list[int], tokens: list[Token]) -> None:
+        """Method to delete seeded rooms and users.\n
+        Rooms are deleted by plain DELETE statements, as `delete()` of query set loads them to send `post_delete`
+        for every room, which announces rooms one by one. Changed inventory is announced once instead."""
+        with transaction.atomic():
+            for offset in range(0, len(pks), BATCH_SIZE):
+                batch: list[int] = pks[offset:offset + BATCH_SIZE]
+                Booking.objects.filter(room__in=batch).delete()
+                Room.objects.filter(pk__in=batch)._raw_delete(Room.objects.db)
+            User.objects.filter(pk__in=[token.user_id for token in tokens]).delete()
+            send_inventory_changed()
+
+    @staticmethod
+    def _make_requests(options: dict, pks: list[int], tokens: list[Token],
+                       rng: random.Random, start: datetime.datetime) -> list[tuple[str, str, str, str]]:
+        """Method to make (endpoint, method, path, token) requests"""
+        mix: dict[str, int] = parse_mix(options['mix'])
+        hot_rooms: list[int] = pks[:options['hot_rooms']]
+        requests: list[tuple[str, str, str, str]] = []
+
+        for endpoint in rng.choices(list(mix), weights=list(mix.values()), k=options['requests']):
+            token: str = rng.choice(tokens).key
+            if endpoint == 'list':
+                requests.append((endpoint, 'get', make_list_path(rng, start), token))
+            elif endpoint == 'detail':
+                requests.append((endpoint, 'get', f'/api/booking/{rng.choice(pks)}/', token))
+            elif endpoint == 'book':
+                requests.append((endpoint, 'patch', f'/api/booking/{rng.choice(hot_rooms)}/book', token))
+            else:
+                requests.append((endpoint, 'get', '/api/booking/booked/', token))
+
+        return requests
+
+    @staticmethod
+    def _run(requests: list[tuple[str, str, str, str]], concurrency: int) -> list[tuple[str, float, int, int]]:
+        """Method to send requests by concurrent clients, giving (endpoint, ms, queries, status) of each one"""
+        pending: Iterator[tuple[str, str, str, str]] = iter(requests)
+        lock = threading.Lock()
+        results: list[tuple[str, float, int, int]] = []
+
+        def count(queries: list[int], execute, sql, params, many, context):
+            queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def run_client() -> None:
+            client = Client()
+            try:
+                while True:
+                    with lock:
+                        request: tuple[str, str, str, str] | None = next(pending, None)
+                    if request is None:
+                        return
+                    endpoint, method, path, token = request
+                    queries: list[int] = [0]
+
+                    started: float = time.perf_counter()
+                    with connection.execute_wrapper(lambda *args: count(queries, *args)):
+                        response = getattr(client, method)(path, HTTP_AUTHORIZATION=f'Token {token}')
+                    elapsed: float = (time.perf_counter() - started) * 1000
+
+                    results.append((endpoint, elapsed, queries[0], response.status_code))
+            finally:
+                connections.close_all()
+
+        clients: list[threading.Thread] = [threading.Thread(target=run_client) for _ in range(concurrency)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+
+        return results
+
+    @staticmethod
+    def _summarize(results: list[tuple[str, float, int, int]], duration: float) -> dict:
+        """Method to get throughput, latency percentiles, query counts and statuses of every endpoint"""
+        endpoints: dict[str, dict] = {}
+
+        for endpoint in ENDPOINTS:
+            rows: list[tuple[str, float, int, int]] = [row for row in results if row[0] == endpoint]
+            if not rows:
+                continue
+
+            timings: list[float] = sorted(row[1] for row in rows)
+            queries: list[int] = [row[2] for row in rows]
+            statuses: dict[str, int] = {}
+            for row in rows:
+                statuses[str(row[3])] = statuses.get(str(row[3]), 0) + 1
+
+            endpoints[endpoint] = {
+                'requests': len(rows),
+                'throughput': round(len(rows) / duration, 1),
+                'latency_ms': {
+                    'p50': round(percentile(timings, 0.5), 3),
+                    'p95': round(percentile(timings, 0.95), 3),
+                    'p99': round(percentile(timings, 0.99), 3),
+                    'max': round(timings[-1], 3),
+                },
+                'queries': {
+                    'mean': round(sum(queries) / len(queries), 2),
+                    'max': max(queries),
+                },
+                'statuses': dict(sorted(statuses.items())),
+            }
+
+        return {
+            'requests': len(results),
+            'duration_s': round(duration, 3),
+            'throughput': round(len(results) / duration, 1),
+            'endpoints': endpoints,
+        }
+
+    def handle(self, *args, **options) -> None:
+        for option in ('rooms', 'users', 'hot_rooms', 'requests', 'concurrency'):
+            if options[option] <= 0:
+                raise CommandError(f'--{option.replace("_", "-")} must be positive')
+
+        rng = random.Random(options['seed'])
+        start: datetime.datetime = timezone.now().replace(microsecond=0)
+        pks, tokens = self._seed(options['rooms'], options['users'], rng, start)
+
+        try:
+            requests: list[tuple[str, str, str, str]] = self._make_requests(options, pks, tokens, rng, start)
+
+            # Host of test client is allowed, as command runs outside of test runner
+            with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']):
+                started: float = time.perf_counter()
+                results: list[tuple[str, float, int, int]] = self._run(requests, options['concurrency'])
+                duration: float = time.perf_counter() - started
+        finally:
+            self._clean_up(pks, tokens)
+
+        report: dict = {
+            'config': {option: options[option] for option in
+                       ('rooms', 'users', 'hot_rooms', 'requests', 'concurrency', 'mix', 'seed')},
+            'database': connection.vendor,
+            **self._summarize(results, duration),
+        }
+        output: str = json.dumps(report, indent=2)
+
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
@@ -0,0 +1,60 @@
+"""Command to release expired holds of rooms"""
+import datetime
+import time
+
+from django.core.management.base import BaseCommand, CommandError, CommandParser
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from booking.models import Room
+from booking.signals import send_rooms_updated
+
+
+class Command(BaseCommand):
+    """Command to clear expired holds in batches, each one is a short transaction of its own.\n
+    Expired holds are free anyway, so it only keeps table tidy and tells subscribers of live events about them.
+    It's meant to be run periodically, e.g. by cron."""
+    help = 'Releases expired holds of rooms in batches'
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        parser.add_argument('--batch-size', type=int, default=5000, help='Number of holds released at once')
+        parser.add_argument('--pause', type=float, default=0,
+                            help='Seconds to sleep between batches to let other writes through')
+
+    @staticmethod
+    def _release_batch(expired_before: datetime.datetime, batch_size: int) -> tuple[int, int]:
+        """Method to release batch of holds expired before the moment, numbers of picked and released are returned.\n
+        Rooms are picked by `room_held_until_idx` and their expiry is checked again by UPDATE,
+        so holds prolonged or turned into bookings meanwhile are kept."""
+        with transaction.atomic():
+            pks: list[int] = list(Room.objects.filter(held_until__lte=expired_before)
+                                  .order_by('held_until').values_list('pk', flat=True)[:batch_size])
+            if not pks:
+                return 0, 0
+
+            updated: int = (Room.objects.filter(pk__in=pks, held_until__lte=expired_before)
+                            .update(held_by=None, held_until=None, version=F('version') + 1))
+            send_rooms_updated(pks)
+
+        return len(pks), updated
+
+    def handle(self, *args, **options) -> None:
+        if options['batch_size'] <= 0:
+            raise CommandError('--batch-size must be positive')
+
+        # Holds expiring while command runs are left to its next run, so it always ends
+        expired_before = timezone.now()
+        released: int = 0
+
+        while True:
+            picked, released_now = self._release_batch(expired_before, options['batch_size'])
+            if not picked:
+                break
+
+            released += released_now
+            if options['verbosity'] >= 2:
+                self.stdout.write(f'Released {released} holds')
+            time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f'Released {released} expired holds'))
@@ -0,0 +1,114 @@
+"""In-process metrics of requests.\n
+Wall time, number and time of DB queries and response size of each request
+are counted in histograms by URL name and rendered in Prometheus text format.
+Histograms are kept by every process separately.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar, Token
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+# Name, help and upper bounds of buckets of every histogram
+HISTOGRAMS: dict[str, tuple[str, tuple[float, ...]]] = {
+    'booking_request_duration_seconds': (
+        'Wall time of requests',
+        (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+    ),
+    'booking_db_queries': (
+        'Number of DB queries made by requests',
+        (0, 1, 2, 3, 5, 10, 20, 50, 100),
+    ),
+    'booking_db_duration_seconds': (
+        'Time of DB queries made by requests',
+        (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+    ),
+    'booking_response_size_bytes': (
+        'Size of response bodies, streamed ones are not counted',
+        (100, 1000, 10000, 100000, 1000000, 10000000),
+    ),
+}
+
+# [number of queries, time of queries] of request being handled
+_queries: ContextVar[list | None] = ContextVar('booking_queries', default=None)
+
+# Bucket counts, sum and count of histograms by (histogram, URL name)
+_series: dict[tuple[str, str], list] = {}
+_lock = threading.Lock()
+
+
+def record_query(execute, sql, params, many, context):
+    """Function to count query in statistics of current request, it's installed on every DB connection"""
+    queries: list | None = _queries.get()
+    if queries is None:
+        return execute(sql, params, many, context)
+
+    started: float = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        queries[0] += 1
+        queries[1] += time.perf_counter() - started
+
+
+def start_request() -> tuple[Token, list]:
+    """Function to start counting queries of request into returned [number, time] list"""
+    queries: list = [0, 0.0]
+    return _queries.set(queries), queries
+
+
+def finish_request(token: Token) -> None:
+    """Function to stop counting queries of request"""
+    _queries.reset(token)
+
+
+def observe(url_name: str, duration: float, queries: int, db_duration: float, size: int | None) -> None:
+    """Function to add statistics of request to histograms"""
+    values: dict[str, float] = {
+        'booking_request_duration_seconds': duration,
+        'booking_db_queries': queries,
+        'booking_db_duration_seconds': db_duration,
+    }
+    if size is not None:
+        values['booking_response_size_bytes'] = size
+
+    with _lock:
+        for name, value in values.items():
+            bounds: tuple[float, ...] = HISTOGRAMS[name][1]
+            series: list | None = _series.get((name, url_name))
+            if series is None:
+                # Last bucket is +Inf one
+                series = _series[(name, url_name)] = [[0] * (len(bounds) + 1), 0.0, 0]
+            series[0][bisect_left(bounds, value)] += 1
+            series[1] += value
+            series[2] += 1
+
+
+def reset() -> None:
+    """Function to drop all observations"""
+    with _lock:
+        _series.clear()
+
+
+def render() -> str:
+    """Function to render histograms in Prometheus text exposition format"""
+    with _lock:
+        snapshot: dict[tuple[str, str], list] = {key: [list(series[0]), series[1], series[2]]
+                                                 for key, series in _series.items()}
+    lines: list[str] = []
+
+    for name, (description, bounds) in HISTOGRAMS.items():
+        lines += [f'# HELP {name} {description}', f'# TYPE {name} histogram']
+
+        for (series_name, url_name), (buckets, total, count) in sorted(snapshot.items()):
+            if series_name != name:
+                continue
+            labels: str = f'url_name="{url_name}"'
+            cumulative: int = 0
+            for bound, bucket in zip((*bounds, '+Inf'), buckets):
+                cumulative += bucket
+                lines.append(f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines += [f'{name}_sum{{{labels}}} {total}', f'{name}_count{{{labels}}} {count}']
+
+    return '\n'.join(lines) + '\n'
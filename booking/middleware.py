@@ -0,0 +1,108 @@
+"""Django middlewares"""
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import HttpRequest, HttpResponse
+
+from . import metrics, routers
+
+SAFE_METHODS: tuple[str, ...] = ('GET', 'HEAD', 'OPTIONS')
+
+
+class MetricsMiddleware:
+    """Middleware to count wall time, DB queries and response size of requests by URL name.\n
+    It should be the first one, so time of other middlewares is counted too.
+    Requests not resolved to a named URL are skipped."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        started: float = time.perf_counter()
+        token, queries = metrics.start_request()
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        started: float = time.perf_counter()
+        # Context is copied to threads of sync code, so queries made there are counted too
+        token, queries = metrics.start_request()
+        try:
+            response: HttpResponse = await self.get_response(request)
+        finally:
+            metrics.finish_request(token)
+
+        self._observe(request, response, time.perf_counter() - started, queries)
+        return response
+
+    @staticmethod
+    def _observe(request: HttpRequest, response: HttpResponse, duration: float, queries: list) -> None:
+        """Method to add statistics of request to histograms"""
+        resolver_match = getattr(request, 'resolver_match', None)
+        if resolver_match is None or not resolver_match.url_name:
+            return
+
+        size: int | None = None if response.streaming else len(response.content)
+        metrics.observe(resolver_match.url_name, duration, queries[0], queries[1], size)
+
+
+class ReplicaMiddleware:
+    """Middleware to let safe requests of `BOOKING_REPLICA_URL_NAMES` read rooms from replicas.\n
+    After successful unsafe request client's reads stay on `default` database for a while,
+    so it reads its own writes."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response) -> None:
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request: HttpRequest):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        token = routers.start_request()
+        try:
+            response: HttpResponse = self.get_response(request)
+        finally:
+            routers.finish_request(token)
+
+        if self._is_write(request, response):
+            routers.pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request: HttpRequest):
+        token = routers.start_request()
+        try:
+            response: HttpResponse = await self.get_response(request)
+        finally:
+            routers.finish_request(token)
+
+        if self._is_write(request, response):
+            await routers.apin_to_primary(request)
+        return response
+
+    @staticmethod
+    def _is_write(request: HttpRequest, response: HttpResponse) -> bool:
+        return request.method not in SAFE_METHODS and response.status_code < 400
+
+    def process_view(self, request: HttpRequest, view_func, view_args, view_kwargs) -> None:
+        """Method to mark request as the one reading from replica before its view is called"""
+        if (settings.BOOKING_DB_REPLICAS and request.method in SAFE_METHODS
+                and request.resolver_match.url_name in settings.BOOKING_REPLICA_URL_NAMES
+                and not routers.is_pinned_to_primary(request)):
+            routers.use_replica()
@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:36
+
+from django.db import migrations, models
+
+from booking.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't be done in transaction
+    atomic = False
+
+    dependencies = [
+        ('booking', '0008_alter_room_booked_by'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['price', 'beds'], name='room_price_beds_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['beds', 'price'], name='room_beds_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['available_from'], name='room_available_from_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['price', 'beds'], name='room_vacant_price_beds_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['beds', 'price'], name='room_vacant_beds_price_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['available_from'], name='room_vacant_available_idx'),
+        ),
+    ]
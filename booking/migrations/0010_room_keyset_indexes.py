@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:37
+
+from django.db import migrations, models
+
+from booking.operations import AddIndexConcurrently, RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't be done in transaction
+    atomic = False
+
+    dependencies = [
+        ('booking', '0009_room_indexes'),
+    ]
+
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_available_from_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_vacant_available_idx',
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['price', 'id'], name='room_price_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['available_from', 'id'], name='room_available_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['price', 'id'], name='room_vacant_price_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['available_from', 'id'], name='room_vacant_available_id_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0010_room_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-18 08:45
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def create_period_index(apps, schema_editor):
+    """GiST index of booking periods, which serves `models.PeriodOverlap` on PostgreSQL"""
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('CREATE INDEX booking_period_gist_idx ON booking_booking '
+                              'USING gist (tstzrange(check_in, check_out))')
+
+
+def drop_period_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX booking_period_gist_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0011_room_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Booking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('check_in', models.DateTimeField()),
+                ('check_out', models.DateTimeField()),
+                ('room', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to='booking.room')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bookings', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'check_in', 'check_out'], name='booking_room_range_idx')],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='booking',
+            constraint=models.CheckConstraint(check=models.Q(('check_out__gt', models.F('check_in'))), name='booking_check_out_after_check_in'),
+        ),
+        migrations.RunPython(create_period_index, drop_period_index),
+    ]
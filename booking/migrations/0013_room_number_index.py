@@ -0,0 +1,21 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:10
+
+from django.db import migrations, models
+
+from booking.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't be done in transaction
+    atomic = False
+
+    dependencies = [
+        ('booking', '0012_booking'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['number'], name='room_number_idx'),
+        ),
+    ]
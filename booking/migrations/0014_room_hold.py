@@ -0,0 +1,30 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:37
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('booking', '0013_room_number_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='held_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='held_rooms', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='held_until',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='room',
+            index=models.Index(condition=models.Q(('held_until__isnull', False)), fields=['held_until'], name='room_held_until_idx'),
+        ),
+    ]
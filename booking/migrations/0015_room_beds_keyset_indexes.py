@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+from booking.operations import AddIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are built concurrently, which can't be done in transaction
+    atomic = False
+
+    dependencies = [
+        ('booking', '0014_room_hold'),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(fields=['beds', 'id'], name='room_beds_id_idx'),
+        ),
+        AddIndexConcurrently(
+            model_name='room',
+            index=models.Index(condition=models.Q(('booked', False)), fields=['beds', 'id'], name='room_vacant_beds_id_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+from django.db import migrations
+
+
+def create_name_index(apps, schema_editor):
+    """GIN trigram index of room names, which serves `search.search_rooms` on PostgreSQL with `pg_trgm`.\n
+    Where extension isn't available search falls back to in-process index, so migration is skipped."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    schema_editor.execute('CREATE INDEX room_name_trgm_idx ON booking_room USING gin (UPPER(name) gin_trgm_ops)')
+
+
+def drop_name_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX IF EXISTS room_name_trgm_idx')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0015_room_beds_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_name_index, drop_name_index),
+    ]
@@ -0,0 +1,33 @@
+from django.db import migrations
+
+from booking.operations import RemoveIndexConcurrently
+
+
+class Migration(migrations.Migration):
+    # Indexes are dropped concurrently, which can't be done in transaction
+    atomic = False
+
+    dependencies = [
+        ('booking', '0016_room_name_trigram_index'),
+    ]
+
+    # (`price`, `beds`) and (`beds`, `price`) indexes duplicate leading columns of (`field`, `id`) ones,
+    # which serve the same filters and orderings as well
+    operations = [
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_price_beds_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_beds_price_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_vacant_price_beds_idx',
+        ),
+        RemoveIndexConcurrently(
+            model_name='room',
+            name='room_vacant_beds_price_idx',
+        ),
+    ]
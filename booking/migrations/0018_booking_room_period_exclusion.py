@@ -0,0 +1,38 @@
+from django.db import migrations
+
+
+def create_period_constraint(apps, schema_editor):
+    """Exclusion constraint of overlapping bookings of the same room on PostgreSQL with `btree_gist`.\n
+    Its GiST index on (room, period) is probed by room for every room checked by availability search,
+    which index of periods alone can't do, so that one is dropped. Without extension rooms are probed
+    by `booking_room_range_idx` instead."""
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    schema_editor.execute('DROP INDEX IF EXISTS booking_period_gist_idx')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'btree_gist'")
+        if cursor.fetchone() is None:
+            return
+
+    schema_editor.execute('CREATE EXTENSION IF NOT EXISTS btree_gist')
+    schema_editor.execute('ALTER TABLE booking_booking ADD CONSTRAINT booking_room_period_excl '
+                          'EXCLUDE USING gist (room_id WITH =, tstzrange(check_in, check_out) WITH &&)')
+
+
+def drop_period_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute('ALTER TABLE booking_booking DROP CONSTRAINT IF EXISTS booking_room_period_excl')
+        schema_editor.execute('CREATE INDEX booking_period_gist_idx ON booking_booking '
+                              'USING gist (tstzrange(check_in, check_out))')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('booking', '0017_remove_room_price_beds_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_period_constraint, drop_period_constraint),
+    ]
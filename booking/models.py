@@ -13,3 +13,88 @@ class Room(models.Model):
     booked = models.BooleanField(default=False)
     available_from = models.DateTimeField()
     booked_by = models.ForeignKey(User, on_delete=models.CASCADE, blank=True, null=True)
+    # Vacant room is held by user until the moment, e.g. during checkout, expired holds are the same as none
+    held_by = models.ForeignKey(User, on_delete=models.SET_NULL, blank=True, null=True, related_name='held_rooms')
+    held_until = models.DateTimeField(blank=True, null=True)
+    # Bumped on every change, so clients are able to check if their copy is outdated
+    version = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        # Indexes backing filters of `filters.make_room_query` and
+        # (`ordering field`, `id`) keyset of `pagination.KeysetPagination`.
+        # Range of filter is read from the one of its field, the other filters are checked on rows,
+        # so a single index per field is kept, as every index slows down writes.
+        # Partial ones cover `vacant` filter, which is the most frequent one
+        # and keeps them small as booked rooms are left out.
+        indexes = [
+            models.Index(fields=['price', 'id'], name='room_price_id_idx'),
+            models.Index(fields=['available_from', 'id'], name='room_available_id_idx'),
+            models.Index(fields=['beds', 'id'], name='room_beds_id_idx'),
+            models.Index(fields=['price', 'id'], name='room_vacant_price_id_idx',
+                         condition=models.Q(booked=False)),
+            models.Index(fields=['available_from', 'id'], name='room_vacant_available_id_idx',
+                         condition=models.Q(booked=False)),
+            models.Index(fields=['beds', 'id'], name='room_vacant_beds_id_idx',
+                         condition=models.Q(booked=False)),
+            # Rooms are matched by number on import
+            models.Index(fields=['number'], name='room_number_idx'),
+            # Expired holds are found by `release_holds` command, rooms without hold are left out
+            models.Index(fields=['held_until'], name='room_held_until_idx',
+                         condition=models.Q(held_until__isnull=False)),
+        ]
+
+    def save(self, *args, **kwargs) -> None:
+        """Method to save room bumping its version"""
+        if not self._state.adding:
+            self.version += 1
+            if kwargs.get('update_fields') is not None:
+                kwargs['update_fields'] = {*kwargs['update_fields'], 'version'}
+
+        super().save(*args, **kwargs)
+
+
+class PeriodOverlap(models.Func):
+    """Condition of booking period overlapping with [check_in, check_out) period.\n
+    On PostgreSQL it's `&&` of ranges served by GiST index of (room, period), elsewhere it's comparison of bounds."""
+    output_field = models.BooleanField()
+
+    def __init__(self, check_in, check_out):
+        super().__init__(models.F('check_in'), models.F('check_out'),
+                         models.Value(check_in), models.Value(check_out))
+
+    def _compile(self, compiler) -> list[tuple[str, list]]:
+        return [compiler.compile(expression) for expression in self.get_source_expressions()]
+
+    def as_sql(self, compiler, connection, **extra_context) -> tuple[str, list]:
+        (check_in, check_in_params), (check_out, check_out_params), (start, start_params), (end, end_params) = \
+            self._compile(compiler)
+        return (f'({check_in} < {end} AND {check_out} > {start})',
+                [*check_in_params, *end_params, *check_out_params, *start_params])
+
+    def as_postgresql(self, compiler, connection, **extra_context) -> tuple[str, list]:
+        (check_in, check_in_params), (check_out, check_out_params), (start, start_params), (end, end_params) = \
+            self._compile(compiler)
+        return (f'tstzrange({check_in}, {check_out}) && tstzrange({start}, {end})',
+                [*check_in_params, *check_out_params, *start_params, *end_params])
+
+
+class Booking(models.Model):
+    """Model of room reservation for a period of time"""
+    # Composite index below leads with room, so separate one isn't needed
+    room = models.ForeignKey(Room, on_delete=models.CASCADE, related_name='bookings', db_index=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='bookings')
+    check_in = models.DateTimeField()
+    check_out = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(check=models.Q(check_out__gt=models.F('check_in')),
+                                   name='booking_check_out_after_check_in'),
+        ]
+        # Bookings of single room are found by range scan of this index.
+        # On PostgreSQL with `btree_gist` overlapping bookings of the same room are excluded
+        # by `booking_room_period_excl` constraint, whose GiST index of (room, period) serves overlap checks,
+        # it's created by migration as other databases lack it.
+        indexes = [
+            models.Index(fields=['room', 'check_in', 'check_out'], name='booking_room_range_idx'),
+        ]
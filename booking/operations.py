@@ -0,0 +1,39 @@
+"""Migration operations.\n
+Indexes of rooms are built and dropped CONCURRENTLY on PostgreSQL, so writes to the table aren't blocked
+while index is built over millions of rooms. Other databases don't support it and run plain statements.
+Migrations using them must be non-atomic.
+"""
+from django.contrib.postgres import operations
+from django.db import migrations
+
+
+class AddIndexConcurrently(operations.AddIndexConcurrently):
+    """Operation to add index by CREATE INDEX CONCURRENTLY on PostgreSQL and plain CREATE INDEX elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.AddIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
+
+
+class RemoveIndexConcurrently(operations.RemoveIndexConcurrently):
+    """Operation to remove index by DROP INDEX CONCURRENTLY on PostgreSQL and plain DROP INDEX elsewhere"""
+
+    def database_forwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_forwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_forwards(self, app_label, schema_editor, from_state, to_state)
+
+    def database_backwards(self, app_label, schema_editor, from_state, to_state) -> None:
+        if schema_editor.connection.vendor == 'postgresql':
+            super().database_backwards(app_label, schema_editor, from_state, to_state)
+        else:
+            migrations.RemoveIndex.database_backwards(self, app_label, schema_editor, from_state, to_state)
@@ -0,0 +1,241 @@
+"""DRF paginators"""
+import base64
+import binascii
+import datetime
+import json
+from collections import OrderedDict
+from typing import Any
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import Q, QuerySet
+from django.utils import timezone
+
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+from .models import Room
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination over (`ordering field`, `id`) pair.\n
+    Position is kept in opaque cursor and next page is selected by comparing
+    with it, so OFFSET is never used and every page costs the same.
+    With `limit` query param only the first `limit` rooms are returned without link to the next page (top-k).
+    Every ordering field has (`field`, `id`) index, so reading stops at the end of page instead of sorting."""
+    cursor_query_param = 'cursor'
+    ordering_query_param = 'ordering'
+    page_size_query_param = 'page_size'
+    limit_query_param = 'limit'
+    page_size: int = settings.BOOKING_PAGE_SIZE
+    max_page_size: int = settings.BOOKING_MAX_PAGE_SIZE
+    ordering_fields: tuple[str, ...] = ('available_from', 'price', 'beds')
+    default_ordering = 'available_from'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset: QuerySet, request: Request, view=None) -> list:
+        """Method to get single page of queryset"""
+        position: list | None = self.prepare(request)
+        index = view.get_room_index() if hasattr(view, 'get_room_index') else None
+
+        if index is not None:
+            page, has_next = self._paginate_index(queryset, index, view.get_room_lookups(), position)
+            return self.set_page(page, has_next)
+
+        rows: list = list(self.get_page_queryset(queryset, position))
+        return self.set_page(rows[:self.limit], len(rows) > self.limit)
+
+    def prepare(self, request: Request) -> list | None:
+        """Method to read page size, ordering and position from request"""
+        self.request: Request = request
+        self.top: int | None = self.get_limit(request)
+        self.limit: int = self.top or self.get_page_size(request)
+        self.ordering: str = self.get_ordering(request)
+        self.next_position: list | None = None
+        return self.decode_cursor(request)
+
+    def get_values_fields(self, request: Request, fields: tuple[str, ...]) -> tuple[str, ...]:
+        """Method to add columns positions of pages are made of to `values()` fields requested by client"""
+        return tuple(dict.fromkeys((*fields, 'id', self.get_ordering(request).lstrip('-'))))
+
+    def get_page_queryset(self, queryset: QuerySet, position: list | None) -> QuerySet:
+        """Method to get query set of page rows selected by comparing with position in SQL.\n
+        It has one extra row, which tells if there is a next page."""
+        field: str = self.ordering.lstrip('-')
+        descending: bool = self.ordering.startswith('-')
+        queryset = queryset.order_by(self.ordering, '-id' if descending else 'id')
+
+        if position is not None:
+            value, pk = position
+            lookup: str = 'lt' if descending else 'gt'
+            queryset = queryset.filter(Q(**{f'{field}__{lookup}': value})
+                                       | Q(**{field: value, f'id__{lookup}': pk}))
+
+        return queryset[:self.limit + 1]
+
+    def set_page(self, page: list, has_next: bool) -> list:
+        """Method to remember position of the next page, there is none after top rooms"""
+        if has_next and page and self.top is None:
+            last = page[-1]
+            self.next_position = [self._get_value(last, self.ordering.lstrip('-')), self._get_value(last, 'id')]
+
+        return page
+
+    def _paginate_index(self, queryset: QuerySet, index, lookups: dict, position: list | None) -> tuple[list, bool]:
+        """Method to get page by searching ids in room index and selecting only them from DB.\n
+        Rows are still filtered by DB, so page never has rooms that don't match."""
+        pks: list[int] = index.search(lookups, self.ordering, position, self.limit + 1)
+        rows: dict = {self._get_value(row, 'id'): row for row in queryset.filter(pk__in=pks[:self.limit])}
+        return [rows[pk] for pk in pks[:self.limit] if pk in rows], len(pks) > self.limit
+
+    def get_paginated_response(self, data) -> Response:
+        """Method to wrap page data into response"""
+        return Response(OrderedDict([
+            ('next', self.get_next_link()),
+            ('results', data),
+        ]))
+
+    def get_page_size(self, request: Request) -> int:
+        """Method to get page size requested by client"""
+        try:
+            page_size: int = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+
+        if page_size <= 0:
+            return self.page_size
+
+        return min(page_size, self.max_page_size)
+
+    def get_limit(self, request: Request) -> int | None:
+        """Method to get number of top rooms requested by client, if any"""
+        value: str | None = request.query_params.get(self.limit_query_param)
+        if value is None:
+            return None
+
+        try:
+            limit: int = int(value)
+        except ValueError:
+            limit = 0
+        if not 0 < limit <= self.max_page_size:
+            raise ValidationError({self.limit_query_param: f'Limit must be from 1 to {self.max_page_size}'})
+
+        return limit
+
+    def get_ordering(self, request: Request) -> str:
+        """Method to get ordering requested by client"""
+        ordering: str = request.query_params.get(self.ordering_query_param, self.default_ordering)
+
+        if ordering.lstrip('-') not in self.ordering_fields:
+            raise ValidationError({self.ordering_query_param: f'Ordering must be one of: '
+                                                              f'{", ".join(self.ordering_fields)}'})
+
+        return ordering
+
+    def get_next_link(self) -> str | None:
+        """Method to build link to the next page"""
+        if self.next_position is None:
+            return None
+
+        url: str = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.next_position))
+
+    def encode_cursor(self, position: list) -> str:
+        """Method to pack position into opaque cursor"""
+        data: bytes = json.dumps([self.ordering, *position], default=str).encode()
+        return base64.urlsafe_b64encode(data).decode()
+
+    def decode_cursor(self, request: Request) -> list | None:
+        """Method to unpack position from cursor"""
+        encoded: str | None = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+
+        try:
+            ordering, value, pk = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+        # Cursor is valid only for the ordering it has been made for
+        if ordering != self.ordering or not isinstance(pk, int):
+            raise NotFound(self.invalid_cursor_message)
+
+        try:
+            return [self._clean_value(self.ordering.lstrip('-'), value), self._clean_value('id', pk)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    @staticmethod
+    def _clean_value(field: str, value: Any) -> Any:
+        """Method to convert value of cursor to the one of field, so forged cursors never reach queries.\n
+        Integers are checked against ranges of fields, which not every database reports by validators."""
+        model_field = Room._meta.get_field(field)
+        value = model_field.clean(value, None)
+        bounds: tuple[int, int] | None = (BaseDatabaseOperations.integer_field_ranges
+                                          .get(model_field.get_internal_type()))
+        if bounds is not None and not bounds[0] <= value <= bounds[1]:
+            raise ValueError(f'{field} is out of range')
+        if isinstance(value, datetime.datetime) and timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        return value
+
+    @staticmethod
+    def _get_value(item: Any, field: str) -> Any:
+        """Method to get field value of a page item"""
+        if isinstance(item, dict):
+            return item[field]
+        return getattr(item, field)
+
+    def get_paginated_response_schema(self, schema: dict) -> dict:
+        """Method to describe paginated response in OpenAPI schema"""
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_schema_operation_parameters(self, view) -> list[dict]:
+        """Method to describe pagination query params in OpenAPI schema"""
+        return [
+            {
+                'name': self.cursor_query_param,
+                'required': False,
+                'in': 'query',
+                'description': 'Opaque cursor pointing to the page',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.ordering_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Field to order rooms by, prefix "-" for descending order. '
+                               f'One of: {", ".join(self.ordering_fields)}',
+                'schema': {'type': 'string'},
+            },
+            {
+                'name': self.page_size_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of rooms per page, {self.max_page_size} at most',
+                'schema': {'type': 'integer'},
+            },
+            {
+                'name': self.limit_query_param,
+                'required': False,
+                'in': 'query',
+                'description': f'Number of the first rooms in ordering to return without link to the next page, '
+                               f'e.g. `ordering=price&limit=10&vacant` for 10 cheapest vacant rooms. '
+                               f'{self.max_page_size} at most',
+                'schema': {'type': 'integer'},
+            },
+        ]
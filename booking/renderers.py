@@ -0,0 +1,16 @@
+"""DRF renderers"""
+import json
+
+from rest_framework.renderers import BaseRenderer
+
+
+class PrometheusRenderer(BaseRenderer):
+    """Renderer of metrics in Prometheus text exposition format, errors are rendered as JSON"""
+    media_type = 'text/plain'
+    format = 'prometheus'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None) -> bytes:
+        if isinstance(data, str):
+            return data.encode(self.charset)
+        return json.dumps(data).encode(self.charset)
@@ -0,0 +1,281 @@
+"""In-process columnar index of rooms.\n
+Filtered columns of every room are kept in typed arrays along with orderings
+of rooms sorted by each column, so filters of `filters.parse_room_filters`
+are answered by binary search without SQL.
+"""
+import datetime
+import heapq
+import operator
+import threading
+import time
+from array import array
+from bisect import bisect_left, bisect_right, insort
+from typing import Any, Callable, Iterable
+
+from django.conf import settings
+from django.utils import timezone
+
+from .models import Room
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+# Columns kept in index and typecodes of their arrays
+COLUMNS: dict[str, str] = {
+    'price': 'd',
+    'beds': 'q',
+    'available_from': 'q',
+}
+
+COMPARATORS: dict[str, Callable[[Any, Any], bool]] = {
+    'gte': operator.ge,
+    'lte': operator.le,
+    'gt': operator.gt,
+    'lt': operator.lt,
+}
+
+
+def to_key(column: str, value: Any) -> float | int:
+    """Function to convert value of column the same way as for DB and then to the one kept in index"""
+    value = Room._meta.get_field(column).get_prep_value(value)
+
+    if column == 'available_from':
+        if timezone.is_naive(value):
+            value = timezone.make_aware(value)
+        # Microseconds since epoch are kept, so comparison is exact
+        return (value - EPOCH) // datetime.timedelta(microseconds=1)
+
+    return value
+
+
+class RoomIndex:
+    """Columnar index of `price`, `beds`, `available_from`, `booked` and `held_until` of rooms"""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._slots: dict[int, int] = {}
+        self._ids = array('q')
+        self._booked = bytearray()
+        # Expiry of holds kept the same way as `available_from`, 0 if room isn't held
+        self._held_until = array('q')
+        self._columns: dict[str, array] = {column: array(typecode) for column, typecode in COLUMNS.items()}
+        # Slots of rooms sorted by (column value, id)
+        self._orders: dict[str, array] = {column: array('q') for column in COLUMNS}
+        self.loaded_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._slots)
+
+    def _key(self, column: str) -> Callable[[int], tuple]:
+        """Method to get sort key of slots in ordering of column"""
+        values: array = self._columns[column]
+        ids: array = self._ids
+        return lambda slot: (values[slot], ids[slot])
+
+    def _append(self, pk: int, values: dict[str, float | int], booked: bool, held_until: int) -> int:
+        slot: int = len(self._ids)
+        self._slots[pk] = slot
+        self._ids.append(pk)
+        self._booked.append(booked)
+        self._held_until.append(held_until)
+        for column, value in values.items():
+            self._columns[column].append(value)
+        return slot
+
+    @staticmethod
+    def _to_keys(price: float, beds: int, available_from: datetime.datetime) -> dict[str, float | int]:
+        return {'price': price, 'beds': beds, 'available_from': to_key('available_from', available_from)}
+
+    @staticmethod
+    def _to_held_key(held_until: datetime.datetime | None) -> int:
+        return 0 if held_until is None else to_key('available_from', held_until)
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Method to fill index from (id, price, beds, available_from, booked, held_until) rows"""
+        with self._lock:
+            self._reset()
+            for pk, price, beds, available_from, booked, held_until in rows:
+                self._append(pk, self._to_keys(price, beds, available_from), booked, self._to_held_key(held_until))
+
+            for column, order in self._orders.items():
+                order.extend(sorted(range(len(self._ids)), key=self._key(column)))
+
+            self.loaded_at = time.monotonic()
+
+    def load_from_db(self) -> None:
+        """Method to fill index with all rooms"""
+        self.load(Room.objects.order_by().values_list('id', *COLUMNS, 'booked', 'held_until')
+                  .iterator(chunk_size=10000))
+
+    def update(self, pk: int, price: float, beds: int, available_from: datetime.datetime, booked: bool,
+               held_until: datetime.datetime | None = None) -> None:
+        """Method to add room or change its values"""
+        values: dict[str, float | int] = self._to_keys(price, beds, available_from)
+        held_key: int = self._to_held_key(held_until)
+
+        with self._lock:
+            slot: int | None = self._slots.get(pk)
+
+            if slot is None:
+                slot = self._append(pk, values, booked, held_key)
+                for column in COLUMNS:
+                    insort(self._orders[column], slot, key=self._key(column))
+                return
+
+            # Booking and holds change only these flags, so orderings are left as they are
+            self._booked[slot] = booked
+            self._held_until[slot] = held_key
+            for column, value in values.items():
+                if self._columns[column][slot] != value:
+                    self._remove_from_order(column, slot)
+                    self._columns[column][slot] = value
+                    insort(self._orders[column], slot, key=self._key(column))
+
+    def remove(self, pk: int) -> None:
+        """Method to remove room from index, its slot is left unused"""
+        with self._lock:
+            slot: int | None = self._slots.pop(pk, None)
+            if slot is not None:
+                for column in COLUMNS:
+                    self._remove_from_order(column, slot)
+
+    def refresh(self, pks: Iterable[int]) -> None:
+        """Method to reread rooms from DB, rooms that are gone are removed"""
+        pks = set(pks)
+        rows: list[tuple] = list(Room.objects.filter(pk__in=pks)
+                                 .values_list('id', *COLUMNS, 'booked', 'held_until'))
+
+        with self._lock:
+            for pk, *values in rows:
+                self.update(pk, *values)
+            for pk in pks - {row[0] for row in rows}:
+                self.remove(pk)
+
+    def _remove_from_order(self, column: str, slot: int) -> None:
+        order: array = self._orders[column]
+        order.pop(bisect_left(order, self._key(column)(slot), key=self._key(column)))
+
+    def _span(self, column: str, bounds: dict[str, Any]) -> tuple[int, int]:
+        """Method to get range of positions in ordering of column matching bounds"""
+        order: array = self._orders[column]
+        values: array = self._columns[column]
+        lo, hi = 0, len(order)
+
+        for lookup, value in bounds.items():
+            if lookup == 'gte':
+                lo = max(lo, bisect_left(order, value, key=values.__getitem__))
+            elif lookup == 'gt':
+                lo = max(lo, bisect_right(order, value, key=values.__getitem__))
+            elif lookup == 'lte':
+                hi = min(hi, bisect_right(order, value, key=values.__getitem__))
+            else:
+                hi = min(hi, bisect_left(order, value, key=values.__getitem__))
+
+        return lo, max(lo, hi)
+
+    def search(self, lookups: dict[str, Any], ordering: str = 'available_from',
+               position: list | None = None, limit: int | None = None) -> list[int]:
+        """Method to get ids of rooms matching lookups.\n
+        Ids are ordered by (`ordering` column, id), `-` prefix makes order descending.
+        If (value, id) `position` is given, ids start right after it.
+        Vacant rooms are ones neither booked nor held, as of `filters.make_room_query`."""
+        bounds: dict[str, dict[str, Any]] = {column: {} for column in COLUMNS}
+        booked: bool | None = None
+
+        for lookup, value in lookups.items():
+            column, _, comparison = lookup.partition('__')
+            if column == 'booked':
+                booked = bool(value)
+            else:
+                bounds[column][comparison] = to_key(column, value)
+
+        field: str = ordering.lstrip('-')
+        descending: bool = ordering.startswith('-')
+        after: tuple | None = None if position is None else (to_key(field, position[0]), position[1])
+
+        with self._lock:
+            checks: list[tuple[array, Callable, Any]] = [
+                (self._columns[column], COMPARATORS[comparison], bound)
+                for column, column_bounds in bounds.items() for comparison, bound in column_bounds.items()
+            ]
+            booked_flags: bytearray = self._booked
+            held_until: array = self._held_until
+            now: int = to_key('available_from', timezone.now())
+
+            def matches(slot: int) -> bool:
+                if booked is not None and booked_flags[slot] != booked:
+                    return False
+                if booked is False and held_until[slot] > now:
+                    return False
+                for values, compare, bound in checks:
+                    if not compare(values[slot], bound):
+                        return False
+                return True
+
+            key: Callable[[int], tuple] = self._key(field)
+            spans: dict[str, tuple[int, int]] = {column: self._span(column, bounds[column]) for column in COLUMNS}
+
+            if after is not None:
+                lo, hi = spans[field]
+                if descending:
+                    hi = min(hi, bisect_left(self._orders[field], after, key=key))
+                else:
+                    lo = max(lo, bisect_right(self._orders[field], after, key=key))
+                spans[field] = (lo, max(lo, hi))
+
+            narrowest: str = min(spans, key=lambda column: spans[column][1] - spans[column][0])
+            lo, hi = spans[narrowest]
+
+            # Rooms are read in requested order and reading stops at limit,
+            # if the ordering is as narrow as any other column
+            if spans[field][1] - spans[field][0] <= hi - lo:
+                lo, hi = spans[field]
+                order: array = self._orders[field]
+                positions: Iterable[int] = range(hi - 1, lo - 1, -1) if descending else range(lo, hi)
+                slots: list[int] = []
+                for index in positions:
+                    if matches(order[index]):
+                        slots.append(order[index])
+                        if limit is not None and len(slots) == limit:
+                            break
+            else:
+                slots = [slot for slot in self._orders[narrowest][lo:hi] if matches(slot)]
+                if after is not None:
+                    slots = [slot for slot in slots if (key(slot) < after if descending else key(slot) > after)]
+                if limit is None:
+                    slots.sort(key=key, reverse=descending)
+                else:
+                    slots = (heapq.nlargest if descending else heapq.nsmallest)(limit, slots, key=key)
+
+            return [self._ids[slot] for slot in slots]
+
+
+_index = RoomIndex()
+
+
+def get_room_index() -> RoomIndex | None:
+    """Function to get index of current process if it's enabled by `BOOKING_ROOM_INDEX` setting.\n
+    Index is loaded on first use and reloaded after `BOOKING_ROOM_INDEX_TTL` seconds,
+    which bounds staleness of changes made by other processes."""
+    if not settings.BOOKING_ROOM_INDEX:
+        return None
+
+    with _index._lock:
+        if _index.loaded_at is None or time.monotonic() - _index.loaded_at > settings.BOOKING_ROOM_INDEX_TTL:
+            _index.load_from_db()
+
+    return _index
+
+
+def refresh_room_index(pks: Iterable[int]) -> None:
+    """Function to apply changes of rooms to index of current process, if it's loaded"""
+    if settings.BOOKING_ROOM_INDEX and _index.loaded_at is not None:
+        _index.refresh(pks)
+
+
+def reset_room_index() -> None:
+    """Function to make index of current process reload on next use, e.g. after change of too many rooms to refresh"""
+    with _index._lock:
+        _index.loaded_at = None
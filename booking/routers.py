@@ -0,0 +1,86 @@
+"""Database routers.\n
+Rooms are read from replicas only by requests marked by `ReplicaMiddleware`,
+everything else, including bookings and all writes, goes to `default` database.
+Reads made inside transaction on `default` stay on it, so they see writes of the transaction.
+"""
+import hashlib
+import random
+from contextvars import ContextVar, Token
+
+from django.conf import settings
+from django.db import connections
+from django.db.models import Model
+from django.http import HttpRequest
+
+from .cache import get_cache
+from .models import Room
+
+# If rooms of request being handled may be read from replica
+_replica: ContextVar[bool] = ContextVar('booking_replica', default=False)
+
+
+def start_request() -> Token:
+    """Function to start request reading from `default` database"""
+    return _replica.set(False)
+
+
+def use_replica() -> None:
+    """Function to let current request read rooms from replica"""
+    _replica.set(True)
+
+
+def finish_request(token: Token) -> None:
+    """Function to restore routing of reads after request"""
+    _replica.reset(token)
+
+
+def make_client_key(request: HttpRequest) -> str | None:
+    """Function to make key of client by its credentials, anonymous clients have none"""
+    credentials: str | None = (request.headers.get('Authorization')
+                               or request.COOKIES.get(settings.SESSION_COOKIE_NAME))
+    if not credentials:
+        return None
+    return f'booking:primary:{hashlib.sha256(credentials.encode()).hexdigest()}'
+
+
+def pin_to_primary(request: HttpRequest) -> None:
+    """Function to keep client's reads on `default` database for `BOOKING_PRIMARY_STICKINESS` seconds,
+    so client reads its own writes even if replicas lag behind"""
+    key: str | None = make_client_key(request)
+    if key is not None:
+        get_cache().set(key, True, timeout=settings.BOOKING_PRIMARY_STICKINESS)
+
+
+async def apin_to_primary(request: HttpRequest) -> None:
+    """Async version of `pin_to_primary`"""
+    key: str | None = make_client_key(request)
+    if key is not None:
+        await get_cache().aset(key, True, timeout=settings.BOOKING_PRIMARY_STICKINESS)
+
+
+def is_pinned_to_primary(request: HttpRequest) -> bool:
+    """Function to check if client has written recently"""
+    key: str | None = make_client_key(request)
+    return key is not None and get_cache().get(key, False)
+
+
+class ReplicaRouter:
+    """Router sending reads of rooms to random replica from `BOOKING_DB_REPLICAS`"""
+
+    def db_for_read(self, model: type[Model], **hints) -> str | None:
+        if (model is Room and settings.BOOKING_DB_REPLICAS and _replica.get()
+                and not connections['default'].in_atomic_block):
+            return random.choice(settings.BOOKING_DB_REPLICAS)
+        return None
+
+    def db_for_write(self, model: type[Model], **hints) -> str | None:
+        return 'default'
+
+    def allow_relation(self, obj1: Model, obj2: Model, **hints) -> bool:
+        # Replicas have the same data as `default` database
+        return True
+
+    def allow_migrate(self, db: str, app_label: str, **hints) -> bool | None:
+        if db in settings.BOOKING_DB_REPLICAS:
+            return False
+        return None
@@ -0,0 +1,52 @@
+"""Pre-rendered OpenAPI schema.\n
+Schema is generated by `build_schema` command at deploy time and stored in `BOOKING_SCHEMA_FILE`,
+so every process reads and renders it once instead of introspecting all views on each request.
+"""
+import hashlib
+import threading
+
+import yaml
+from django.conf import settings
+from django.utils.http import quote_etag
+from drf_spectacular.renderers import OpenApiJsonRenderer, OpenApiYamlRenderer
+from drf_spectacular.settings import spectacular_settings
+
+# Rendered schema and its ETag by format of renderer
+_rendered: dict[str, tuple[bytes, str]] = {}
+_lock = threading.Lock()
+
+
+def generate_schema() -> bytes:
+    """Function to generate schema of API in YAML, the same as `spectacular` command does"""
+    generator = spectacular_settings.DEFAULT_GENERATOR_CLASS()
+    schema: dict = generator.get_schema(request=None, public=True)
+    return OpenApiYamlRenderer().render(schema, renderer_context={})
+
+
+def read_schema() -> bytes | None:
+    """Function to read stored schema, if there is one"""
+    try:
+        with open(settings.BOOKING_SCHEMA_FILE, 'rb') as file:
+            return file.read()
+    except FileNotFoundError:
+        return None
+
+
+def get_schema(renderer_format: str) -> tuple[bytes, str]:
+    """Function to get schema rendered in format of `OpenApiYamlRenderer` or `OpenApiJsonRenderer` and its ETag.\n
+    Stored schema is loaded on first use, it's generated if there is none."""
+    with _lock:
+        if not _rendered:
+            content: bytes = read_schema() or generate_schema()
+            for renderer in (OpenApiYamlRenderer(), OpenApiJsonRenderer()):
+                rendered: bytes = (content if renderer.format == OpenApiYamlRenderer.format
+                                   else renderer.render(yaml.safe_load(content), renderer_context={}))
+                _rendered[renderer.format] = (rendered, quote_etag(hashlib.sha256(rendered).hexdigest()))
+
+    return _rendered[renderer_format]
+
+
+def forget_schema() -> None:
+    """Function to drop loaded schema, so it's loaded again on next use"""
+    with _lock:
+        _rendered.clear()
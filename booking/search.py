@@ -0,0 +1,283 @@
+"""Search of rooms by name and number.\n
+Query matches rooms whose name starts with it or is similar to it by trigrams, which tolerates typos,
+and rooms whose number is equal to it. Rooms are ranked by number match, name prefix match,
+similarity and id, so the best matches come first.
+On PostgreSQL with `pg_trgm` matching is served by GIN trigram index of names, elsewhere
+by in-process trigram index, which is loaded on first search and kept up to date like `room_index`.
+"""
+import re
+import threading
+import time
+from collections import Counter, defaultdict
+from typing import Callable, Iterable
+
+from django.conf import settings
+from django.contrib.postgres.search import TrigramWordSimilarity
+from django.db import connections, transaction
+from django.db.models import BooleanField, ExpressionWrapper, Q, QuerySet, Value
+from django.db.models.functions import Upper
+from django.http import QueryDict
+from rest_framework.exceptions import ValidationError
+
+from .models import Room
+
+QUERY_PARAM = 'q'
+MAX_QUERY_LENGTH = 128
+# Index made by migration 0016 where `pg_trgm` is available
+TRIGRAM_INDEX = 'room_name_trgm_idx'
+# Maximum number stored by PositiveIntegerField
+MAX_NUMBER = 2147483647
+
+# Words are runs of letters and digits, as `pg_trgm` splits them
+WORD_PATTERN = re.compile(r'[^\W_]+')
+
+# Aliases of databases and whether they have trigram index
+_trigram_indexes: dict[str, bool] = {}
+
+
+def parse_search_query(params: QueryDict) -> str | None:
+    """Function to get search query of request, blank one is the same as none"""
+    text: str = params.get(QUERY_PARAM, '').strip()
+    if not text:
+        return None
+    if len(text) > MAX_QUERY_LENGTH:
+        raise ValidationError({QUERY_PARAM: f'Query must be at most {MAX_QUERY_LENGTH} characters long'})
+    return text
+
+
+def parse_number(text: str) -> int | None:
+    """Function to get room number query is equal to, if it's a number"""
+    if text.isascii() and text.isdigit() and int(text) <= MAX_NUMBER:
+        return int(text)
+    return None
+
+
+def make_trigrams(text: str) -> list[str]:
+    """Function to get ordered unique trigrams of text the way `pg_trgm` makes them.\n
+    Text is lowercased and every word is padded with two spaces in front and one at the end."""
+    trigrams: dict[str, None] = {}
+    for word in WORD_PATTERN.findall(text.lower()):
+        padded: str = f'  {word} '
+        trigrams.update(dict.fromkeys(padded[index:index + 3] for index in range(len(padded) - 2)))
+    return list(trigrams)
+
+
+def get_word_similarity(trigrams: set[str], name_trigrams: Iterable[str]) -> float:
+    """Function to get similarity of query trigrams to the part of name they are found in.\n
+    Part spans from the first to the last trigram of name found in query, so it's close to
+    `word_similarity()` of `pg_trgm`, e.g. query is as similar to word it's a prefix of as to the word itself."""
+    found: list[int] = [index for index, trigram in enumerate(name_trigrams) if trigram in trigrams]
+    if not found:
+        return 0.0
+    common: int = len(found)
+    span: int = found[-1] - found[0] + 1
+    return common / (len(trigrams) + span - common)
+
+
+class NameIndex:
+    """In-process trigram index of names and numbers of rooms"""
+
+    def __init__(self) -> None:
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._names: dict[int, str] = {}
+        self._numbers: dict[int, int] = {}
+        self._trigrams: dict[int, tuple[str, ...]] = {}
+        # Ids of rooms by trigrams of their names and by their numbers
+        self._postings: defaultdict[str, set[int]] = defaultdict(set)
+        self._rooms_by_number: defaultdict[int, set[int]] = defaultdict(set)
+        self.loaded_at: float | None = None
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def _add(self, pk: int, number: int, name: str) -> None:
+        self._names[pk] = name
+        self._numbers[pk] = number
+        self._rooms_by_number[number].add(pk)
+        self._trigrams[pk] = tuple(make_trigrams(name))
+        for trigram in self._trigrams[pk]:
+            self._postings[trigram].add(pk)
+
+    def remove(self, pk: int) -> None:
+        """Method to remove room from index"""
+        with self._lock:
+            name: str | None = self._names.pop(pk, None)
+            if name is None:
+                return
+            self._rooms_by_number[self._numbers.pop(pk)].discard(pk)
+            for trigram in self._trigrams.pop(pk):
+                self._postings[trigram].discard(pk)
+
+    def load(self, rows: Iterable[tuple]) -> None:
+        """Method to fill index from (id, number, name) rows"""
+        with self._lock:
+            self._reset()
+            for pk, number, name in rows:
+                self._add(pk, number, name)
+            self.loaded_at = time.monotonic()
+
+    def load_from_db(self) -> None:
+        """Method to fill index with all rooms"""
+        self.load(Room.objects.order_by().values_list('id', 'number', 'name').iterator(chunk_size=10000))
+
+    def update(self, pk: int, number: int, name: str) -> None:
+        """Method to add room or change its name and number"""
+        with self._lock:
+            self.remove(pk)
+            self._add(pk, number, name)
+
+    def refresh(self, pks: Iterable[int]) -> None:
+        """Method to reread rooms from DB, rooms that are gone are removed"""
+        pks = set(pks)
+        rows: list[tuple] = list(Room.objects.filter(pk__in=pks).values_list('id', 'number', 'name'))
+
+        with self._lock:
+            for pk, number, name in rows:
+                self.update(pk, number, name)
+            for pk in pks - {row[0] for row in rows}:
+                self.remove(pk)
+
+    def search(self, text: str) -> list[int]:
+        """Method to get ids of all rooms matching query, best matches first"""
+        rank: Callable = make_ranker(text)
+        trigrams: list[str] = make_trigrams(text)
+        # Similarity is at most share of query trigrams found in name, so rooms having less of them
+        # match only by prefix, and names starting with query always have its first trigram
+        least_count: float = settings.BOOKING_SEARCH_SIMILARITY * len(trigrams)
+        prefix: str = text.upper()
+        number: int | None = parse_number(text)
+        ranks: dict[int, tuple] = {}
+
+        with self._lock:
+            counts: Counter = Counter()
+            for trigram in trigrams:
+                counts.update(self._postings.get(trigram, ()))
+
+            candidates: set[int] = set(self._rooms_by_number.get(number, ())) if number is not None else set()
+            if trigrams:
+                candidates.update(pk for pk, count in counts.items()
+                                  if count >= least_count or self._names[pk].upper().startswith(prefix))
+            else:
+                candidates.update(self._names)
+
+            for pk in candidates:
+                room_rank: tuple | None = rank(self._names[pk], self._numbers[pk], self._trigrams[pk])
+                if room_rank is not None:
+                    ranks[pk] = room_rank
+
+        return sorted(ranks, key=lambda pk: (ranks[pk], -pk), reverse=True)
+
+
+def make_ranker(text: str) -> Callable[..., tuple[bool, bool, float] | None]:
+    """Function to make function getting (number match, name prefix match, similarity) rank of room
+    by its name, number and optionally trigrams of name, `None` is returned if room doesn't match query"""
+    threshold: float = settings.BOOKING_SEARCH_SIMILARITY
+    trigrams: set[str] = set(make_trigrams(text))
+    prefix: str = text.upper()
+    number: int | None = parse_number(text)
+
+    def rank(name: str, room_number: int, name_trigrams: Iterable[str] | None = None) -> tuple | None:
+        number_match: bool = number == room_number
+        prefix_match: bool = name.upper().startswith(prefix)
+        similarity: float = get_word_similarity(trigrams, make_trigrams(name) if name_trigrams is None
+                                                else name_trigrams)
+        if number_match or prefix_match or similarity >= threshold:
+            return number_match, prefix_match, similarity
+        return None
+
+    return rank
+
+
+_index = NameIndex()
+
+
+def get_name_index() -> NameIndex:
+    """Function to get name index of current process.\n
+    Index is loaded on first use and reloaded after `BOOKING_SEARCH_INDEX_TTL` seconds,
+    which bounds staleness of changes made by other processes."""
+    with _index._lock:
+        if _index.loaded_at is None or time.monotonic() - _index.loaded_at > settings.BOOKING_SEARCH_INDEX_TTL:
+            _index.load_from_db()
+
+    return _index
+
+
+def refresh_name_index(pks: Iterable[int]) -> None:
+    """Function to apply changes of rooms to name index of current process, if it's loaded"""
+    if _index.loaded_at is not None:
+        _index.refresh(pks)
+
+
+def reset_name_index() -> None:
+    """Function to make name index of current process reload on next use"""
+    with _index._lock:
+        _index.loaded_at = None
+
+
+def has_trigram_index(using: str) -> bool:
+    """Function to check if database has trigram index of names, it's checked once per process"""
+    if using not in _trigram_indexes:
+        connection = connections[using]
+        if connection.vendor != 'postgresql':
+            _trigram_indexes[using] = False
+        else:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1 FROM pg_indexes WHERE indexname = %s', [TRIGRAM_INDEX])
+                _trigram_indexes[using] = cursor.fetchone() is not None
+
+    return _trigram_indexes[using]
+
+
+def _search_database(text: str, queryset: QuerySet[Room], limit: int) -> list[int]:
+    """Function to search rooms by trigram index, `Upper(name)` expressions are the ones index is made of"""
+    upper: str = text.upper()
+    number: int | None = parse_number(text)
+    matches: Q = Q(upper_name__startswith=upper) | Q(upper_name__trigram_word_similar=upper)
+    number_match = Value(False)
+    if number is not None:
+        matches |= Q(number=number)
+        number_match = ExpressionWrapper(Q(number=number), output_field=BooleanField())
+
+    queryset = (queryset.alias(upper_name=Upper('name')).filter(matches)
+                .annotate(number_match=number_match,
+                          prefix_match=ExpressionWrapper(Q(upper_name__startswith=upper), output_field=BooleanField()),
+                          similarity=TrigramWordSimilarity(text, 'name'))
+                .order_by('-number_match', '-prefix_match', '-similarity', 'id')
+                .values_list('id', flat=True))
+
+    with transaction.atomic(using=queryset.db):
+        with connections[queryset.db].cursor() as cursor:
+            # Threshold of `%>` operator, which is served by index, for this transaction only
+            cursor.execute("SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                           [str(settings.BOOKING_SEARCH_SIMILARITY)])
+        return list(queryset[:limit])
+
+
+def _search_index(text: str, queryset: QuerySet[Room], limit: int) -> list[int]:
+    """Function to search rooms by name index, candidates are checked by DB chunk by chunk in rank order.\n
+    Rooms are ranked again by their current names and numbers, so changes not yet seen by index never leak."""
+    ranked: list[int] = get_name_index().search(text)
+    chunk_size: int = max(limit, settings.BOOKING_SEARCH_CHUNK_SIZE)
+    rank: Callable = make_ranker(text)
+    ranks: dict[int, tuple] = {}
+
+    for offset in range(0, len(ranked), chunk_size):
+        rows = queryset.filter(pk__in=ranked[offset:offset + chunk_size]).values_list('id', 'name', 'number')
+        for pk, name, number in rows:
+            room_rank: tuple | None = rank(name, number)
+            if room_rank is not None:
+                ranks[pk] = room_rank
+        if len(ranks) >= limit:
+            break
+
+    return sorted(ranks, key=lambda pk: (ranks[pk], -pk), reverse=True)[:limit]
+
+
+def search_rooms(text: str, queryset: QuerySet[Room], limit: int) -> list[int]:
+    """Function to get ids of the best `limit` rooms of queryset matching query, best matches first"""
+    if has_trigram_index(queryset.db):
+        return _search_database(text, queryset, limit)
+    return _search_index(text, queryset, limit)
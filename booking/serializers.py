@@ -1,5 +1,10 @@
 """DRF serializers"""
-from rest_framework import serializers
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import ISO_8601, serializers
+from rest_framework.settings import api_settings
+
+from .models import Booking
 
 
 class RoomSerializer(serializers.Serializer):
@@ -11,3 +16,166 @@ class RoomSerializer(serializers.Serializer):
     beds = serializers.IntegerField()
     booked = serializers.BooleanField()
     available_from = serializers.DateTimeField()
+
+    # Columns of `values()` rows accepted by `represent_rows`, in order of fields
+    values_fields: tuple[str, ...] = ('id', 'number', 'name', 'price', 'beds', 'booked', 'available_from')
+
+    fields_query_param = 'fields'
+
+    @classmethod
+    def parse_fields(cls, params) -> tuple[str, ...]:
+        """Method to get fields requested by comma-separated `fields` query param, all of them by default.\n
+        Fields are given in order of `values_fields`, whatever order they are requested in."""
+        value: str = params.get(cls.fields_query_param, '')
+        if not value:
+            return cls.values_fields
+
+        requested: set[str] = {field.strip() for field in value.split(',') if field.strip()}
+        if not requested or not requested <= set(cls.values_fields):
+            raise serializers.ValidationError({cls.fields_query_param: f'Fields must be some of: '
+                                                                       f'{", ".join(cls.values_fields)}'})
+
+        return tuple(field for field in cls.values_fields if field in requested)
+
+    @classmethod
+    def represent_rows(cls, rows: list[dict], fields: tuple[str, ...] | None = None) -> list[dict]:
+        """Method to get representation of rooms given as `values()` rows.\n
+        Database returns every column but `available_from` in its representation type already,
+        so per-field machinery is skipped and output stays the same as of serializer.
+        If `fields` are given, other columns of rows are dropped."""
+        if fields is not None and rows and rows[0].keys() != set(fields):
+            rows = [{field: row[field] for field in fields} for row in rows]
+        if not rows or 'available_from' not in rows[0]:
+            return rows
+
+        field = serializers.DateTimeField()
+        # Resolving current timezone is the most of field's own cost, so it's done once
+        field_timezone = field.default_timezone()
+        iso_8601: bool = (field_timezone is not None
+                          and str(api_settings.DATETIME_FORMAT).lower() == ISO_8601)
+
+        for row in rows:
+            value = row['available_from']
+
+            if iso_8601 and timezone.is_aware(value):
+                value = value.astimezone(field_timezone).isoformat()
+                row['available_from'] = value[:-6] + 'Z' if value.endswith('+00:00') else value
+            else:
+                row['available_from'] = field.to_representation(value)
+
+        return rows
+
+
+class BookingPeriodSerializer(serializers.Serializer):
+    """Serializer to period of booking"""
+    check_in = serializers.DateTimeField()
+    check_out = serializers.DateTimeField()
+
+    def validate(self, attrs: dict) -> dict:
+        """Method to check that period isn't empty"""
+        if attrs['check_out'] <= attrs['check_in']:
+            raise serializers.ValidationError({'check_out': 'Check-out must be later than check-in'})
+        return attrs
+
+
+class BookingSerializer(BookingPeriodSerializer):
+    """Serializer to `models.Booking` model"""
+    id = serializers.IntegerField(read_only=True)
+    room = serializers.IntegerField(source='room_id', read_only=True)
+
+    def create(self, validated_data: dict) -> Booking:
+        """Method to create booking, room and user are given to `save()`"""
+        return Booking.objects.create(**validated_data)
+
+
+class RoomBulkBookSerializer(serializers.Serializer):
+    """Serializer to request of booking or releasing several rooms at once"""
+    BOOK = 'book'
+    RELEASE = 'release'
+
+    action = serializers.ChoiceField(choices=[BOOK, RELEASE])
+    rooms = serializers.ListField(child=serializers.IntegerField(min_value=1), allow_empty=False,
+                                  max_length=settings.BOOKING_BULK_MAX_ROOMS)
+
+    def validate_rooms(self, value: list[int]) -> list[int]:
+        """Method to drop repeated room ids keeping their order"""
+        return list(dict.fromkeys(value))
+
+
+class RoomBookSerializer(serializers.Serializer):
+    """Serializer to request of booking, holding or releasing single room, booking is toggled by default"""
+    HOLD = 'hold'
+    TOGGLE = 'toggle'
+
+    action = serializers.ChoiceField(choices=[RoomBulkBookSerializer.BOOK, RoomBulkBookSerializer.RELEASE, HOLD,
+                                              TOGGLE],
+                                     default=TOGGLE)
+
+
+class RoomOutcomeSerializer(serializers.Serializer):
+    """Serializer to outcome of bulk action on single room"""
+    id = serializers.IntegerField()
+    status = serializers.ChoiceField(choices=['booked', 'released', 'ok', 'unavailable', 'not_found'])
+
+
+class RoomBulkOutcomeSerializer(serializers.Serializer):
+    """Serializer to outcome of bulk action on rooms"""
+    detail = serializers.CharField()
+    rooms = RoomOutcomeSerializer(many=True)
+
+
+class RoomCacheStatsSerializer(serializers.Serializer):
+    """Serializer to statistics of room list cache"""
+    version = serializers.IntegerField()
+    hits = serializers.IntegerField()
+    misses = serializers.IntegerField()
+
+
+class RoomFacetsQuerySerializer(serializers.Serializer):
+    """Serializer to query params of room facets, besides room filters"""
+    price_step = serializers.FloatField(min_value=1, default=settings.BOOKING_FACETS_PRICE_STEP)
+
+
+class PriceBucketSerializer(serializers.Serializer):
+    """Serializer to bucket of price histogram, bounds are the same as of price filters"""
+    price_from = serializers.FloatField()
+    price_to = serializers.FloatField()
+    count = serializers.IntegerField()
+
+
+class BedsBucketSerializer(serializers.Serializer):
+    """Serializer to bucket of beds histogram"""
+    beds = serializers.IntegerField()
+    count = serializers.IntegerField()
+
+
+class PriceFacetSerializer(serializers.Serializer):
+    """Serializer to range and histogram of prices"""
+    min = serializers.FloatField(allow_null=True)
+    max = serializers.FloatField(allow_null=True)
+    step = serializers.FloatField()
+    buckets = PriceBucketSerializer(many=True)
+
+
+class BedsFacetSerializer(serializers.Serializer):
+    """Serializer to range and histogram of beds"""
+    min = serializers.IntegerField(allow_null=True)
+    max = serializers.IntegerField(allow_null=True)
+    buckets = BedsBucketSerializer(many=True)
+
+
+class AvailableFromFacetSerializer(serializers.Serializer):
+    """Serializer to earliest and latest availability"""
+    min = serializers.DateTimeField(allow_null=True)
+    max = serializers.DateTimeField(allow_null=True)
+
+
+class RoomFacetsSerializer(serializers.Serializer):
+    """Serializer to aggregated facets of rooms"""
+    count = serializers.IntegerField()
+    booked = serializers.IntegerField()
+    vacant = serializers.IntegerField()
+    held = serializers.IntegerField()
+    price = PriceFacetSerializer()
+    beds = BedsFacetSerializer()
+    available_from = AvailableFromFacetSerializer()
@@ -0,0 +1,89 @@
+"""Signals and their receivers"""
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import Signal, receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+from .cache import bump_inventory_version, inventory_expired
+from .events import publish_rooms, reset_subscribers
+from .holds import schedule_next_expiry
+from .metrics import record_query
+from .models import Room
+from .room_index import refresh_room_index, reset_room_index
+from .search import refresh_name_index, reset_name_index
+
+# Sent with `pks` of rooms once their change is committed,
+# including changes made by `update()`, which doesn't send `post_save`
+rooms_updated = Signal()
+# Sent once change of too many rooms to handle one by one is committed, e.g. by bulk import or admin actions
+inventory_changed = Signal()
+
+
+def send_rooms_updated(pks: list[int]) -> None:
+    """Function to send `rooms_updated` once current transaction is committed.\n
+    Sending it earlier lets concurrent readers cache old data as current one."""
+    transaction.on_commit(lambda: rooms_updated.send(sender=Room, pks=pks))
+
+
+def send_inventory_changed() -> None:
+    """Function to send `inventory_changed` once current transaction is committed"""
+    transaction.on_commit(lambda: inventory_changed.send(sender=Room))
+
+
+@receiver(post_save, sender=Room)
+@receiver(post_delete, sender=Room)
+def room_changed(sender, instance: Room, **kwargs) -> None:
+    """Receiver to announce room save or delete"""
+    send_rooms_updated([instance.pk])
+
+
+@receiver(rooms_updated)
+def rooms_changed(sender, pks: list[int], **kwargs) -> None:
+    """Receiver to invalidate cached room lists and update room and name indexes"""
+    bump_inventory_version()
+    refresh_room_index(pks)
+    refresh_name_index(pks)
+
+
+@receiver(rooms_updated)
+def rooms_published(sender, pks: list[int], **kwargs) -> None:
+    """Receiver to push live events of changed rooms to subscribers"""
+    publish_rooms(pks)
+
+
+@receiver(inventory_changed)
+def inventory_reloaded(sender, **kwargs) -> None:
+    """Receiver to invalidate cached room lists, reload indexes on next use and make subscribers reload rooms"""
+    bump_inventory_version()
+    reset_room_index()
+    reset_name_index()
+    reset_subscribers()
+
+
+@receiver(inventory_expired)
+def holds_expired(sender, **kwargs) -> None:
+    """Receiver to drop cached room lists again at expiry of the next hold"""
+    schedule_next_expiry()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance: Token, **kwargs) -> None:
+    """Receiver to drop cached token on its deletion, e.g. on logout"""
+    forget_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance: User, **kwargs) -> None:
+    """Receiver to drop cached tokens of user on its change, e.g. on deactivation"""
+    forget_tokens(*Token.objects.filter(user=instance).values_list('key', flat=True))
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs) -> None:
+    """Receiver to count queries of new DB connection in request metrics"""
+    if record_query not in connection.execute_wrappers:
+        # Wrappers installed by `execute_wrapper()` are popped from the end
+        connection.execute_wrappers.insert(0, record_query)
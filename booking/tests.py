@@ -1,3 +1,1234 @@
-from django.test import TestCase
+import asyncio
+import base64
+import datetime
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from io import StringIO
+from unittest import mock, skipUnless
 
-# Create your tests here.
+import yaml
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db import connection, connections, transaction
+from django.http import QueryDict
+from django.test import TestCase, TransactionTestCase, override_settings, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from . import cache, events, idempotency, metrics, routers, schema, search
+from .async_views import room_events_websocket
+from .authentication import get_auth_cache
+from .filters import make_room_query, parse_room_filters
+from .holds import get_hold_expiry
+from .models import Booking, Room
+from .room_index import get_room_index
+from .routers import ReplicaRouter
+from .serializers import RoomSerializer
+from .signals import inventory_changed, rooms_updated
+
+
+class RoomQueryPlanTests(TestCase):
+    """Tests of query plans of documented room filters"""
+
+    def test_filters_are_index_backed(self):
+        call_command('explain_rooms', check=True, stdout=StringIO())
+
+
+class RoomPaginationTests(TestCase):
+    """Tests of keyset pagination of room list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        available_from = timezone.now()
+        Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=i % 7 * 10, beds=i % 3 + 1,
+                 booked=i % 2 == 0, available_from=available_from)
+            for i in range(25)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def _walk(self, url: str) -> list[int]:
+        ids: list[int] = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [room['id'] for room in response.data['results']]
+            url = response.data['next']
+        return ids
+
+    def test_pages_cover_queryset_once(self):
+        for ordering in ['price', '-price', 'available_from', '-available_from', 'beds', '-beds']:
+            ids = self._walk(f'/api/booking/?vacant&page_size=4&ordering={ordering}')
+            tie_break = '-id' if ordering.startswith('-') else 'id'
+            expected = Room.objects.filter(booked=False).order_by(ordering, tie_break)
+            self.assertEqual(ids, [room.id for room in expected])
+
+    def test_invalid_cursor(self):
+        response = self.client.get('/api/booking/?cursor=garbage')
+        self.assertEqual(response.status_code, 404)
+
+    def test_forged_cursor(self):
+        def encode(*position) -> str:
+            return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+        forged = {
+            'price': ['abc', {}, [1], None],
+            'beds': ['abc', '1.5', -1, 2 ** 63, None],
+            'available_from': ['abc', '2024-13-01', 1, {}, None],
+        }
+        for index in [False, True]:
+            with self.settings(BOOKING_ROOM_INDEX=index):
+                if index:
+                    get_room_index().load_from_db()
+                for field, values in forged.items():
+                    for value in values:
+                        for cursor in [encode(field, value, 1), encode(field, 10, 2 ** 63)]:
+                            response = self.client.get(f'/api/booking/?ordering={field}&cursor={cursor}')
+                            self.assertEqual(response.status_code, 404, (field, value))
+
+                response = self.client.get(f'/api/booking/?ordering=available_from&cursor='
+                                           f'{encode("available_from", "2024-01-01T12:00:00", 1)}')
+                self.assertEqual(response.status_code, 200)
+
+    def test_top_rooms(self):
+        expected = list(Room.objects.filter(booked=False, beds__gte=2).order_by('price', 'id')
+                        .values_list('id', flat=True)[:3])
+        for index in [False, True]:
+            cache.get_cache().clear()
+            with self.settings(BOOKING_ROOM_INDEX=index):
+                if index:
+                    get_room_index().load_from_db()
+                response = self.client.get('/api/booking/?vacant&beds_from=2&ordering=price&limit=3')
+            self.assertEqual([room['id'] for room in response.data['results']], expected)
+            self.assertIsNone(response.data['next'])
+
+        for limit in ['0', 'x', '1001']:
+            self.assertEqual(self.client.get(f'/api/booking/?limit={limit}').status_code, 400)
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class RoomConcurrentBookingTests(TransactionTestCase):
+    """Tests of booking single room by many users at once"""
+    clients_count = 20
+
+    def test_single_winner(self):
+        room = Room.objects.create(number=1, name='Room', price=10, beds=1, available_from=timezone.now())
+        tokens = [Token.objects.create(user=User.objects.create_user(username=f'user{i}'))
+                  for i in range(self.clients_count)]
+        barrier = threading.Barrier(self.clients_count)
+        statuses: list[int] = []
+
+        def book(token: Token) -> None:
+            client = APIClient()
+            client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+            barrier.wait()
+            try:
+                statuses.append(client.patch(f'/api/booking/{room.pk}/book').status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=book, args=(token,)) for token in tokens]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(statuses.count(200), 1)
+        self.assertEqual(statuses.count(401), self.clients_count - 1)
+
+        room.refresh_from_db()
+        self.assertTrue(room.booked)
+        self.assertIn(room.booked_by_id, [token.user_id for token in tokens])
+
+
+class RoomBulkBookingTests(TestCase):
+    """Tests of booking several rooms by single request"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.other = User.objects.create_user(username='other')
+        available_from = timezone.now()
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=10, beds=1, available_from=available_from)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_book_and_release(self):
+        pks = [room.pk for room in self.rooms]
+
+        response = self.client.post('/api/booking/bulk/', {'action': 'book', 'rooms': pks}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(Room.objects.filter(booked_by=self.user).count(), 3)
+
+        response = self.client.post('/api/booking/bulk/', {'action': 'release', 'rooms': pks}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Room.objects.filter(booked=True).exists())
+
+    def test_all_or_nothing(self):
+        Room.objects.filter(pk=self.rooms[1].pk).update(booked=True, booked_by=self.other)
+        pks = [room.pk for room in self.rooms] + [max(room.pk for room in self.rooms) + 1]
+
+        response = self.client.post('/api/booking/bulk/', {'action': 'book', 'rooms': pks}, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual([room['status'] for room in response.data['rooms']],
+                         ['ok', 'unavailable', 'ok', 'not_found'])
+        self.assertFalse(Room.objects.filter(booked_by=self.user).exists())
+
+
+class RoomListCacheTests(TestCase):
+    """Tests of versioned cache of room list"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.room = Room.objects.create(number=1, name='Room', price=10, beds=1, available_from=timezone.now())
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_booking_invalidates_list(self):
+        hits: int = cache.get_stats()['hits']
+        self.assertEqual(len(self.client.get('/api/booking/?vacant').data['results']), 1)
+
+        with self.assertNumQueries(0):
+            self.assertEqual(len(self.client.get('/api/booking/?vacant').data['results']), 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/booking/{self.room.pk}/book')
+
+        self.assertEqual(len(self.client.get('/api/booking/?vacant').data['results']), 0)
+        self.assertEqual(cache.get_stats()['hits'], hits + 1)
+
+
+class RoomSerializerTests(TestCase):
+    """Tests of `values()` rows path of `RoomSerializer`"""
+
+    def test_rows_represented_as_instances(self):
+        available_from = timezone.now()
+        Room.objects.bulk_create([
+            Room(number=1, name='Room', price=10.5, beds=2, available_from=available_from),
+            Room(number=2, name='Номер', price=99, beds=1, booked=True,
+                 available_from=available_from.replace(microsecond=0)),
+        ])
+        renderer = JSONRenderer()
+
+        expected = renderer.render(RoomSerializer(Room.objects.order_by('id'), many=True).data)
+        rows = list(Room.objects.order_by('id').values(*RoomSerializer.values_fields))
+        self.assertEqual(renderer.render(RoomSerializer.represent_rows(rows)), expected)
+
+
+class RoomExportTests(TestCase):
+    """Tests of NDJSON export of rooms"""
+
+    def test_export_matches_filters(self):
+        available_from = timezone.now()
+        Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=i, beds=1, booked=i % 2 == 0, available_from=available_from)
+            for i in range(5)
+        )
+
+        response = self.client.get('/api/booking/export/?vacant&price_from=2')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        self.assertEqual([json.loads(line)['number'] for line in lines], [3])
+
+    async def test_export_streams_under_asgi(self):
+        available_from = timezone.now()
+        await Room.objects.abulk_create(
+            Room(number=i, name=f'Room {i}', price=i, beds=1, available_from=available_from) for i in range(5)
+        )
+
+        with override_settings(BOOKING_EXPORT_CHUNK_SIZE=2), \
+                mock.patch.object(RoomSerializer, 'represent_rows', wraps=RoomSerializer.represent_rows) as render:
+            response = await self.async_client.get('/api/booking/export/')
+            self.assertTrue(response.is_async)
+            stream = aiter(response.streaming_content)
+            self.assertEqual(len((await anext(stream)).splitlines()), 2)
+            # Rooms are read and rendered as response is sent, not before
+            self.assertEqual(render.call_count, 1)
+            self.assertEqual([len(chunk.splitlines()) async for chunk in stream], [2, 1])
+
+
+class CachedTokenAuthenticationTests(TestCase):
+    """Tests of token authentication cache"""
+
+    def setUp(self):
+        get_auth_cache().clear()
+        self.user = User.objects.create_user(username='user')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_cached(self):
+        self.assertEqual(self.client.get('/api/booking/booked/').status_code, 200)
+
+        # Only rooms are queried, token lookup is skipped
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get('/api/booking/booked/').status_code, 200)
+
+    def test_logout_revokes_token(self):
+        self.assertEqual(self.client.get('/api/booking/booked/').status_code, 200)
+        self.assertEqual(self.client.post('/auth/token/logout/').status_code, 204)
+        self.assertEqual(self.client.get('/api/booking/booked/').status_code, 401)
+
+    def test_deactivation_revokes_token(self):
+        self.assertEqual(self.client.get('/api/booking/booked/').status_code, 200)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/api/booking/booked/').status_code, 401)
+
+
+class RoomETagTests(TestCase):
+    """Tests of conditional requests of rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.room = Room.objects.create(number=1, name='Room', price=10, beds=1, available_from=timezone.now())
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_room_not_modified_until_booked(self):
+        url = f'/api/booking/{self.room.pk}/'
+        etag = self.client.get(url)['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(f'/api/booking/{self.room.pk}/book')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.data['booked'])
+
+    def test_list_not_modified_until_room_saved(self):
+        etag = self.client.get('/api/booking/?vacant')['ETag']
+
+        with self.assertNumQueries(0):
+            response = self.client.get('/api/booking/?vacant', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.room.save()
+        self.assertEqual(self.client.get('/api/booking/?vacant', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        self.assertEqual(Room.objects.get(pk=self.room.pk).version, 2)
+
+
+class RoomAvailabilityTests(TestCase):
+    """Tests of bookings for a period and search of available rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.start = timezone.now()
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=10, beds=i + 1, available_from=cls.start)
+            for i in range(3)
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _period(self, days_from: int, days_to: int) -> dict:
+        return {'check_in': self.start + datetime.timedelta(days=days_from),
+                'check_out': self.start + datetime.timedelta(days=days_to)}
+
+    def _available(self, days_from: int, days_to: int, **filters) -> list[int]:
+        params = {key: value.isoformat() for key, value in self._period(days_from, days_to).items()}
+        response = self.client.get('/api/booking/available/', {**params, **filters})
+        return [room['id'] for room in response.data['results']]
+
+    def test_overlapping_bookings(self):
+        room = self.rooms[0]
+        url = f'/api/booking/{room.pk}/reservations/'
+
+        self.assertEqual(self.client.post(url, self._period(1, 3), format='json').status_code, 201)
+        self.assertEqual(self.client.post(url, self._period(2, 4), format='json').status_code, 409)
+        self.assertEqual(self.client.post(url, self._period(3, 4), format='json').status_code, 201)
+
+        self.assertNotIn(room.pk, self._available(2, 5))
+        self.assertIn(room.pk, self._available(4, 5))
+        self.assertEqual(self._available(4, 5, beds_from=2), [self.rooms[1].pk, self.rooms[2].pk])
+
+    def test_held_room(self):
+        other = User.objects.create_user(username='other')
+        Room.objects.filter(pk=self.rooms[0].pk).update(held_by=other, held_until=get_hold_expiry())
+        url = f'/api/booking/{self.rooms[0].pk}/reservations/'
+
+        self.assertEqual(self.client.post(url, self._period(1, 3), format='json').status_code, 409)
+        # Holder books it
+        other_client = APIClient()
+        other_client.force_authenticate(other)
+        self.assertEqual(other_client.post(url, self._period(1, 3), format='json').status_code, 201)
+
+    def test_cancel_booking(self):
+        response = self.client.post(f'/api/booking/{self.rooms[0].pk}/reservations/', self._period(1, 3),
+                                    format='json')
+        self.assertEqual(self.client.delete(f'/api/booking/reservations/{response.data["id"]}/').status_code, 204)
+        self.assertFalse(Booking.objects.exists())
+
+
+@override_settings(BOOKING_ROOM_INDEX=True)
+class RoomIndexConsistencyTests(TestCase):
+    """Tests of agreement between room index and ORM"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.random = random.Random(0)
+        cls.start = timezone.now()
+        cls.user = User.objects.create_user(username='user')
+        Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=cls.random.randint(1, 20) * 5, beds=cls.random.randint(1, 4),
+                 booked=cls.random.random() < 0.3,
+                 available_from=cls.start + datetime.timedelta(hours=cls.random.randint(0, 48)))
+            for i in range(300)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        get_room_index().load_from_db()
+
+    def _random_params(self) -> QueryDict:
+        params = QueryDict(mutable=True)
+        for name, value in [('price_from', self.random.randint(1, 20) * 5),
+                            ('price_to', self.random.randint(1, 20) * 5),
+                            ('beds_from', self.random.randint(1, 4)),
+                            ('beds_to', self.random.randint(1, 4)),
+                            ('available_from', self.start + datetime.timedelta(hours=self.random.randint(0, 48))),
+                            ('available_to', self.start + datetime.timedelta(hours=self.random.randint(0, 48))),
+                            ('booked', ''),
+                            ('vacant', '')]:
+            if self.random.random() < 0.4:
+                params[name] = value.isoformat() if isinstance(value, datetime.datetime) else str(value)
+        return params
+
+    def assertAgrees(self):
+        for _ in range(100):
+            params = self._random_params()
+            for ordering in ['price', '-available_from', '-beds']:
+                tie_break = '-id' if ordering.startswith('-') else 'id'
+                expected = list(Room.objects.filter(make_room_query(params))
+                                .order_by(ordering, tie_break).values_list('id', flat=True))
+                self.assertEqual(get_room_index().search(parse_room_filters(params), ordering), expected,
+                                 params.urlencode())
+
+    def test_agrees_after_changes(self):
+        self.assertAgrees()
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        rooms = list(Room.objects.order_by('id')[:20])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            for room in rooms[:10]:
+                client.patch(f'/api/booking/{room.pk}/book')
+            rooms[10].price = 1000
+            rooms[10].save()
+            rooms[11].delete()
+            Room.objects.create(number=1000, name='New', price=50, beds=2, available_from=self.start)
+        self.assertAgrees()
+
+    def test_list_pages_from_index(self):
+        ids = []
+        url = '/api/booking/?vacant&beds_from=2&page_size=7&ordering=-price'
+        while url:
+            response = self.client.get(url)
+            ids += [room['id'] for room in response.data['results']]
+            url = response.data['next']
+
+        expected = Room.objects.filter(booked=False, beds__gte=2).order_by('-price', '-id')
+        self.assertEqual(ids, list(expected.values_list('id', flat=True)))
+
+
+class AsyncRoomViewsTests(TestCase):
+    """Tests of async views against their sync counterparts"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.token = Token.objects.create(user=User.objects.create_user(username='user'))
+        available_from = timezone.now()
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=i % 5 * 10, beds=i % 3 + 1,
+                 booked=i % 4 == 0, available_from=available_from)
+            for i in range(12)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        get_auth_cache().clear()
+
+    async def test_responses_match_sync_views(self):
+        for url in ['/api/booking/?vacant&page_size=5&ordering=-price',
+                    '/api/booking/?beds_from=2&page_size=100',
+                    '/api/booking/?page_size=5&ordering=price&fields=name',
+                    f'/api/booking/{self.rooms[1].pk}/',
+                    f'/api/booking/{self.rooms[1].pk}/?fields=id,price']:
+            expected = await sync_to_async(self.client.get)(url)
+            response = await self.async_client.get(url.replace('/api/', '/api/async/'))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(json.loads(response.content.decode().replace('/api/async/', '/api/')),
+                             json.loads(expected.content))
+
+    async def test_book_and_revert(self):
+        room = self.rooms[1]
+        url = f'/api/async/booking/{room.pk}/book'
+        headers = {'AUTHORIZATION': f'Token {self.token.key}'}
+
+        self.assertEqual((await self.async_client.patch(url)).status_code, 401)
+        self.assertEqual((await self.async_client.patch(url, headers={'AUTHORIZATION': 'Token x'})).status_code,
+                         401)
+
+        response = await self.async_client.patch(url, headers=headers)
+        self.assertEqual(response.status_code, 200)
+        response = await self.async_client.get('/api/async/booking/booked/', headers=headers)
+        self.assertEqual([row['id'] for row in response.json()['results']], [room.pk])
+
+        self.assertEqual((await self.async_client.patch(url, headers=headers)).status_code, 200)
+        self.assertFalse((await Room.objects.aget(pk=room.pk)).booked)
+        self.assertEqual((await self.async_client.patch('/api/async/booking/0/book', headers=headers)).status_code,
+                         404)
+
+    async def test_actions_match_sync_view(self):
+        headers = {'AUTHORIZATION': f'Token {self.token.key}'}
+        outcomes = []
+        for url, room in [('/api/booking/', self.rooms[2]), ('/api/async/booking/', self.rooms[3])]:
+            outcome = []
+            for action in ['hold', 'release', 'release', 'hold', 'book', 'hold', 'toggle', 'toggle', 'release']:
+                response = await self.async_client.patch(f'{url}{room.pk}/book', {'action': action},
+                                                          content_type='application/json', headers=headers)
+                # Expiry of hold differs
+                outcome.append((response.status_code, response.json().partition(' until ')[0]))
+            outcomes.append(outcome)
+        self.assertEqual(outcomes[0], outcomes[1])
+
+
+@skipUnlessDBFeature('test_db_allows_multiple_connections')
+class LoadTestCommandTests(TransactionTestCase):
+    """Tests of in-process load test"""
+
+    def test_report(self):
+        output = StringIO()
+        receiver = mock.Mock()
+        inventory_changed.connect(receiver)
+        self.addCleanup(inventory_changed.disconnect, receiver)
+        with mock.patch.object(rooms_updated, 'send') as send:
+            call_command('loadtest', rooms=30, users=3, hot_rooms=2, requests=60, concurrency=3,
+                         mix='list=1,detail=1,book=1,booked=1', stdout=output)
+        report = json.loads(output.getvalue())
+
+        self.assertEqual(report['requests'], 60)
+        self.assertEqual(set(report['endpoints']), {'list', 'detail', 'book', 'booked'})
+        self.assertEqual(sum(endpoint['requests'] for endpoint in report['endpoints'].values()), 60)
+        self.assertEqual(set(report['endpoints']['book']['statuses']) - {'200', '401'}, set())
+        self.assertFalse(Room.objects.exists())
+        self.assertFalse(User.objects.exists())
+        # Rooms are deleted at once, only bookings are announced room by room
+        self.assertLessEqual(send.call_count, report['endpoints']['book']['statuses'].get('200', 0))
+        receiver.assert_called_once()
+
+
+class MetricsTests(TestCase):
+    """Tests of request metrics"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user(username='admin', is_staff=True)
+        cls.room = Room.objects.create(number=1, name='Room', price=10, beds=1, available_from=timezone.now())
+
+    def setUp(self):
+        cache.get_cache().clear()
+        metrics.reset()
+
+    def test_requests_are_counted(self):
+        for _ in range(3):
+            self.assertEqual(self.client.get(f'/api/booking/{self.room.pk}/').status_code, 200)
+        self.client.get('/missing/')
+
+        client = APIClient()
+        client.force_authenticate(self.admin)
+        self.assertEqual(self.client.get('/api/metrics/').status_code, 401)
+        response = client.get('/api/metrics/')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        series = dict(line.rsplit(' ', 1) for line in response.content.decode().splitlines()
+                      if not line.startswith('#'))
+
+        self.assertEqual(series['booking_db_queries_count{url_name="booking-room"}'], '3')
+        self.assertEqual(series['booking_db_queries_bucket{url_name="booking-room",le="0"}'], '0')
+        self.assertEqual(series['booking_db_queries_bucket{url_name="booking-room",le="1"}'], '3')
+        self.assertEqual(series['booking_request_duration_seconds_bucket{url_name="booking-room",le="+Inf"}'], '3')
+        self.assertGreater(float(series['booking_response_size_bytes_sum{url_name="booking-room"}']), 0)
+        self.assertNotIn('missing', response.content.decode())
+
+
+class ReplicaRoutingTests(TransactionTestCase):
+    """Tests of reading rooms from replicas, test runner makes them mirrors of `default` database"""
+    databases = '__all__'
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.token = Token.objects.create(user=User.objects.create_user(username='user'))
+        self.room = Room.objects.create(number=1, name='Room', price=10, beds=1, available_from=timezone.now())
+        # Without configured replicas `default` database stands for replica
+        self.replicas = settings.BOOKING_DB_REPLICAS or ['default']
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def _read_from(self, client: APIClient, method: str, url: str) -> set[str | None]:
+        """Method to get databases rooms have been read from by request"""
+        aliases: list[str | None] = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            alias = db_for_read(router, model, **hints)
+            if model is Room:
+                aliases.append(alias)
+            return alias
+
+        with override_settings(BOOKING_DB_REPLICAS=self.replicas), mock.patch.object(ReplicaRouter, 'db_for_read', spy):
+            self.assertLess(getattr(client, method)(url).status_code, 400)
+
+        return set(aliases)
+
+    def test_reads_stick_to_primary_after_write(self):
+        replicas = set(self.replicas)
+        self.assertLessEqual(self._read_from(self.client, 'get', '/api/booking/?vacant'), replicas)
+        self.assertLessEqual(self._read_from(self.client, 'get', f'/api/booking/{self.room.pk}/'), replicas)
+        self.assertEqual(self._read_from(self.client, 'get', '/api/booking/booked/'), {None})
+        self.assertLessEqual(self._read_from(self.client, 'patch', f'/api/booking/{self.room.pk}/book'), {None})
+
+        # Writer reads from primary, others still read from replicas
+        self.assertEqual(self._read_from(self.client, 'get', '/api/booking/?booked'), {None})
+        self.assertEqual(self._read_from(self.client, 'get', f'/api/booking/{self.room.pk}/'), {None})
+        self.assertLessEqual(self._read_from(APIClient(), 'get', '/api/booking/?vacant'), replicas)
+
+    def test_reads_in_transaction_stay_on_primary(self):
+        token = routers.start_request()
+        routers.use_replica()
+        try:
+            with override_settings(BOOKING_DB_REPLICAS=['replica']):
+                self.assertEqual(Room.objects.all().db, 'replica')
+                with transaction.atomic():
+                    self.assertEqual(Room.objects.all().db, 'default')
+        finally:
+            routers.finish_request(token)
+
+    @skipUnless(settings.BOOKING_DB_REPLICAS, 'Replicas are not configured by DB_REPLICAS')
+    def test_reads_run_on_replica(self):
+        alias = settings.BOOKING_DB_REPLICAS[0]
+        with override_settings(BOOKING_DB_REPLICAS=[alias]), CaptureQueriesContext(connections[alias]) as queries:
+            response = APIClient().get(f'/api/booking/{self.room.pk}/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['id'], self.room.pk)
+        self.assertTrue(any('"booking_room"' in query['sql'] for query in queries))
+
+
+class RoomFacetsTests(TestCase):
+    """Tests of aggregated facets of rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.start = timezone.now().replace(microsecond=0)
+        Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=20 + i * 15, beds=i % 3 + 1, booked=i % 4 == 0,
+                 available_from=cls.start + datetime.timedelta(days=i))
+            for i in range(20)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def test_facets_match_rooms(self):
+        for params in ['', 'vacant&price_step=100', 'beds_from=2&price_to=150', 'price_from=10000']:
+            response = self.client.get(f'/api/booking/facets/?{params}')
+            self.assertEqual(response.status_code, 200)
+            facets = response.json()
+            rooms = list(Room.objects.filter(make_room_query(QueryDict(params))))
+            step = float(QueryDict(params).get('price_step', 50))
+
+            self.assertEqual(facets['count'], len(rooms))
+            self.assertEqual(facets['booked'], sum(room.booked for room in rooms))
+            self.assertEqual(facets['price']['min'], min((room.price for room in rooms), default=None))
+            self.assertEqual(facets['beds']['max'], max((room.beds for room in rooms), default=None))
+            self.assertEqual({bucket['beds']: bucket['count'] for bucket in facets['beds']['buckets']},
+                             {beds: sum(room.beds == beds for room in rooms) for beds in {room.beds for room in rooms}})
+            for bucket in facets['price']['buckets']:
+                self.assertEqual(bucket['count'], sum(bucket['price_from'] <= room.price < bucket['price_to']
+                                                      for room in rooms))
+                self.assertEqual(bucket['price_to'] - bucket['price_from'], step)
+            self.assertEqual(sum(bucket['count'] for bucket in facets['price']['buckets']), len(rooms))
+            if rooms:
+                self.assertEqual(facets['available_from']['max'],
+                                 max(room.available_from for room in rooms).isoformat().replace('+00:00', 'Z'))
+
+    def test_held_rooms(self):
+        user = User.objects.create_user(username='user')
+        Room.objects.filter(number__in=[1, 2]).update(held_by=user,
+                                                      held_until=timezone.now() + datetime.timedelta(minutes=1))
+        Room.objects.filter(number=3).update(held_by=user, held_until=timezone.now())
+
+        facets = self.client.get('/api/booking/facets/').json()
+        self.assertEqual((facets['count'], facets['booked'], facets['vacant'], facets['held']), (20, 5, 13, 2))
+        # Vacant rooms are the same as of the list, held ones are left out of them
+        vacant = self.client.get('/api/booking/facets/?vacant').json()
+        self.assertEqual((vacant['count'], vacant['vacant'], vacant['held']), (13, 13, 0))
+        self.assertEqual(len(self.client.get('/api/booking/?vacant').data['results']), 13)
+
+    def test_bucket_limit(self):
+        # Prices are from 20 to 305, so steps of 1 and 20 make too many buckets
+        with self.settings(BOOKING_FACETS_MAX_BUCKETS=10):
+            for step, widened in [(1, 31), (20, 40), (50, 50)]:
+                cache.get_cache().clear()
+                price = self.client.get(f'/api/booking/facets/?price_step={step}').json()['price']
+                self.assertEqual(price['step'], widened)
+                self.assertLessEqual(len(price['buckets']), 10)
+                self.assertEqual(sum(bucket['count'] for bucket in price['buckets']), 20)
+
+    def test_queries(self):
+        # Range of all prices and groups of rooms
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/api/booking/facets/?vacant').status_code, 200)
+        self.assertEqual(self.client.get('/api/booking/facets/?price_step=0').status_code, 400)
+
+
+@override_settings(BOOKING_ROOM_INDEX=True)
+class RoomImportTests(TestCase):
+    """Tests of bulk import of rooms"""
+
+    def _import(self, content: str, suffix: str = '.csv', **options) -> None:
+        with tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False, encoding='utf-8') as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('import_rooms', file.name, stdout=StringIO(), **options)
+
+    def test_insert_and_upsert(self):
+        methods = ['bulk', 'copy'] if connection.vendor == 'postgresql' else ['bulk']
+        for method in methods:
+            with self.subTest(method=method):
+                Room.objects.all().delete()
+                get_room_index().load_from_db()
+                # Import is announced once as a whole, not room by room
+                receiver = mock.Mock()
+                inventory_changed.connect(receiver)
+                self.addCleanup(inventory_changed.disconnect, receiver)
+                with mock.patch.object(rooms_updated, 'send') as send:
+                    self._import('number,name,price,beds,booked,available_from\n'
+                                 '1,One,10.5,1,true,2024-01-01T12:00:00Z\n'
+                                 '2,Two,20,2,,2024-01-02T12:00:00\n'
+                                 '3,Three,30,3,no,2024-01-03T12:00:00+03:00\n', method=method, batch_size=2)
+                send.assert_not_called()
+                receiver.assert_called_once()
+                self.assertEqual(Room.objects.count(), 3)
+                self.assertEqual(list(Room.objects.filter(booked=True).values_list('number', flat=True)), [1])
+                version = cache.get_inventory_version()
+
+                self._import('{"number": 1, "name": "First", "price": 15, "beds": 2, "booked": false, '
+                             '"available_from": "2024-02-01T00:00:00Z"}\n'
+                             '{"number": 4, "name": "Four", "price": 40, "beds": 4, '
+                             '"available_from": "2024-02-04T00:00:00Z"}\n'
+                             '{"number": 4, "name": "Fourth", "price": 45, "beds": 4, '
+                             '"available_from": "2024-02-04T00:00:00Z"}\n', suffix='.ndjson', method=method, upsert=True)
+                self.assertEqual(Room.objects.count(), 4)
+                first = Room.objects.get(number=1)
+                self.assertEqual((first.name, first.price, first.beds, first.version), ('First', 15, 2, 2))
+                # Booking state of existing rooms is kept
+                self.assertTrue(first.booked)
+                self.assertEqual(Room.objects.get(number=4).name, 'Fourth')
+                self.assertNotEqual(cache.get_inventory_version(), version)
+                self.assertEqual(get_room_index().search(parse_room_filters(QueryDict('price_from=45'))),
+                                 [Room.objects.get(number=4).pk])
+
+    def test_invalid_rows(self):
+        content = ('number,name,price,beds,available_from\n'
+                   '1,One,10,1,2024-01-01T00:00:00Z\n'
+                   '-2,Two,10,1,2024-01-01T00:00:00Z\n'
+                   '3,,10,1,2024-01-01T00:00:00Z\n'
+                   f'4,{"x" * 200},10,1,2024-01-01T00:00:00Z\n'
+                   '5,Five,10,1,tomorrow\n')
+
+        with self.assertRaisesMessage(CommandError, 'line 3: number: negative'):
+            self._import(content)
+        self.assertFalse(Room.objects.exists())
+
+        self._import(content, skip_invalid=True)
+        self.assertEqual(list(Room.objects.values_list('number', flat=True)), [1])
+
+
+class RoomSparseFieldsetsTests(TestCase):
+    """Tests of selecting only requested fields of rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        available_from = timezone.now()
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=i % 4 * 10, beds=i % 3 + 1, booked=i % 2 == 0,
+                 booked_by=cls.user if i % 2 == 0 else None, available_from=available_from)
+            for i in range(7)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+
+    def _get(self, url: str) -> tuple[list[dict], str]:
+        """Method to get all rooms of paginated list and SQL of its first page"""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        sql = queries.captured_queries[-1]['sql']
+        rows = response.json()['results']
+
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            rows += response.json()['results']
+
+        return rows, sql
+
+    def test_list_fields(self):
+        full, _ = self._get('/api/booking/?page_size=3&ordering=-price')
+        rows, sql = self._get('/api/booking/?page_size=3&ordering=-price&fields=price,id,available_from')
+
+        self.assertEqual(rows, [{field: row[field] for field in ('id', 'price', 'available_from')} for row in full])
+        self.assertNotIn('"name"', sql)
+        self.assertNotIn('"beds"', sql)
+
+        # Columns of cursor are selected, but not returned
+        rows, sql = self._get('/api/booking/?page_size=3&fields=beds')
+        self.assertEqual(rows, [{'beds': row['beds']} for row in self._get('/api/booking/?page_size=3')[0]])
+        self.assertNotIn('"price"', sql)
+
+        for fields in ['', 'id,', ' id ']:
+            self.assertEqual(len(self.client.get(f'/api/booking/?fields={fields}').json()['results'][0]),
+                             7 if not fields else 1)
+        for fields in [',', 'id,version', 'booked_by']:
+            self.assertEqual(self.client.get(f'/api/booking/?fields={fields}').status_code, 400)
+
+    def test_detail_and_booked_fields(self):
+        url = f'/api/booking/{self.rooms[1].pk}/'
+        full = self.client.get(url)
+        response = self.client.get(f'{url}?fields=name,price')
+
+        self.assertEqual(response.json(), {'name': 'Room 1', 'price': 10})
+        self.assertNotEqual(response['ETag'], full['ETag'])
+        self.assertEqual(self.client.get(f'{url}?fields=name,price', HTTP_IF_NONE_MATCH=response['ETag']).status_code,
+                         304)
+        self.assertEqual(self.client.get(f'{url}?fields=name,price', HTTP_IF_NONE_MATCH=full['ETag']).status_code,
+                         200)
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get('/api/booking/booked/?fields=number')
+        self.assertEqual(response.json()['results'], [{'number': i} for i in range(0, 7, 2)])
+
+
+class RoomAdminTests(TestCase):
+    """Tests of rooms changelist and its actions"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_superuser(username='admin')
+        cls.user = User.objects.create_user(username='user')
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=10, beds=i % 3 + 1, booked=i % 2 == 0,
+                 booked_by=cls.user if i % 2 == 0 else None, available_from=timezone.now())
+            for i in range(10)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client.force_login(self.admin)
+
+    def test_changelist_queries(self):
+        # Session, user, beds range, count and page, plan of estimate of count is read first on PostgreSQL
+        with self.assertNumQueries(6 if connection.vendor == 'postgresql' else 5):
+            response = self.client.get('/admin/booking/room/?beds=2')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['cl'].result_list), 3)
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_wide_beds_range(self):
+        outlier = Room.objects.create(number=100, name='Hall', price=10, beds=10000, available_from=timezone.now())
+
+        changelist = self.client.get('/admin/booking/room/').context['cl']
+        choices = [choice['display'] for choice in changelist.filter_specs[0].choices(changelist)]
+        self.assertEqual(len(choices), 21)
+        self.assertEqual(choices[1:3], ['1 – 500', '501 – 1000'])
+
+        response = self.client.get('/admin/booking/room/?beds=9501-10000')
+        self.assertEqual(list(response.context['cl'].result_list), [outlier])
+        response = self.client.get('/admin/booking/room/?beds=1-500')
+        self.assertEqual(response.context['cl'].result_count, 10)
+
+    def test_book_and_release_actions(self):
+        version = cache.get_inventory_version()
+        pks = [room.pk for room in self.rooms[:4]]
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post('/admin/booking/room/', {'action': 'book_rooms', '_selected_action': pks})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Room.objects.filter(pk__in=pks).order_by('pk')
+                              .values_list('booked_by__username', 'version')),
+                         [('user', 1), ('admin', 2), ('user', 1), ('admin', 2)])
+        self.assertNotEqual(cache.get_inventory_version(), version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/admin/booking/room/', {'action': 'release_rooms', '_selected_action': pks})
+        self.assertFalse(Room.objects.filter(pk__in=pks, booked=True).exists())
+        self.assertFalse(Room.objects.filter(pk__in=pks).exclude(booked_by=None).exists())
+
+    @override_settings(BOOKING_ROOM_INDEX=True)
+    def test_action_on_all_rooms(self):
+        get_room_index().load_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            # Ids of rooms selected across pages are never read, only filters of changelist are applied
+            response = self.client.post('/admin/booking/room/?beds=2', {
+                'action': 'release_rooms', 'select_across': '1', '_selected_action': [self.rooms[0].pk],
+            })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(list(Room.objects.filter(booked=True).order_by('beds').values_list('beds', flat=True).distinct()),
+                         [1, 3])
+        self.assertEqual(get_room_index().search({'booked': True, 'beds__gte': 2, 'beds__lte': 2}), [])
+
+
+class SchemaTests(TestCase):
+    """Tests of pre-rendered OpenAPI schema"""
+
+    def setUp(self):
+        schema.forget_schema()
+
+    def test_stored_schema_is_up_to_date(self):
+        call_command('build_schema', check=True, stdout=StringIO())
+
+    def test_schema_is_served_once_rendered(self):
+        response = self.client.get('/api/schema/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, schema.read_schema())
+        self.assertIn('max-age=', response['Cache-Control'])
+
+        json_response = self.client.get('/api/schema/', HTTP_ACCEPT='application/json')
+        self.assertEqual(json_response.json(), yaml.safe_load(response.content))
+        self.assertNotEqual(json_response['ETag'], response['ETag'])
+
+        with mock.patch.object(schema, 'generate_schema') as generate:
+            self.assertEqual(self.client.get('/api/schema/?format=json', HTTP_IF_NONE_MATCH=json_response['ETag'])
+                             .status_code, 304)
+        generate.assert_not_called()
+
+
+class RoomEventsTests(TestCase):
+    """Tests of live events of rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.token = Token.objects.create(user=User.objects.create_user(username='user'))
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=10 + i * 20, beds=1, available_from=timezone.now())
+            for i in range(2)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        get_auth_cache().clear()
+
+    def _book(self, room: Room) -> None:
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(client.patch(f'/api/booking/{room.pk}/book').status_code, 200)
+
+    def test_server_sent_events_need_asgi(self):
+        response = self.client.get('/api/async/booking/events/')
+        self.assertEqual(response.status_code, 501)
+        self.assertEqual(response['Content-Type'], 'application/json')
+
+    async def test_server_sent_events(self):
+        response = await self.async_client.get('/api/async/booking/events/?price_from=20')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+
+        # The first room doesn't match filters
+        for room in self.rooms:
+            await sync_to_async(self._book)(room)
+        await sync_to_async(self._book)(self.rooms[1])
+
+        for name, version in [('booked', 2), ('released', 3)]:
+            lines = (await anext(stream)).decode().splitlines()
+            self.assertEqual(lines[0], f'event: {name}')
+            event = json.loads(lines[1].removeprefix('data: '))
+            self.assertEqual((event['id'], event['version'], event['booked']), (self.rooms[1].pk, version,
+                                                                               name == 'booked'))
+
+        # Stream of subscriber falling behind ends
+        with self.settings(BOOKING_EVENTS_QUEUE_SIZE=0):
+            await sync_to_async(self._book)(self.rooms[1])
+            with self.assertRaises(StopAsyncIteration):
+                await anext(stream)
+        self.assertEqual(len(events.get_hub()), 0)
+
+        self.assertEqual((await self.async_client.get('/api/async/booking/events/?beds_from=x')).status_code, 400)
+        with self.settings(BOOKING_EVENTS_BROKER=None):
+            self.assertEqual((await self.async_client.get('/api/async/booking/events/')).status_code, 404)
+
+    async def test_bulk_change_ends_streams(self):
+        response = await self.async_client.get('/api/async/booking/events/')
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+
+        # Changes of too many rooms aren't published one by one, so subscribers reload rooms instead
+        await sync_to_async(inventory_changed.send)(sender=Room)
+        with self.assertRaises(StopAsyncIteration):
+            await anext(stream)
+        self.assertEqual(len(events.get_hub()), 0)
+
+    async def test_websocket(self):
+        incoming, outgoing = asyncio.Queue(), asyncio.Queue()
+        await incoming.put({'type': 'websocket.connect'})
+        scope = {'type': 'websocket', 'path': '/api/async/booking/events/', 'query_string': b'price_to=20'}
+        connection_task = asyncio.ensure_future(room_events_websocket(scope, incoming.get, outgoing.put))
+
+        self.assertEqual((await outgoing.get())['type'], 'websocket.accept')
+        for room in self.rooms:
+            await sync_to_async(self._book)(room)
+        message = await asyncio.wait_for(outgoing.get(), 5)
+        self.assertEqual(json.loads(message['text'])['id'], self.rooms[0].pk)
+
+        await incoming.put({'type': 'websocket.disconnect', 'code': 1000})
+        await asyncio.wait_for(connection_task, 5)
+        self.assertTrue(outgoing.empty())
+        self.assertEqual(len(events.get_hub()), 0)
+
+        await incoming.put({'type': 'websocket.connect'})
+        await room_events_websocket({**scope, 'path': '/api/async/booking/'}, incoming.get, outgoing.put)
+        self.assertEqual(await outgoing.get(), {'type': 'websocket.close'})
+
+
+class RoomIdempotencyTests(TestCase):
+    """Tests of explicit booking operations and replay of requests with idempotency keys"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.token = Token.objects.create(user=User.objects.create_user(username='user'))
+        cls.other = User.objects.create_user(username='other')
+        cls.room = Room.objects.create(number=1, name='Room 1', price=10, beds=1, available_from=timezone.now())
+
+    def setUp(self):
+        cache.get_cache().clear()
+        get_auth_cache().clear()
+        idempotency.get_idempotency_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.token.user)
+        self.url = f'/api/booking/{self.room.pk}/book'
+
+    def test_explicit_operations(self):
+        for action, status_code, booked in [('book', 200, True), ('book', 200, True), ('release', 200, False),
+                                            ('release', 409, False)]:
+            response = self.client.patch(self.url, {'action': action}, format='json')
+            self.assertEqual(response.status_code, status_code)
+            self.assertEqual(Room.objects.get(pk=self.room.pk).booked, booked)
+
+        Room.objects.filter(pk=self.room.pk).update(booked=True, booked_by=self.other)
+        self.assertEqual(self.client.patch(self.url, {'action': 'book'}, format='json').status_code, 409)
+        self.assertEqual(self.client.patch(self.url, {'action': 'release'}, format='json').status_code, 409)
+        self.assertEqual(self.client.patch(self.url, {'action': 'steal'}, format='json').status_code, 400)
+
+    def test_retries_are_replayed(self):
+        headers = {'HTTP_IDEMPOTENCY_KEY': 'first'}
+        responses = [self.client.patch(self.url, **headers) for _ in range(3)]
+        self.assertEqual([response.data for response in responses], ["Room successfully booked"] * 3)
+        self.assertEqual([response.has_header(idempotency.REPLAYED_HEADER) for response in responses],
+                         [False, True, True])
+        room = Room.objects.get(pk=self.room.pk)
+        self.assertEqual((room.booked, room.version), (True, 2))
+
+        # Another key toggles booking again, reusing key for another operation is refused
+        self.assertEqual(self.client.patch(self.url, HTTP_IDEMPOTENCY_KEY='second').data,
+                         "Booking successfully reverted!")
+        self.assertEqual(self.client.patch(self.url, {'action': 'book'}, format='json', **headers).status_code, 422)
+        self.assertEqual(self.client.patch(self.url, HTTP_IDEMPOTENCY_KEY='').status_code, 400)
+
+        # Retry arriving while the first request is handled is refused
+        idempotency.claim(idempotency.make_key(self.token.user.pk, self.url, 'third'), 'toggle')
+        self.assertEqual(self.client.patch(self.url, HTTP_IDEMPOTENCY_KEY='third').status_code, 409)
+        self.assertFalse(Room.objects.get(pk=self.room.pk).booked)
+
+    def test_failed_requests_are_not_stored(self):
+        url = '/api/booking/0/book'
+        self.assertEqual(self.client.patch(url, HTTP_IDEMPOTENCY_KEY='key').status_code, 404)
+        self.assertIsNone(idempotency.claim(idempotency.make_key(self.token.user.pk, url, 'key'), 'toggle'))
+
+    async def test_async_retries_are_replayed(self):
+        url = f'/api/async/booking/{self.room.pk}/book'
+        headers = {'AUTHORIZATION': f'Token {self.token.key}', 'IDEMPOTENCY_KEY': 'first'}
+
+        for replayed in [False, True]:
+            response = await self.async_client.patch(url, {'action': 'book'}, content_type='application/json',
+                                                     headers=headers)
+            self.assertEqual((response.status_code, response.json()), (200, "Room successfully booked"))
+            self.assertEqual(response.has_header(idempotency.REPLAYED_HEADER), replayed)
+
+        response = await self.async_client.patch(url, {'action': 'release'}, content_type='application/json',
+                                                 headers={**headers, 'IDEMPOTENCY_KEY': 'second'})
+        self.assertEqual(response.json(), "Booking successfully reverted!")
+        self.assertEqual((await Room.objects.aget(pk=self.room.pk)).version, 3)
+
+
+class RoomHoldTests(TestCase):
+    """Tests of short-lived holds of rooms"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='user')
+        cls.other = User.objects.create_user(username='other')
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=i, name=f'Room {i}', price=10 + i, beds=1, available_from=timezone.now())
+            for i in range(3)
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other)
+        self.url = f'/api/booking/{self.rooms[0].pk}/book'
+
+    def _vacant(self) -> list[int]:
+        return [row['id'] for row in self.client.get('/api/booking/?vacant').data['results']]
+
+    def test_hold_and_book(self):
+        response = self.client.patch(self.url, {'action': 'hold'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self._vacant(), [room.pk for room in self.rooms[1:]])
+
+        for action in ['hold', 'book', 'toggle']:
+            self.assertIn(self.other_client.patch(self.url, {'action': action}, format='json').status_code,
+                          (401, 409))
+
+        self.assertEqual(self.client.patch(self.url, {'action': 'book'}, format='json').status_code, 200)
+        room = Room.objects.get(pk=self.rooms[0].pk)
+        self.assertEqual((room.booked, room.booked_by, room.held_by, room.held_until), (True, self.user, None, None))
+
+    def test_release_hold(self):
+        self.client.patch(self.url, {'action': 'hold'}, format='json')
+        self.assertEqual(self.other_client.patch(self.url, {'action': 'release'}, format='json').status_code, 409)
+        self.assertEqual(self.client.patch(self.url, {'action': 'release'}, format='json').status_code, 200)
+        self.assertEqual(self._vacant(), [room.pk for room in self.rooms])
+
+    def test_expired_holds_are_vacant(self):
+        for room in self.rooms[:2]:
+            self.client.patch(f'/api/booking/{room.pk}/book', {'action': 'hold'}, format='json')
+        self.assertEqual(self._vacant(), [self.rooms[2].pk])
+        held_until = Room.objects.get(pk=self.rooms[0].pk).held_until
+        self.assertEqual(cache.get_cache().get(cache.EXPIRY_KEY), held_until.timestamp())
+
+        # Hold expires without any write, cached list is dropped at its expiry and the next one is scheduled
+        Room.objects.filter(pk=self.rooms[0].pk).update(held_until=timezone.now())
+        cache.expire_inventory_at(time.time())
+        self.assertEqual(self._vacant(), [self.rooms[0].pk, self.rooms[2].pk])
+        self.assertEqual(cache.get_cache().get(cache.EXPIRY_KEY),
+                         Room.objects.get(pk=self.rooms[1].pk).held_until.timestamp())
+        self.assertEqual(self.other_client.patch(self.url, {'action': 'book'}, format='json').status_code, 200)
+
+    @override_settings(BOOKING_ROOM_INDEX=True)
+    def test_room_index(self):
+        get_room_index().load_from_db()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.patch(self.url, {'action': 'hold'}, format='json')
+        self.assertEqual(get_room_index().search({'booked': False}), [room.pk for room in self.rooms[1:]])
+
+        Room.objects.filter(pk=self.rooms[0].pk).update(held_until=timezone.now())
+        get_room_index().load_from_db()
+        self.assertEqual(get_room_index().search({'booked': False}), [room.pk for room in self.rooms])
+
+    def test_release_holds_command(self):
+        now = timezone.now()
+        Room.objects.filter(pk__in=[self.rooms[0].pk, self.rooms[1].pk]).update(
+            held_by=self.user, held_until=now - datetime.timedelta(minutes=1))
+        Room.objects.filter(pk=self.rooms[2].pk).update(held_by=self.user, held_until=now + datetime.timedelta(minutes=1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command('release_holds', batch_size=1, stdout=StringIO())
+        self.assertEqual(list(Room.objects.filter(held_until__isnull=False).values_list('pk', flat=True)),
+                         [self.rooms[2].pk])
+        self.assertEqual(Room.objects.get(pk=self.rooms[0].pk).version, 2)
+
+
+class RoomSearchTests(TestCase):
+    """Tests of search of rooms by name and number"""
+
+    @classmethod
+    def setUpTestData(cls):
+        available_from = timezone.now()
+        cls.rooms = Room.objects.bulk_create(
+            Room(number=number, name=name, price=100, beds=2, booked=booked, available_from=available_from)
+            for number, name, booked in [(101, 'Sea View Suite', False), (102, 'Seaside Double', True),
+                                         (12, 'Garden Room', False), (7, 'Room 101', False),
+                                         (5, 'Penthouse', False)]
+        )
+
+    def setUp(self):
+        cache.get_cache().clear()
+        search.get_name_index().load_from_db()
+
+    def _search(self, params: str) -> list[str]:
+        response = self.client.get(f'/api/booking/?{params}')
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.data['next'])
+        return [room['name'] for room in response.data['results']]
+
+    def test_ranking(self):
+        # Prefix matches come first, the one matching whole word is more similar
+        self.assertEqual(self._search('q=sea'), ['Sea View Suite', 'Seaside Double'])
+        self.assertEqual(self._search('q=gardn'), ['Garden Room'])
+        self.assertEqual(self._search('q=Sea%20veiw'), ['Sea View Suite'])
+        # Rooms with the number come before ones having it in name
+        self.assertEqual(self._search('q=101'), ['Sea View Suite', 'Room 101'])
+        self.assertEqual(self._search('q=xyz'), [])
+
+    def test_filters_and_limit(self):
+        self.assertEqual(self._search('q=sea&vacant'), ['Sea View Suite'])
+        self.assertEqual(self._search('q=room&limit=1'), ['Room 101'])
+        self.assertEqual(self.client.get('/api/booking/?q=gardn&fields=number').data['results'], [{'number': 12}])
+        # Blank query is the same as none
+        self.assertIsNotNone(self.client.get('/api/booking/?q=%20&page_size=2').data['next'])
+        self.assertEqual(self.client.get(f'/api/booking/?q={"a" * 129}').status_code, 400)
+
+    def test_index_follows_changes(self):
+        room = self.rooms[4]
+        with self.captureOnCommitCallbacks(execute=True):
+            room.name = 'Mountain Loft'
+            room.save()
+        self.assertEqual(self._search('q=mountan'), ['Mountain Loft'])
+        self.assertEqual(self._search('q=penthouse'), [])
+
+    async def test_async_view(self):
+        for url in ['/api/booking/?q=101', '/api/booking/?q=sea&vacant&fields=id,name']:
+            expected = await sync_to_async(self.client.get)(url)
+            response = await self.async_client.get(url.replace('/api/', '/api/async/'))
+            self.assertEqual(response.json(), expected.json())
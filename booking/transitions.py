@@ -0,0 +1,135 @@
+"""Transitions of single room between vacant, held and booked states.\n
+Every transition is a conditional UPDATE, so only one of concurrent requests makes it.
+Outcome of request is decided once by `decide`, which yields steps and gets their results,
+so sync and async views only run the steps by `update()` or `aupdate()`.
+"""
+import datetime
+from typing import Generator, NamedTuple
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.db.models import F, QuerySet
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import NotFound
+
+from .holds import get_hold_expiry, make_available_query, schedule_expiry
+from .models import Room
+from .serializers import RoomBookSerializer, RoomBulkBookSerializer
+from .signals import send_rooms_updated
+
+
+class Step(NamedTuple):
+    """Conditional UPDATE of room, its result is whether room is changed.\n
+    Step without values is a read of the first row of queryset instead, its result is the row."""
+    pk: int
+    queryset: QuerySet
+    values: dict | None = None
+    # Expiry of hold made by UPDATE, which is scheduled once it's made
+    held_until: datetime.datetime | None = None
+
+
+def book(pk: int, user: User) -> Step:
+    """Function to make step booking room if it's vacant and isn't held by another user.\n
+    Hold of user is turned into booking."""
+    return Step(pk, Room.objects.filter(make_available_query(user), pk=pk),
+                {'booked': True, 'booked_by': user, 'held_by': None, 'held_until': None,
+                 'version': F('version') + 1})
+
+
+def revert(pk: int, user: User) -> Step:
+    """Function to make step reverting booking if room is booked by user"""
+    return Step(pk, Room.objects.filter(pk=pk, booked=True, booked_by=user),
+                {'booked': False, 'booked_by': None, 'version': F('version') + 1})
+
+
+def hold(pk: int, user: User, held_until: datetime.datetime) -> Step:
+    """Function to make step holding room until the moment if it's vacant, hold of user is prolonged"""
+    return Step(pk, Room.objects.filter(make_available_query(user), pk=pk),
+                {'held_by': user, 'held_until': held_until, 'version': F('version') + 1}, held_until)
+
+
+def unhold(pk: int, user: User) -> Step:
+    """Function to make step releasing hold of room if it's held by user"""
+    return Step(pk, Room.objects.filter(pk=pk, booked=False, held_by=user, held_until__gt=timezone.now()),
+                {'held_by': None, 'held_until': None, 'version': F('version') + 1})
+
+
+def decide(pk: int, user: User, action: str) -> Generator[Step, object, tuple[str, int]]:
+    """Function to book, release, hold or toggle booking of room step by step.\n
+    Message and status of response are returned once steps are done."""
+    if action == RoomBookSerializer.HOLD:
+        held_until: datetime.datetime = get_hold_expiry()
+        if (yield hold(pk, user, held_until)):
+            return f"Room is held until {held_until.isoformat()}", status.HTTP_200_OK
+
+    # If room not booked - book it by user
+    elif action != RoomBulkBookSerializer.RELEASE and (yield book(pk, user)):
+        return "Room successfully booked", status.HTTP_200_OK
+
+    # If room is booked by requesting user - booking will be reverted
+    if action in (RoomBulkBookSerializer.RELEASE, RoomBookSerializer.TOGGLE) and (yield revert(pk, user)):
+        return "Booking successfully reverted!", status.HTTP_200_OK
+
+    if action == RoomBulkBookSerializer.RELEASE and (yield unhold(pk, user)):
+        return "Hold successfully released", status.HTTP_200_OK
+
+    booked_by: tuple[int | None] | None = yield Step(pk, Room.objects.filter(pk=pk).values_list('booked_by'))
+    if booked_by is None:
+        raise NotFound("Room not found")
+
+    if action == RoomBulkBookSerializer.BOOK:
+        if booked_by[0] == user.pk:
+            return "Room successfully booked", status.HTTP_200_OK
+        return "Room is booked or held by another user", status.HTTP_409_CONFLICT
+    if action == RoomBookSerializer.HOLD:
+        return "Room isn't vacant", status.HTTP_409_CONFLICT
+    if action == RoomBulkBookSerializer.RELEASE:
+        return "Room isn't booked or held by you", status.HTTP_409_CONFLICT
+
+    # Otherwise room is booked by another user and server denies request
+    return "You can't revert booking of this room", status.HTTP_401_UNAUTHORIZED
+
+
+def _announce(step: Step) -> None:
+    """Function to schedule expiry of hold made by step and announce change of room"""
+    if step.held_until is not None:
+        schedule_expiry(step.held_until)
+    send_rooms_updated([step.pk])
+
+
+def update_room(pk: int, user: User, action: str) -> tuple[str, int]:
+    """Function to make transition of room requested by action, message and status of response are returned"""
+    steps = decide(pk, user, action)
+    result = None
+    try:
+        while True:
+            step: Step = steps.send(result)
+            if step.values is None:
+                result = step.queryset.first()
+                continue
+            updated: int = step.queryset.update(**step.values)
+            if updated:
+                _announce(step)
+            result = updated == 1
+    except StopIteration as stop:
+        return stop.value
+
+
+async def aupdate_room(pk: int, user: User, action: str) -> tuple[str, int]:
+    """Function to make transition of room in async view, see `update_room`"""
+    steps = decide(pk, user, action)
+    result = None
+    try:
+        while True:
+            step: Step = steps.send(result)
+            if step.values is None:
+                result = await step.queryset.afirst()
+                continue
+            updated: int = await step.queryset.aupdate(**step.values)
+            if updated:
+                # Receivers read DB synchronously
+                await sync_to_async(_announce)(step)
+            result = updated == 1
+    except StopIteration as stop:
+        return stop.value
@@ -1,11 +1,18 @@
 """Endpoints list"""
 from django.urls import path, include, re_path
-from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView
+from drf_spectacular.views import SpectacularSwaggerView
 
-from . import views
+from . import async_views, views
 
 urlpatterns = [
     path('api/booking/', views.RoomListView.as_view(), name='booking'),
+    path('api/booking/export/', views.RoomExportView.as_view(), name='booking-export'),
+    path('api/booking/facets/', views.RoomFacetsView.as_view(), name='booking-facets'),
+    path('api/booking/available/', views.RoomAvailabilityView.as_view(), name='booking-available'),
+    path('api/booking/<int:pk>/reservations/', views.RoomReservationView.as_view(),
+         name='booking-room-reservations'),
+    path('api/booking/reservations/<int:pk>/', views.ReservationDetailView.as_view(),
+         name='booking-reservation'),
     path('api/booking/<int:pk>/',
          views.RoomDetailView.as_view({"get": "retrieve"}),
          name='booking-room'),
@@ -13,9 +20,18 @@ urlpatterns = [
          views.RoomDetailView.as_view({"patch": "partial_update"}),
          name='booking-room-book'),
     path('api/booking/booked/', views.RoomBookedListView.as_view(), name='booking-booked'),
+    path('api/booking/bulk/', views.RoomBulkBookView.as_view(), name='booking-bulk'),
+    path('api/booking/cache/', views.RoomCacheStatsView.as_view(), name='booking-cache'),
+    path('api/metrics/', views.MetricsView.as_view(), name='metrics'),
+    path('api/async/booking/', async_views.AsyncRoomListView.as_view(), name='async-booking'),
+    path('api/async/booking/<int:pk>/', async_views.AsyncRoomDetailView.as_view(), name='async-booking-room'),
+    path('api/async/booking/<int:pk>/book', async_views.AsyncRoomBookView.as_view(),
+         name='async-booking-room-book'),
+    path('api/async/booking/booked/', async_views.AsyncRoomBookedListView.as_view(), name='async-booking-booked'),
+    path('api/async/booking/events/', async_views.AsyncRoomEventsView.as_view(), name='async-booking-events'),
     path('api/drf-auth/', include('rest_framework.urls')),
     path(r'api/auth/', include('djoser.urls')),
     re_path(r'^auth/', include('djoser.urls.authtoken')),
-    path('api/schema/', SpectacularAPIView.as_view(), name='schema'),
+    path('api/schema/', views.SchemaView.as_view(), name='schema'),
     path('api/docs/', SpectacularSwaggerView.as_view(url_name='schema'))
 ]
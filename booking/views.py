@@ -1,129 +1,457 @@
 """Views file"""
+import json
+import math
+from itertools import islice
+from typing import AsyncIterator, Iterator
+
+from django.conf import settings
 from django.contrib.auth.models import User
-from django.db.models import Q, QuerySet
-from django.http import QueryDict
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import Count, Exists, F, Max, Min, OuterRef, Q, QuerySet
+from django.db.models.functions import Floor
+from django.http import HttpResponse, QueryDict, StreamingHttpResponse
+from django.utils.cache import parse_etags
+from django.utils.http import quote_etag
 
 from rest_framework import generics, viewsets, status
+from rest_framework.exceptions import NotFound
 from rest_framework.response import Response
 from rest_framework.request import Request
-from rest_framework.permissions import AllowAny, IsAuthenticated, BasePermission
-from rest_framework.authentication import TokenAuthentication
+from rest_framework.permissions import AllowAny, IsAdminUser, IsAuthenticated, BasePermission
 
+from drf_spectacular.renderers import (OpenApiJsonRenderer, OpenApiJsonRenderer2,
+                                      OpenApiYamlRenderer, OpenApiYamlRenderer2)
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import (extend_schema, extend_schema_view,
                                    OpenApiParameter, OpenApiExample)
 
-from .models import Room
-from .serializers import RoomSerializer
+from . import cache, idempotency, metrics
+from .authentication import CachedTokenAuthentication
+from .filters import make_room_query, parse_room_filters
+from .holds import make_available_query, make_unheld_query
+from .models import Booking, PeriodOverlap, Room
+from .pagination import KeysetPagination
+from .renderers import PrometheusRenderer
+from .room_index import RoomIndex, get_room_index
+from .schema import get_schema
+from .search import MAX_QUERY_LENGTH, QUERY_PARAM, parse_search_query, search_rooms
+from .serializers import (RoomSerializer, RoomBookSerializer, RoomBulkBookSerializer, RoomBulkOutcomeSerializer,
+                          RoomCacheStatsSerializer, BookingPeriodSerializer, BookingSerializer,
+                          RoomFacetsQuerySerializer, RoomFacetsSerializer)
+from .signals import send_rooms_updated
+from .transitions import update_room
+
+
+# Parameters of filters parsed by `filters.make_room_query`
+ROOM_FILTER_PARAMETERS: list[OpenApiParameter] = [
+    OpenApiParameter(
+        name='price_from',
+        location=OpenApiParameter.QUERY,
+        description='Minimum price of the room',
+        required=False
+    ),
+    OpenApiParameter(
+        name='price_to',
+        location=OpenApiParameter.QUERY,
+        description='Maximum price of the room',
+        required=False
+    ),
+    OpenApiParameter(
+        name='beds_from',
+        location=OpenApiParameter.QUERY,
+        description='Minimum number of beds in room',
+        required=False
+    ),
+    OpenApiParameter(
+        name='beds_to',
+        location=OpenApiParameter.QUERY,
+        description='Maximum number of beds in room',
+        required=False
+    ),
+    OpenApiParameter(
+        name='available_from',
+        location=OpenApiParameter.QUERY,
+        description='Minimum datetime that room available from',
+        required=False
+    ),
+    OpenApiParameter(
+        name='available_to',
+        location=OpenApiParameter.QUERY,
+        description='Maximum datetime that room available from',
+        required=False
+    ),
+    OpenApiParameter(
+        name='booked',
+        location=OpenApiParameter.QUERY,
+        description='Filter to show already booked rooms',
+        required=False,
+    ),
+    OpenApiParameter(
+        name='vacant',
+        location=OpenApiParameter.QUERY,
+        description='Filter to show vacant rooms',
+        required=False,
+    ),
+]
+
+
+ROOM_FIELDS_PARAMETER = OpenApiParameter(
+    name=RoomSerializer.fields_query_param,
+    location=OpenApiParameter.QUERY,
+    description=f'Comma-separated fields of rooms to return, all of them by default. '
+                f'Some of: {", ".join(RoomSerializer.values_fields)}',
+    required=False,
+    type=str,
+)
+
+
+ROOM_SEARCH_PARAMETER = OpenApiParameter(
+    name=QUERY_PARAM,
+    location=OpenApiParameter.QUERY,
+    description=f'Search query, at most {MAX_QUERY_LENGTH} characters long. Rooms whose name starts with it '
+                f'or is similar to it (typos are tolerated) or whose number is equal to it are returned '
+                f'best matches first, without link to the next page. `ordering` and `cursor` are ignored',
+    required=False,
+    type=str,
+)
+
+
+IDEMPOTENCY_KEY_PARAMETER = OpenApiParameter(
+    name=idempotency.HEADER,
+    location=OpenApiParameter.HEADER,
+    description=f'Unique key of request, so its retries within {settings.BOOKING_IDEMPOTENCY_TIMEOUT} seconds '
+                f'get the same response without changing room again',
+    required=False,
+    type=str,
+)
+
+
+def make_room_etag(version: int, fields: tuple[str, ...]) -> str:
+    """Function to make ETag of room representation, which has only requested fields"""
+    if fields == RoomSerializer.values_fields:
+        return quote_etag(f'{version}')
+    # If-None-Match is comma-separated, so fields are joined by "+"
+    return quote_etag(f'{version}:{"+".join(fields)}')
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    """Function to check if client's copy of resource is current"""
+    etags: list[str] = parse_etags(request.headers.get('If-None-Match', ''))
+    return etag in etags or '*' in etags
+
+
+class RoomValuesListMixin:
+    """Mixin of list views serializing rooms straight from `values()` rows.\n
+    Only columns of fields requested by `fields` query param are selected."""
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method"""
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.query_params)
+        queryset: QuerySet = (self.filter_queryset(self.get_queryset())
+                              .values(*self.paginator.get_values_fields(request, fields)))
+        page: list[dict] = self.paginate_queryset(queryset)
+        return self.get_paginated_response(RoomSerializer.represent_rows(page, fields))
 
 
 @extend_schema(tags=['Booking'])
 @extend_schema_view(
     get=extend_schema(
         summary='View to get list of rooms',
-        description='Endpoint to get list of all rooms.\nParameters might be used to filter them.',
+        description='Endpoint to get list of all rooms.\nParameters might be used to filter them.\n'
+                    'Rooms are returned page by page, `next` link holds cursor of the following page.\n'
+                    'Response has `ETag`, which can be sent in `If-None-Match` to get 304 if nothing changed.',
+        parameters=[*ROOM_FILTER_PARAMETERS, ROOM_SEARCH_PARAMETER, ROOM_FIELDS_PARAMETER],
+    )
+)
+class RoomListView(RoomValuesListMixin, generics.ListAPIView):
+    """View to get list of rooms"""
+    serializer_class = RoomSerializer
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    def _make_query(self) -> Q:
+        """Method to parse query params and make a DB-query"""
+        return make_room_query(self.request.query_params)
+
+    def get_queryset(self) -> QuerySet[Room]:
+        """Method to get query set containing room instances"""
+        query: Q = self._make_query()
+        return Room.objects.filter(query)
+
+    def get_room_index(self) -> RoomIndex | None:
+        """Method to get room index, which paginator uses instead of SQL if it's enabled"""
+        return get_room_index()
+
+    def get_room_lookups(self) -> dict:
+        """Method to get lookups of filters to search room index with"""
+        return parse_room_filters(self.request.query_params)
+
+    def search(self, request: Request, text: str) -> Response:
+        """Method to get rooms matching search query, best matches first.
+
+        Their number is `limit` query param or page size, there is no link to the next page."""
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.query_params)
+        limit: int = self.paginator.get_limit(request) or self.paginator.get_page_size(request)
+        queryset: QuerySet[Room] = self.get_queryset()
+        pks: list[int] = search_rooms(text, queryset, limit)
+
+        rows: dict[int, dict] = {row['id']: row for row in
+                                 queryset.filter(pk__in=pks).values(*dict.fromkeys((*fields, 'id')))}
+        page: list[dict] = [rows[pk] for pk in pks if pk in rows]
+        return Response({'next': None, 'results': RoomSerializer.represent_rows(page, fields)})
+
+    def list(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method.\n
+        Responses are cached by query params until any room is changed."""
+        etag: str = cache.make_etag(request.query_params)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        # Links to pages are absolute, so host is a part of the key too
+        key: str = cache.make_key(f'rooms:{request.get_host()}', request.query_params)
+        data = cache.get_entry(key)
+
+        if data is not None:
+            return Response(data, headers={'ETag': etag})
+
+        text: str | None = parse_search_query(request.query_params)
+        if text is not None:
+            response: Response = self.search(request, text)
+        else:
+            response = super().list(request, *args, **kwargs)
+        cache.set_entry(key, response.data)
+        response['ETag'] = etag
+        return response
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Export rooms as newline-delimited JSON',
+        description='Endpoint to stream all rooms, one JSON object per line.\n'
+                    'Parameters might be used to filter them the same way as list of rooms.',
+        parameters=ROOM_FILTER_PARAMETERS,
+        responses={(200, 'application/x-ndjson'): RoomSerializer},
+    )
+)
+class RoomExportView(generics.GenericAPIView):
+    """View to stream list of rooms as NDJSON"""
+    serializer_class = RoomSerializer
+    permission_classes = [AllowAny]
+
+    def get_queryset(self) -> QuerySet:
+        """Method to get query set containing filtered room rows"""
+        query: Q = make_room_query(self.request.query_params)
+        return Room.objects.filter(query).order_by('id').values(*RoomSerializer.values_fields)
+
+    @staticmethod
+    def _render_chunk(rows: list[dict]) -> bytes:
+        """Method to render chunk of rows as NDJSON lines"""
+        return ''.join(json.dumps(row, ensure_ascii=False, separators=(',', ':')) + '\n'
+                       for row in RoomSerializer.represent_rows(rows)).encode()
+
+    def _render(self, queryset: QuerySet) -> Iterator[bytes]:
+        """Method to render rows read from server-side cursor chunk by chunk"""
+        chunk_size: int = settings.BOOKING_EXPORT_CHUNK_SIZE
+        rows: Iterator[dict] = queryset.iterator(chunk_size=chunk_size)
+
+        while chunk := list(islice(rows, chunk_size)):
+            yield self._render_chunk(chunk)
+
+    async def _arender(self, queryset: QuerySet) -> AsyncIterator[bytes]:
+        """Method to render rows the same way under ASGI.\n
+        Django 4.2 reads the whole sync iterator before sending it there, `aiterator()` fetches a chunk at a time."""
+        chunk_size: int = settings.BOOKING_EXPORT_CHUNK_SIZE
+        chunk: list[dict] = []
+
+        async for row in queryset.aiterator(chunk_size=chunk_size):
+            chunk.append(row)
+            if len(chunk) == chunk_size:
+                yield self._render_chunk(chunk)
+                chunk = []
+        if chunk:
+            yield self._render_chunk(chunk)
+
+    def get(self, request: Request, *args, **kwargs) -> StreamingHttpResponse:
+        """Method that handling **GET** HTTP method"""
+        queryset: QuerySet = self.get_queryset()
+        render = self._arender if isinstance(request._request, ASGIRequest) else self._render
+        return StreamingHttpResponse(render(queryset), content_type='application/x-ndjson')
+
+
+def make_available_queryset(params: QueryDict) -> QuerySet[Room]:
+    """Function to get query set of rooms matching filters and available for period of params.\n
+    Overlapping bookings are found by index of every room and excluded by anti-join."""
+    period = BookingPeriodSerializer(data=params)
+    period.is_valid(raise_exception=True)
+    check_in, check_out = period.validated_data['check_in'], period.validated_data['check_out']
+
+    overlapping: QuerySet[Booking] = Booking.objects.filter(PeriodOverlap(check_in, check_out), room=OuterRef('pk'))
+    return Room.objects.filter(make_room_query(params), ~Exists(overlapping), make_unheld_query(),
+                               booked=False, available_from__lte=check_in)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Search rooms available for a period',
+        description='Endpoint to get list of vacant rooms without bookings overlapping with a period.\n'
+                    'Parameters might be used to filter them the same way as list of rooms.',
         parameters=[
             OpenApiParameter(
-                name='price_from',
-                location=OpenApiParameter.QUERY,
-                description='Minimum price of the room',
-                required=False
-            ),
-            OpenApiParameter(
-                name='price_to',
-                location=OpenApiParameter.QUERY,
-                description='Maximum price of the room',
-                required=False
-            ),
-            OpenApiParameter(
-                name='beds_from',
-                location=OpenApiParameter.QUERY,
-                description='Minimum number of beds in room',
-                required=False
-            ),
-            OpenApiParameter(
-                name='beds_to',
-                location=OpenApiParameter.QUERY,
-                description='Maximum number of beds in room',
-                required=False
-            ),
-            OpenApiParameter(
-                name='available_from',
-                location=OpenApiParameter.QUERY,
-                description='Minimum datetime that room available from',
-                required=False
-            ),
-            OpenApiParameter(
-                name='available_to',
+                name='check_in',
                 location=OpenApiParameter.QUERY,
-                description='Maximum datetime that room available from',
-                required=False
+                description='Start of the period',
+                required=True,
+                type=OpenApiTypes.DATETIME,
             ),
             OpenApiParameter(
-                name='booked',
+                name='check_out',
                 location=OpenApiParameter.QUERY,
-                description='Filter to show already booked rooms',
-                required=False,
+                description='End of the period',
+                required=True,
+                type=OpenApiTypes.DATETIME,
             ),
+            *ROOM_FILTER_PARAMETERS,
+            ROOM_FIELDS_PARAMETER,
+        ],
+    )
+)
+class RoomAvailabilityView(RoomValuesListMixin, generics.ListAPIView):
+    """View to get list of rooms available for a period"""
+    serializer_class = RoomSerializer
+    permission_classes = [AllowAny]
+    pagination_class = KeysetPagination
+
+    def get_queryset(self) -> QuerySet[Room]:
+        """Method to get query set of rooms without overlapping bookings"""
+        return make_available_queryset(self.request.query_params)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Get facets of rooms',
+        description='Endpoint to get counts, ranges and histograms of price and beds of rooms, '
+                    'e.g. to build filter controls.\n'
+                    'Parameters might be used to filter rooms the same way as list of rooms.\n'
+                    'Response has `ETag`, which can be sent in `If-None-Match` to get 304 if nothing changed.',
+        parameters=[
             OpenApiParameter(
-                name='vacant',
+                name='price_step',
                 location=OpenApiParameter.QUERY,
-                description='Filter to show vacant rooms',
+                description=f'Width of price histogram buckets, it\'s widened to a multiple of itself '
+                            f'if there would be more than {settings.BOOKING_FACETS_MAX_BUCKETS} buckets',
                 required=False,
+                type=OpenApiTypes.FLOAT,
             ),
-        ]
+            *ROOM_FILTER_PARAMETERS,
+        ],
     )
 )
-class RoomListView(generics.ListAPIView):
-    """View to get list of rooms"""
-    serializer_class = RoomSerializer
+class RoomFacetsView(generics.GenericAPIView):
+    """View to get aggregated facets of rooms"""
+    serializer_class = RoomFacetsSerializer
     permission_classes = [AllowAny]
 
-    def _make_query(self) -> Q:
-        """Method to parse query params and make a DB-query"""
-        params: QueryDict = self.request.query_params
-
-        price_from: str = params.get(key='price_from')
-        price_to: str = params.get(key='price_to')
-        beds_from: str = params.get(key='beds_from')
-        beds_to: str = params.get(key='beds_to')
-        available_from_from: str = params.get(key='available_from')
-        available_from_to: str = params.get(key='available_to')
-        booked: bool = "booked" in params.keys()
-        vacant: bool = "vacant" in params.keys()
-
-        query: Q = Q()
-
-        if price_from:
-            query &= Q(price__gte=price_from)
-        if price_to:
-            query &= Q(price__lte=price_to)
-        if beds_from:
-            query &= Q(beds__gte=beds_from)
-        if beds_to:
-            query &= Q(beds__lte=beds_to)
-        if available_from_from:
-            query &= Q(available_from__gte=available_from_from)
-        if available_from_to:
-            query &= Q(available_from__lte=available_from_to)
-        if booked ^ vacant:
-            if booked:
-                query &= Q(booked=True)
-            else:
-                query &= Q(booked=False)
+    @staticmethod
+    def _aggregate(query: Q, step: float) -> dict:
+        """Method to get facets by single query grouping rooms by price bucket and beds.\n
+        Groups are few, so they are merged into totals and histograms in Python."""
+        groups: list[dict] = list(
+            Room.objects.filter(query).order_by()
+            .values('beds', bucket=Floor(F('price') / step))
+            .annotate(count=Count('id'), booked_count=Count('id', filter=Q(booked=True)),
+                      vacant_count=Count('id', filter=Q(booked=False) & make_unheld_query()),
+                      min_price=Min('price'), max_price=Max('price'),
+                      min_available=Min('available_from'), max_available=Max('available_from'))
+        )
+        prices: dict[int, int] = {}
+        beds: dict[int, int] = {}
+        facets: dict = {'count': 0, 'booked': 0, 'vacant': 0}
 
-        return query
+        for group in groups:
+            prices[int(group['bucket'])] = prices.get(int(group['bucket']), 0) + group['count']
+            beds[group['beds']] = beds.get(group['beds'], 0) + group['count']
+            facets['count'] += group['count']
+            facets['booked'] += group['booked_count']
+            facets['vacant'] += group['vacant_count']
 
-    def get_queryset(self) -> QuerySet[Room]:
-        """Method to get query set containing room instances"""
-        query: Q = self._make_query()
-        return Room.objects.filter(query)
+        def bound(function, key: str):
+            values: list = [group[key] for group in groups]
+            return function(values) if values else None
+
+        return {
+            **facets,
+            # Held rooms are neither booked nor vacant, as of `filters.make_room_query`
+            'held': facets['count'] - facets['booked'] - facets['vacant'],
+            'price': {
+                'min': bound(min, 'min_price'),
+                'max': bound(max, 'max_price'),
+                'step': step,
+                'buckets': [{'price_from': bucket * step, 'price_to': (bucket + 1) * step, 'count': prices[bucket]}
+                            for bucket in sorted(prices)],
+            },
+            'beds': {
+                'min': min(beds, default=None),
+                'max': max(beds, default=None),
+                'buckets': [{'beds': bed, 'count': beds[bed]} for bed in sorted(beds)],
+            },
+            'available_from': {
+                'min': bound(min, 'min_available'),
+                'max': bound(max, 'max_available'),
+            },
+        }
+
+    @staticmethod
+    def _get_price_step(step: float) -> float:
+        """Method to widen step to its multiple, so price histogram has at most `BOOKING_FACETS_MAX_BUCKETS` buckets.\n
+        Range of prices of all rooms is read from ends of price index, prices of filtered rooms are within it."""
+        bounds: dict = Room.objects.aggregate(min=Min('price'), max=Max('price'))
+        if bounds['min'] is None:
+            return step
+
+        max_buckets: int = settings.BOOKING_FACETS_MAX_BUCKETS
+        factor: int = max(1, math.ceil((bounds['max'] - bounds['min']) / (step * max_buckets)))
+        while math.floor(bounds['max'] / (step * factor)) - math.floor(bounds['min'] / (step * factor)) >= max_buckets:
+            factor += 1
+        return step * factor
+
+    def get_facets(self) -> dict:
+        """Method to get serialized facets of rooms matching filters"""
+        params = RoomFacetsQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        facets: dict = self._aggregate(make_room_query(self.request.query_params),
+                                       self._get_price_step(params.validated_data['price_step']))
+        return self.get_serializer(facets).data
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method.\n
+        Responses are cached by query params until any room is changed, if `BOOKING_FACETS_CACHE` is set."""
+        if not settings.BOOKING_FACETS_CACHE:
+            return Response(self.get_facets())
+
+        etag: str = cache.make_etag(request.query_params)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        key: str = cache.make_key('facets', request.query_params)
+        data = cache.get_entry(key)
+
+        if data is None:
+            data = self.get_facets()
+            cache.set_entry(key, data)
+
+        return Response(data, headers={'ETag': etag})
 
 
 @extend_schema(tags=['Booking'])
 @extend_schema_view(
     retrieve=extend_schema(
         summary='Get detailed info of room',
-        description='Get detailed info about room to any user',
+        description='Get detailed info about room to any user.\n'
+                    'Response has `ETag`, which can be sent in `If-None-Match` to get 304 if room is not changed.',
         parameters=[
             OpenApiParameter(
                 name="id",
@@ -131,13 +459,21 @@ class RoomListView(generics.ListAPIView):
                 description="ID of room in database",
                 required=True,
                 type=int
-            )
+            ),
+            ROOM_FIELDS_PARAMETER,
         ]
     ),
     partial_update=extend_schema(
         summary='Book room by user',
         description='Book available room by user or revert booking '
-                    'if requesting user matches user that has booked a room',
+                    'if requesting user matches user that has booked a room.\n'
+                    'Room is only booked or only released if `action` is `book` or `release`, '
+                    'booking is toggled by default.\n'
+                    'With `hold` action vacant room is held by user for a few minutes, '
+                    'other users can\'t book it until hold is booked, released or expires.\n'
+                    'Outcome of request with `Idempotency-Key` header is replayed for its retries '
+                    'with `Idempotent-Replayed: true` header, room isn\'t changed again.',
+        request=RoomBookSerializer,
         parameters=[
             OpenApiParameter(
                 name="id",
@@ -157,6 +493,7 @@ class RoomListView(generics.ListAPIView):
                     OpenApiExample("Token 36e4ef60d3300e82595749c324d1fffb8db93b7d"),
                 ]
             ),
+            IDEMPOTENCY_KEY_PARAMETER,
         ]
     )
 )
@@ -166,7 +503,7 @@ class RoomDetailView(viewsets.ModelViewSet):
     - **partial_update** action responsible for booking selected room;
     """
     serializer_class = RoomSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
 
     def get_permissions(self) -> list[BasePermission]:
         """Method to assign permissions to actions.\n
@@ -188,37 +525,48 @@ class RoomDetailView(viewsets.ModelViewSet):
         """Method to get room instance """
         return self.get_queryset()
 
-    @staticmethod
-    def _book(room: Room, user: User) -> None:
-        room.booked = True
-        room.booked_by = user
-        room.save()
+    def retrieve(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method.\n
+        Room version is checked against `If-None-Match` before serialization."""
+        fields: tuple[str, ...] = RoomSerializer.parse_fields(request.query_params)
+        row: dict | None = Room.objects.filter(pk=self.kwargs["pk"]).values('version', *fields).first()
+        if row is None:
+            raise NotFound("Room not found")
 
-    @staticmethod
-    def _revert(room: Room) -> None:
-        room.booked = False
-        room.booked_by = None
-        room.save()
+        etag: str = make_room_etag(row.pop('version'), fields)
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+
+        return Response(RoomSerializer.represent_rows([row])[0], headers={'ETag': etag})
 
     def partial_update(self, request: Request, *args, **kwargs) -> Response:
         """Method that handling **PATCH** HTTP method.\n
-        Responsible for booking room by user or reverting booking."""
-        room: Room = self.get_object()
+        Responsible for booking room by user or reverting booking.
+        Outcome of request with `Idempotency-Key` is stored, its retries get it without changing room."""
+        serializer: RoomBookSerializer = RoomBookSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        action: str = serializer.validated_data['action']
+        pk: int = self.kwargs["pk"]
         user: User = request.user
 
-        # If room not booked - book it by user
-        if not room.booked:
-            self._book(room, user)
-            return Response("Room successfully booked", status=status.HTTP_200_OK)
+        key: str | None = idempotency.parse_key(request.headers)
+        if key is None:
+            message, status_code = update_room(pk, user, action)
+            return Response(message, status=status_code)
 
-        # If room is booked, we check that requesting user and user that has booked a room match
-        # If it's not - server denies request
-        if room.booked_by != user:
-            return Response("You can't revert booking of this room", status=status.HTTP_401_UNAUTHORIZED)
+        cache_key: str = idempotency.make_key(user.pk, request.path, key)
+        outcome: tuple[int, str] | None = idempotency.claim(cache_key, action)
+        if outcome is not None:
+            return Response(outcome[1], status=outcome[0], headers={idempotency.REPLAYED_HEADER: 'true'})
 
-        # Otherwise - booking will be reverted
-        self._revert(room)
-        return Response("Booking successfully reverted!", status=status.HTTP_200_OK)
+        try:
+            message, status_code = update_room(pk, user, action)
+        except Exception:
+            idempotency.forget(cache_key)
+            raise
+
+        idempotency.store(cache_key, action, status_code, message)
+        return Response(message, status=status_code)
 
 
 @extend_schema(tags=['Booking'])
@@ -237,17 +585,299 @@ class RoomDetailView(viewsets.ModelViewSet):
                     OpenApiExample("Token d8c719cea96554df7b4289f86d7f37c7c5faef20"),
                     OpenApiExample("Token 36e4ef60d3300e82595749c324d1fffb8db93b7d"),
                 ]
-            )],
+            ),
+            ROOM_FIELDS_PARAMETER,
+        ],
     )
 )
-class RoomBookedListView(generics.ListAPIView):
+class RoomBookedListView(RoomValuesListMixin, generics.ListAPIView):
     """View to get a list of booked by user rooms."""
     serializer_class = RoomSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get_queryset(self) -> QuerySet[Room]:
         """Method to get query set of rooms booked by user"""
         user: User = self.request.user
         rooms: QuerySet[Room] = Room.objects.filter(booked_by=user)
         return rooms
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    post=extend_schema(
+        summary='Book or release several rooms at once',
+        description='Book vacant rooms by user or release rooms booked by user.\n'
+                    'Rooms are updated all together or none of them is, '
+                    'in the latter case outcome of every room is returned.',
+        request=RoomBulkBookSerializer,
+        responses={
+            200: RoomBulkOutcomeSerializer,
+            409: RoomBulkOutcomeSerializer,
+        },
+        parameters=[
+            OpenApiParameter(
+                name="Authorization",
+                location=OpenApiParameter.HEADER,
+                description="Authorization token",
+                required=True,
+                type=str,
+                examples=[
+                    OpenApiExample("Token d8c719cea96554df7b4289f86d7f37c7c5faef20"),
+                    OpenApiExample("Token 36e4ef60d3300e82595749c324d1fffb8db93b7d"),
+                ]
+            )],
+    )
+)
+class RoomBulkBookView(generics.GenericAPIView):
+    """View to book or release a list of rooms in single transaction"""
+    serializer_class = RoomBulkBookSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @staticmethod
+    def _get_condition(action: str, user: User) -> Q:
+        """Method to get condition rooms must match to be booked or released by user"""
+        if action == RoomBulkBookSerializer.BOOK:
+            # Rooms already booked by user are kept, so retries succeed
+            return make_available_query(user) | Q(booked=True, booked_by=user)
+        return Q(booked=True, booked_by=user)
+
+    @staticmethod
+    def _get_outcomes(action: str, pks: list[int], user: User) -> list[dict]:
+        """Method to find out why rooms can't be booked or released"""
+        states: dict[int, tuple[bool, int | None]] = {
+            pk: (booked, booked_by)
+            for pk, booked, booked_by in Room.objects.filter(pk__in=pks).values_list('pk', 'booked', 'booked_by')
+        }
+        available: set[int] = set(Room.objects.filter(make_available_query(user), pk__in=pks)
+                                  .values_list('pk', flat=True))
+        outcomes: list[dict] = []
+
+        for pk in pks:
+            if pk not in states:
+                outcome: str = 'not_found'
+            elif action == RoomBulkBookSerializer.BOOK:
+                outcome = 'ok' if pk in available or states[pk][1] == user.pk else 'unavailable'
+            else:
+                outcome = 'ok' if states[pk] == (True, user.pk) else 'unavailable'
+
+            outcomes.append({'id': pk, 'status': outcome})
+
+        return outcomes
+
+    def post(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **POST** HTTP method.\n
+        Responsible for booking or releasing all of requested rooms by single UPDATE."""
+        serializer: RoomBulkBookSerializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        action: str = serializer.validated_data['action']
+        pks: list[int] = serializer.validated_data['rooms']
+        user: User = request.user
+
+        if action == RoomBulkBookSerializer.BOOK:
+            values: dict = {'booked': True, 'booked_by': user, 'held_by': None, 'held_until': None,
+                            'version': F('version') + 1}
+        else:
+            values = {'booked': False, 'booked_by': None, 'version': F('version') + 1}
+
+        with transaction.atomic():
+            updated: int = Room.objects.filter(self._get_condition(action, user), pk__in=pks).update(**values)
+
+            # Some of rooms can't be updated, so none of them will be
+            if updated != len(pks):
+                transaction.set_rollback(True)
+            else:
+                send_rooms_updated(pks)
+
+        outcome: str = 'booked' if action == RoomBulkBookSerializer.BOOK else 'released'
+
+        if updated != len(pks):
+            return Response({
+                'detail': f"Rooms can't be {outcome}",
+                'rooms': self._get_outcomes(action, pks, user),
+            }, status=status.HTTP_409_CONFLICT)
+
+        return Response({
+            'detail': f'Rooms successfully {outcome}',
+            'rooms': [{'id': pk, 'status': outcome} for pk in pks],
+        }, status=status.HTTP_200_OK)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Get statistics of room list cache',
+        description='Get inventory version and counters of cache hits and misses '
+                    'of the process that handles request. Allowed to staff only.',
+        responses={200: RoomCacheStatsSerializer},
+    )
+)
+class RoomCacheStatsView(generics.GenericAPIView):
+    """View to get statistics of room list cache"""
+    serializer_class = RoomCacheStatsSerializer
+    permission_classes = [IsAdminUser]
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method"""
+        serializer: RoomCacheStatsSerializer = self.get_serializer({
+            'version': cache.get_inventory_version(),
+            **cache.get_stats(),
+        })
+        return Response(serializer.data)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    get=extend_schema(
+        summary='Get metrics of requests',
+        description='Get histograms of wall time, DB queries and response size of requests by URL name '
+                    'in Prometheus text format. Histograms are kept by the process that handles request. '
+                    'Allowed to staff only.',
+        responses={(200, 'text/plain'): OpenApiTypes.STR},
+    )
+)
+class MetricsView(generics.GenericAPIView):
+    """View to get metrics of requests"""
+    permission_classes = [IsAdminUser]
+    renderer_classes = [PrometheusRenderer]
+
+    def get(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **GET** HTTP method"""
+        return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
+
+
+@extend_schema_view(
+    get=extend_schema(
+        description='OpenAPI schema of this API, YAML by default or JSON if it is accepted.\n'
+                    'Response has `ETag`, which can be sent in `If-None-Match` to get 304 if schema is not changed.',
+        parameters=[
+            OpenApiParameter(
+                name='format',
+                location=OpenApiParameter.QUERY,
+                description='Format of schema',
+                required=False,
+                type=str,
+                enum=['json', 'yaml'],
+            ),
+        ],
+        responses={200: OpenApiTypes.OBJECT},
+    )
+)
+class SchemaView(generics.GenericAPIView):
+    """View to get pre-rendered OpenAPI schema"""
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    renderer_classes = [OpenApiYamlRenderer, OpenApiYamlRenderer2, OpenApiJsonRenderer, OpenApiJsonRenderer2]
+
+    def get(self, request: Request, *args, **kwargs) -> HttpResponse:
+        """Method that handling **GET** HTTP method.\n
+        Schema is rendered once per process, so it's returned as it is and cached by clients."""
+        content, etag = get_schema(request.accepted_renderer.format)
+        headers: dict = {'ETag': etag, 'Cache-Control': f'public, max-age={settings.BOOKING_SCHEMA_MAX_AGE}',
+                         'Vary': 'Accept'}
+
+        if etag_matches(request, etag):
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+        content_type: str = request.accepted_media_type
+        if request.accepted_renderer.charset:
+            content_type = f'{content_type}; charset={request.accepted_renderer.charset}'
+        return HttpResponse(content, content_type=content_type, headers=headers)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    post=extend_schema(
+        summary='Book room for a period',
+        description='Book room by user for a period, if room is vacant and '
+                    'has no bookings overlapping with it.',
+        responses={201: BookingSerializer, 409: OpenApiTypes.STR},
+        parameters=[
+            OpenApiParameter(
+                name="id",
+                location=OpenApiParameter.PATH,
+                description="ID of room in database",
+                required=True,
+                type=int
+            ),
+            OpenApiParameter(
+                name="Authorization",
+                location=OpenApiParameter.HEADER,
+                description="Authorization token",
+                required=True,
+                type=str,
+                examples=[
+                    OpenApiExample("Token d8c719cea96554df7b4289f86d7f37c7c5faef20"),
+                    OpenApiExample("Token 36e4ef60d3300e82595749c324d1fffb8db93b7d"),
+                ]
+            )],
+    )
+)
+class RoomReservationView(generics.GenericAPIView):
+    """View to book room for a period"""
+    serializer_class = BookingSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request: Request, *args, **kwargs) -> Response:
+        """Method that handling **POST** HTTP method"""
+        serializer: BookingSerializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        check_in, check_out = serializer.validated_data['check_in'], serializer.validated_data['check_out']
+
+        with transaction.atomic():
+            # Lock of room row serializes its bookings, so overlap check can't be raced
+            room: Room | None = Room.objects.select_for_update().filter(pk=self.kwargs["pk"]).first()
+            if room is None:
+                raise NotFound("Room not found")
+
+            # Room must be vacant, not held by another user and free of overlapping bookings,
+            # the same as rooms listed as available
+            overlapping: QuerySet[Booking] = room.bookings.filter(PeriodOverlap(check_in, check_out))
+            if not Room.objects.filter(make_available_query(request.user), ~Exists(overlapping), pk=room.pk,
+                                       available_from__lte=check_in).exists():
+                return Response("Room isn't available for this period", status=status.HTTP_409_CONFLICT)
+
+            serializer.save(room=room, user=request.user)
+
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+
+
+@extend_schema(tags=['Booking'])
+@extend_schema_view(
+    delete=extend_schema(
+        summary='Cancel booking for a period',
+        description='Cancel booking made by user',
+        parameters=[
+            OpenApiParameter(
+                name="id",
+                location=OpenApiParameter.PATH,
+                description="ID of booking in database",
+                required=True,
+                type=int
+            ),
+            OpenApiParameter(
+                name="Authorization",
+                location=OpenApiParameter.HEADER,
+                description="Authorization token",
+                required=True,
+                type=str,
+                examples=[
+                    OpenApiExample("Token d8c719cea96554df7b4289f86d7f37c7c5faef20"),
+                    OpenApiExample("Token 36e4ef60d3300e82595749c324d1fffb8db93b7d"),
+                ]
+            )],
+    )
+)
+class ReservationDetailView(generics.DestroyAPIView):
+    """View to cancel booking for a period"""
+    serializer_class = BookingSerializer
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self) -> QuerySet[Booking]:
+        """Method to get query set of bookings made by user"""
+        return Booking.objects.filter(user=self.request.user)